@@ -0,0 +1,272 @@
+"""
+Local mirror of the images a page links to.
+
+Generated pages point at fal result URLs and LinkedIn media URLs, which
+expire (their `e=` parameter) and aren't sized for the layout. After a page
+is saved, the workflow downloads its images concurrently, transcodes them
+to WebP (and AVIF when Pillow supports it) in the sizes the components
+render, and rewrites the page to point at the copies.
+
+Files are content-addressed, `{sha256 of the source}-{width}.{format}` in
+ASSETS_DIR, so an image shared by several pages is stored once and a file
+never changes: the API serves them under /media/ with immutable cache headers.
+
+Pages are rewritten on every generation, so files are only kept while a
+stored page links to them: collect_garbage (run periodically by the worker)
+deletes the others once they are older than ASSETS_GC_GRACE, which leaves
+time for a page being generated to be saved with its new files.
+"""
+from app.fal import image_cache
+from app.utils.page_store import page_json
+from app.utils.tracing import annotate
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, features
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import copy
+import hashlib
+import httpx
+import io
+import os
+import re
+import requests
+import time
+
+ASSETS_DIR = os.getenv("ASSETS_DIR", "/app/data/assets")
+PUBLIC_PATH = "/media"
+DOWNLOAD_CONCURRENCY = int(os.getenv("ASSET_DOWNLOAD_CONCURRENCY", 8))
+DOWNLOAD_TIMEOUT = 30
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Unreferenced files younger than this are kept, they may belong to a page not saved yet
+GC_GRACE = int(os.getenv("ASSETS_GC_GRACE", 60 * 60))
+
+ASSET_NAME_PATTERN = re.compile(r"[0-9a-f]{32}-\d+\.(webp|avif)")
+ASSET_URL_PATTERN = re.compile(rb"/media/([0-9a-f]{32}-\d+\.(?:webp|avif))")
+MEDIA_TYPES = {"webp": "image/webp", "avif": "image/avif"}
+
+# Bounding boxes (width, height) rendered per image role, at 2x for high density screens:
+# hero is a half-width column, avatars are h-10 circles, logos are h-8 strips
+SIZES = {
+    "hero": [(640, 640), (1280, 1280)],
+    "avatar": [(96, 96)],
+    "logo": [(256, 64)],
+}
+QUALITY = {"webp": 80, "avif": 60}
+FORMATS = ["avif", "webp"] if features.check("avif") else ["webp"]
+
+
+def asset_path(name: str) -> str:
+    return os.path.join(ASSETS_DIR, name)
+
+
+def _image_refs(page: dict) -> List[Tuple[str, list]]:
+    """(role, path in the page) of every image URL of a page"""
+    refs = []
+    if page.get("heroImageUrl"):
+        refs.append(("hero", ["heroImageUrl"]))
+    for name, url in (page.get("companyLogos") or {}).items():
+        if url:
+            refs.append(("logo", ["companyLogos", name]))
+    for index, testimonial in enumerate(page.get("allTestimonials") or []):
+        if testimonial.get("profile_picture_url"):
+            refs.append(("avatar", ["allTestimonials", index, "profile_picture_url"]))
+    return refs
+
+
+def _get(page: dict, path: list):
+    value = page
+    for part in path:
+        value = value[part]
+    return value
+
+
+def _set(page: dict, path: list, value):
+    _get(page, path[:-1])[path[-1]] = value
+
+
+def _local_source(url: str) -> Optional[str]:
+    """File behind a URL the API serves itself, if any"""
+    if url.startswith(image_cache.PUBLIC_PATH + "/"):
+        return image_cache.file_path(os.path.basename(url))
+    return None
+
+
+def _write(name: str, data: bytes):
+    os.makedirs(ASSETS_DIR, exist_ok=True)
+    tmp_path = asset_path(name) + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, asset_path(name))
+
+
+def transcode(data: bytes, role: str) -> Dict[str, List[Tuple[int, str]]]:
+    """
+    Store the image in every size and format of its role.
+    Returns {format: [(width, public URL), ...]} from the smallest width up.
+    """
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    image = Image.open(io.BytesIO(data))
+    image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+    variants: Dict[str, List[Tuple[int, str]]] = {fmt: [] for fmt in FORMATS}
+    for box in SIZES[role]:
+        resized = image.copy()
+        resized.thumbnail(box)  # never upscales
+        for fmt in FORMATS:
+            name = f"{digest}-{resized.width}.{fmt}"
+            if not os.path.exists(asset_path(name)):
+                buffer = io.BytesIO()
+                resized.save(buffer, format=fmt.upper(), quality=QUALITY[fmt])
+                _write(name, buffer.getvalue())
+            url = f"{PUBLIC_PATH}/{name}"
+            if (resized.width, url) not in variants[fmt]:
+                variants[fmt].append((resized.width, url))
+    return variants
+
+
+def _rewrite(page: dict, mirrored: List[Tuple[str, list, dict]]) -> dict:
+    """Copy of the page pointing at the mirrored images"""
+    page = copy.deepcopy(page)
+    for role, path, variants in mirrored:
+        # The largest WebP is understood everywhere; the hero also gets srcsets per format
+        _set(page, path, variants["webp"][-1][1])
+        if role == "hero":
+            page["heroImageSources"] = [
+                {"type": MEDIA_TYPES[fmt], "srcSet": ", ".join(f"{url} {width}w" for width, url in variants[fmt])}
+                for fmt in FORMATS
+            ]
+    return page
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _check_size(size: int):
+    if size > MAX_SOURCE_BYTES:
+        raise ValueError(f"Image larger than {MAX_SOURCE_BYTES} bytes")
+
+
+def _check_declared_size(headers):
+    """Refuse a download from its Content-Length, before reading the body"""
+    declared = headers.get("Content-Length")
+    if declared and declared.isdigit():
+        _check_size(int(declared))
+
+
+def _download(url: str) -> bytes:
+    local = _local_source(url)
+    if local and os.path.exists(local):
+        return _read_file(local)
+    if local:
+        # Evicted from the image cache since, download it again from fal
+        url = image_cache.evicted_url(os.path.basename(local))
+        if url is None:
+            raise FileNotFoundError(local)
+    with requests.get(url, timeout=DOWNLOAD_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        _check_declared_size(response.headers)
+        data = bytearray()
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            data += chunk
+            _check_size(len(data))
+    return bytes(data)
+
+
+def mirror_page_assets(page: dict) -> dict:
+    """Mirror the images of a page, returns the rewritten page (images that fail keep their URL)"""
+    refs = [(role, path) for role, path in _image_refs(page) if not _get(page, path).startswith(PUBLIC_PATH + "/")]
+
+    def mirror(ref):
+        role, path = ref
+        return transcode(_download(_get(page, path)), role)
+
+    mirrored = []
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_CONCURRENCY) as pool:
+        futures = [pool.submit(mirror, ref) for ref in refs]
+        for (role, path), future in zip(refs, futures):
+            try:
+                mirrored.append((role, path, future.result()))
+            except Exception as e:
+                print(f"Failed to mirror {_get(page, path)}: {e}")
+    annotate(images=len(refs), mirrored=len(mirrored))
+    return _rewrite(page, mirrored)
+
+
+async def _adownload(client: httpx.AsyncClient, url: str) -> bytes:
+    local = _local_source(url)
+    if local and os.path.exists(local):
+        return await asyncio.to_thread(_read_file, local)
+    if local:
+        # Evicted from the image cache since, download it again from fal
+        url = await image_cache.aevicted_url(os.path.basename(local))
+        if url is None:
+            raise FileNotFoundError(local)
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        _check_declared_size(response.headers)
+        data = bytearray()
+        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+            data += chunk
+            _check_size(len(data))
+    return bytes(data)
+
+
+async def mirror_page_assets_async(page: dict) -> dict:
+    """Async variant of mirror_page_assets, transcoding runs in the default thread pool"""
+    refs = [(role, path) for role, path in _image_refs(page) if not _get(page, path).startswith(PUBLIC_PATH + "/")]
+    semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+
+    async with httpx.AsyncClient(timeout=DOWNLOAD_TIMEOUT, follow_redirects=True) as client:
+        async def mirror(role: str, path: list):
+            async with semaphore:
+                data = await _adownload(client, _get(page, path))
+            return await asyncio.to_thread(transcode, data, role)
+
+        results = await asyncio.gather(*(mirror(role, path) for role, path in refs), return_exceptions=True)
+
+    mirrored = []
+    for (role, path), result in zip(refs, results):
+        if isinstance(result, Exception):
+            print(f"Failed to mirror {_get(page, path)}: {result}")
+        else:
+            mirrored.append((role, path, result))
+    annotate(images=len(refs), mirrored=len(mirrored))
+    return _rewrite(page, mirrored)
+
+
+def _sweep(referenced: set) -> int:
+    """Delete the files no page links to, past the grace period"""
+    removed = 0
+    deadline = time.time() - GC_GRACE
+    for entry in os.scandir(ASSETS_DIR):
+        if entry.name in referenced:
+            continue
+        if not (ASSET_NAME_PATTERN.fullmatch(entry.name) or entry.name.endswith(".tmp")):
+            continue
+        try:
+            if entry.stat().st_mtime < deadline:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+async def collect_garbage(r) -> int:
+    """
+    Delete the mirrored files no stored page links to anymore, returns how many.
+    `r` must return raw bytes (see get_async_binary_redis), pages may be gzipped.
+    """
+    if not os.path.isdir(ASSETS_DIR):
+        return 0
+    referenced = set()
+    async for key in r.scan_iter(match="page:*", count=500):
+        if key.endswith((b":sections", b":version")):
+            continue
+        stored = await r.get(key)
+        if stored:
+            referenced.update(name.decode() for name in ASSET_URL_PATTERN.findall(page_json(stored)))
+    return await asyncio.to_thread(_sweep, referenced)
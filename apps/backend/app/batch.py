@@ -0,0 +1,236 @@
+"""
+Bulk landing page generation for lists of leads.
+
+A batch is a list of (linkedin_url, product_description) rows, read from
+JSONL or CSV (with a header line). `run_batch` runs the rows with at most
+`concurrency` of them in flight and yields each row's result as soon as it
+completes, followed by an aggregate progress snapshot (done, failed,
+in-flight, throughput, ETA). Calls to Apify, Mistral and fal are further
+capped per upstream (see app.utils.limits).
+
+Rows for the same page (the same LinkedIn profile, see `page_key`) would
+supersede each other: only the first one is generated, the others get its
+result with `duplicate_of` set to its index.
+
+The API (`POST /api/generate/batch`) runs the rows through the job queue.
+The CLI runs the workflow in-process and writes NDJSON to stdout:
+
+    python -m app.batch leads.csv --concurrency 8 [--fresh]
+"""
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+import time
+
+FIELDS = ("linkedin_url", "product_description")
+# Seconds between progress lines while no row completes, keeps streamed responses alive
+PROGRESS_INTERVAL = 5.0
+
+
+def detect_format(text: str, content_type: Optional[str] = None) -> str:
+    """'csv' or 'jsonl', from the content type when it says, else from the first line"""
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    if "json" in content_type:
+        return "jsonl"
+    first_line = text.lstrip().split("\n", 1)[0]
+    return "jsonl" if first_line.startswith("{") else "csv"
+
+
+def parse_rows(text: str, fmt: str) -> List[dict]:
+    """
+    Parse the batch into rows, keeping malformed rows with an `error`
+    so they are reported in their position instead of failing the batch
+    """
+    if fmt == "csv":
+        records = list(csv.DictReader(io.StringIO(text)))
+    else:
+        records = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                records.append({"error": f"Invalid JSON: {e}"})
+
+    rows = []
+    for record in records:
+        if not isinstance(record, dict):
+            rows.append({"error": "Row is not an object"})
+            continue
+        if "error" in record:
+            rows.append(record)
+            continue
+        row = {field: (record.get(field) or "").strip() for field in FIELDS}
+        missing = [field for field in FIELDS if not row[field]]
+        if missing:
+            row["error"] = f"Missing {', '.join(missing)}"
+        rows.append(row)
+    return rows
+
+
+def page_key(row: dict) -> str:
+    """Page a row generates, one per LinkedIn profile"""
+    from app.jobs import page_id_from_linkedin_url
+
+    return page_id_from_linkedin_url(row["linkedin_url"])
+
+
+class BatchProgress:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.started = time.perf_counter()
+
+    def snapshot(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        finished = self.done + self.failed
+        rate = finished / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - finished
+        return {
+            "type": "progress",
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "elapsed_seconds": round(elapsed, 1),
+            "throughput_per_minute": round(rate * 60, 2),
+            "eta_seconds": round(remaining / rate, 1) if rate > 0 else None,
+        }
+
+
+async def run_batch(
+    rows: List[dict],
+    run_row: Callable[[dict], Awaitable[dict]],
+    concurrency: int = 10,
+    progress_interval: float = PROGRESS_INTERVAL,
+    key: Optional[Callable[[dict], str]] = page_key,
+) -> AsyncIterator[dict]:
+    """
+    Run `run_row` on every row with at most `concurrency` rows in flight.
+
+    Yields a `result` line per row in completion order, each followed by a
+    `progress` line. `run_row` returns extra fields for the result (page id,
+    URL) and raises to mark the row failed. Rows with the same `key` run
+    once, the later ones share the first one's result. Closing the generator
+    cancels the rows still running.
+    """
+    progress = BatchProgress(len(rows))
+    results: asyncio.Queue = asyncio.Queue()
+
+    # Index of the first row of each key, and the rows sharing its result
+    first: Dict[str, int] = {}
+    duplicates: Dict[int, List[int]] = {}
+    unique = []
+    for index, row in enumerate(rows):
+        shared = key(row) if key and not row.get("error") else None
+        if shared in first:
+            duplicates[first[shared]].append(index)
+            continue
+        if shared is not None:
+            first[shared] = index
+            duplicates[index] = []
+        unique.append((index, row))
+    pending = iter(unique)
+
+    async def run(index: int, row: dict) -> dict:
+        result = {"type": "result", "index": index, "linkedin_url": row.get("linkedin_url")}
+        if row.get("error"):
+            return {**result, "status": "invalid", "error": row["error"]}
+
+        progress.in_flight += 1
+        started = time.perf_counter()
+        try:
+            result.update(await run_row(row))
+            result["status"] = "ok"
+        except asyncio.TimeoutError:
+            result.update(status="failed", error="Timed out")
+        except Exception as e:
+            result.update(status="failed", error=str(e))
+        finally:
+            progress.in_flight -= 1
+        result["duration"] = round(time.perf_counter() - started, 2)
+        return result
+
+    async def lane():
+        # Each lane takes the next row once its current one is finished
+        for index, row in pending:
+            result = await run(index, row)
+            copies = [
+                {**result, "index": i, "linkedin_url": rows[i].get("linkedin_url"), "duplicate_of": index}
+                for i in duplicates.get(index, [])
+            ]
+            for line in (result, *copies):
+                if line["status"] == "ok":
+                    progress.done += 1
+                else:
+                    progress.failed += 1
+                await results.put(line)
+
+    lanes = [asyncio.create_task(lane()) for _ in range(max(1, min(concurrency, len(unique))))]
+    try:
+        reported = 0
+        while reported < len(rows):
+            try:
+                result = await asyncio.wait_for(results.get(), progress_interval)
+            except asyncio.TimeoutError:
+                yield progress.snapshot()
+                continue
+            reported += 1
+            yield result
+            yield progress.snapshot()
+    finally:
+        for task in lanes:
+            task.cancel()
+
+
+async def _run_cli(args):
+    from app.jobs import page_id_from_linkedin_url
+    from app.utils.logger import flush_logs
+    from app.utils.redis_client import close_async_redis
+    from app.workflow import workflow_async
+
+    with open(args.file, encoding="utf-8") as f:
+        text = f.read()
+    rows = parse_rows(text, args.format or detect_format(text, "csv" if args.file.endswith(".csv") else None))
+
+    async def run_row(row: dict) -> dict:
+        page_id = page_id_from_linkedin_url(row["linkedin_url"])
+        await workflow_async(row["product_description"], row["linkedin_url"], page_id, fresh=args.fresh)
+        return {"page_id": page_id, "landing_page_url": f"/landing?id={page_id}"}
+
+    try:
+        async for line in run_batch(rows, run_row, concurrency=args.concurrency):
+            if line["type"] == "progress":
+                eta = line["eta_seconds"]
+                print(
+                    f"📦 {line['done']} done, {line['failed']} failed, {line['in_flight']} in flight"
+                    f" of {line['total']} ({line['throughput_per_minute']}/min, ETA {eta if eta is not None else '?'}s)",
+                    file=sys.stderr,
+                )
+            else:
+                print(json.dumps(line), flush=True)
+    finally:
+        await flush_logs()
+        await close_async_redis()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate landing pages for a JSONL or CSV list of leads")
+    parser.add_argument("file", help="Rows with linkedin_url and product_description")
+    parser.add_argument("--concurrency", type=int, default=4, help="Rows generated at the same time")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="Input format, detected when omitted")
+    parser.add_argument("--fresh", action="store_true", help="Bypass the generation caches")
+    asyncio.run(_run_cli(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Persistent cache of generated hero images
+
+Images are keyed on the normalized prompt and the generation arguments.
+The index lives in Redis so every worker shares it:
+
+    imgcache:entry:{key}   hash with the fal URL, local file name and size
+    imgcache:lru           sorted set key -> last access time
+    imgcache:bytes         total size of the locally stored files
+    imgcache:evicted:{file}
+                           fal URL of an evicted local file, for IMAGE_CACHE_EVICTED_TTL seconds
+
+Without a local copy a hit is the fal URL itself, which expires after about
+a week: entries older than IMAGE_CACHE_URL_TTL are dropped on lookup and
+count as a miss, so the image is generated again.
+
+When IMAGE_CACHE_STORE_BYTES is enabled the image itself is downloaded into
+IMAGE_CACHE_DIR and served by the API under /cache/images/, so a hit does not
+depend on the fal URL still being valid. Least recently used entries are
+evicted past IMAGE_CACHE_MAX_ENTRIES entries or IMAGE_CACHE_MAX_BYTES bytes.
+Pages keep linking to /cache/images/ until their images are mirrored (see
+app.assets), or for good if mirroring failed, so the API redirects a request
+for an evicted file to its fal URL instead of answering 404.
+"""
+
+from decouple import config
+from app.utils.redis_client import get_redis, get_async_redis
+from app.utils.tracing import annotate
+from typing import Optional
+import asyncio
+import hashlib
+import httpx
+import json
+import os
+import re
+import requests
+import time
+
+CACHE_DIR = config('IMAGE_CACHE_DIR', default='/app/data/image_cache')
+STORE_BYTES = config('IMAGE_CACHE_STORE_BYTES', default=False, cast=bool)
+MAX_ENTRIES = config('IMAGE_CACHE_MAX_ENTRIES', default=1000, cast=int)
+MAX_BYTES = config('IMAGE_CACHE_MAX_BYTES', default=500 * 1024 * 1024, cast=int)
+# How long the fal URL of an evicted file is remembered, fal URLs expire after about a week
+EVICTED_TTL = config('IMAGE_CACHE_EVICTED_TTL', default=7 * 24 * 60 * 60, cast=int)
+# Age past which a cached fal URL is no longer handed out, a day short of its expiry
+URL_TTL = config('IMAGE_CACHE_URL_TTL', default=EVICTED_TTL - 24 * 60 * 60, cast=int)
+DOWNLOAD_TIMEOUT = 30
+
+LRU_KEY = "imgcache:lru"
+BYTES_KEY = "imgcache:bytes"
+STATS_KEY = "cache:stats:images"
+
+# Public path the API serves the stored files from
+PUBLIC_PATH = "/cache/images"
+FILE_NAME_PATTERN = re.compile(r"[0-9a-f]{64}\.(png|webp|jpg)")
+MEDIA_TYPES = {"png": "image/png", "webp": "image/webp", "jpg": "image/jpeg"}
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    prompt = re.sub(r"\s+", " ", prompt.strip().lower())
+    return prompt.strip(" .,;:!")
+
+
+def cache_key(prompt: str, arguments: dict) -> str:
+    """Hash of the normalized prompt and of the arguments that change the output"""
+    relevant = {
+        "image_size": arguments.get("image_size"),
+        "num_inference_steps": arguments.get("num_inference_steps"),
+    }
+    payload = normalize_prompt(prompt) + "|" + json.dumps(relevant, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _entry_key(key: str) -> str:
+    return f"imgcache:entry:{key}"
+
+
+def _evicted_key(file_name: str) -> str:
+    return f"imgcache:evicted:{file_name}"
+
+
+def file_path(file_name: str) -> str:
+    return os.path.join(CACHE_DIR, file_name)
+
+
+def _file_name(key: str, content_type: str) -> str:
+    extension = {"image/png": "png", "image/webp": "webp"}.get(content_type, "jpg")
+    return f"{key}.{extension}"
+
+
+def _write_file(file_name: str, data: bytes):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = os.path.join(CACHE_DIR, file_name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, os.path.join(CACHE_DIR, file_name))
+
+
+def _remove_file(file_name: str):
+    try:
+        os.remove(os.path.join(CACHE_DIR, file_name))
+    except FileNotFoundError:
+        pass
+
+
+def _has_file(entry: dict) -> bool:
+    return bool(entry.get("file")) and os.path.exists(os.path.join(CACHE_DIR, entry["file"]))
+
+
+def _served_url(entry: dict) -> str:
+    if _has_file(entry):
+        return f"{PUBLIC_PATH}/{entry['file']}"
+    return entry["url"]
+
+
+def _url_age(entry: dict) -> float:
+    return time.time() - float(entry.get("created_at") or 0)
+
+
+def _expired(entry: dict) -> bool:
+    """Whether a hit would hand out a fal URL that is about to expire"""
+    return not _has_file(entry) and _url_age(entry) > URL_TTL
+
+
+def _queue_drop(pipe, key: str, entry: dict):
+    pipe.delete(_entry_key(key))
+    pipe.zrem(LRU_KEY, key)
+    pipe.incrby(BYTES_KEY, -int(entry.get("size") or 0))
+
+
+def _evicted_ttl(entry: dict) -> int:
+    """Remaining lifetime of the fal URL of an evicted entry"""
+    return max(1, int(EVICTED_TTL - _url_age(entry)))
+
+
+# Sync API
+
+def lookup(key: str) -> Optional[str]:
+    """URL of the cached image, or None. A hit refreshes the entry's LRU position."""
+    try:
+        r = get_redis()
+        entry = r.hgetall(_entry_key(key))
+        if entry and _expired(entry):
+            with r.pipeline(transaction=True) as pipe:
+                _queue_drop(pipe, key, entry)
+                pipe.execute()
+            entry = None
+        if not entry:
+            r.hincrby(STATS_KEY, "misses", 1)
+            annotate(**{"cache.images": "miss"})
+            return None
+        r.zadd(LRU_KEY, {key: time.time()})
+        r.hincrby(STATS_KEY, "hits", 1)
+        annotate(**{"cache.images": "hit"})
+        return _served_url(entry)
+    except Exception as e:
+        print(f"Image cache read failed: {e}")
+        return None
+
+
+def store(key: str, url: str) -> str:
+    """Index a freshly generated image, keeping a local copy if enabled, and evict old entries"""
+    try:
+        entry = {"url": url, "file": "", "size": 0, "created_at": time.time()}
+        if STORE_BYTES:
+            response = requests.get(url, timeout=DOWNLOAD_TIMEOUT)
+            response.raise_for_status()
+            entry["file"] = _file_name(key, response.headers.get("content-type", ""))
+            entry["size"] = len(response.content)
+            _write_file(entry["file"], response.content)
+
+        r = get_redis()
+        previous_size = int(r.hget(_entry_key(key), "size") or 0)
+        with r.pipeline(transaction=True) as pipe:
+            pipe.hset(_entry_key(key), mapping=entry)
+            pipe.zadd(LRU_KEY, {key: time.time()})
+            pipe.incrby(BYTES_KEY, entry["size"] - previous_size)
+            pipe.execute()
+        evict()
+    except Exception as e:
+        print(f"Image cache write failed: {e}")
+    return url
+
+
+def evict():
+    """Drop least recently used entries until the cache fits its limits"""
+    r = get_redis()
+    while r.zcard(LRU_KEY) > MAX_ENTRIES or int(r.get(BYTES_KEY) or 0) > MAX_BYTES:
+        popped = r.zpopmin(LRU_KEY)
+        if not popped:
+            break
+        key = popped[0][0]
+        entry = r.hgetall(_entry_key(key))
+        with r.pipeline(transaction=True) as pipe:
+            pipe.delete(_entry_key(key))
+            pipe.incrby(BYTES_KEY, -int(entry.get("size") or 0))
+            pipe.hincrby(STATS_KEY, "evictions", 1)
+            if entry.get("file"):
+                pipe.set(_evicted_key(entry["file"]), entry["url"], ex=_evicted_ttl(entry))
+            pipe.execute()
+        if entry.get("file"):
+            _remove_file(entry["file"])
+
+
+def evicted_url(file_name: str) -> Optional[str]:
+    """fal URL of an evicted local file, for the pages still linking to the file"""
+    return get_redis().get(_evicted_key(file_name))
+
+
+# Async API
+
+async def alookup(key: str) -> Optional[str]:
+    """Async variant of lookup"""
+    try:
+        r = get_async_redis()
+        entry = await r.hgetall(_entry_key(key))
+        if entry and _expired(entry):
+            async with r.pipeline(transaction=True) as pipe:
+                _queue_drop(pipe, key, entry)
+                await pipe.execute()
+            entry = None
+        if not entry:
+            await r.hincrby(STATS_KEY, "misses", 1)
+            annotate(**{"cache.images": "miss"})
+            return None
+        await r.zadd(LRU_KEY, {key: time.time()})
+        await r.hincrby(STATS_KEY, "hits", 1)
+        annotate(**{"cache.images": "hit"})
+        return _served_url(entry)
+    except Exception as e:
+        print(f"Image cache read failed: {e}")
+        return None
+
+
+async def astore(key: str, url: str) -> str:
+    """Async variant of store"""
+    try:
+        entry = {"url": url, "file": "", "size": 0, "created_at": time.time()}
+        if STORE_BYTES:
+            async with httpx.AsyncClient(timeout=DOWNLOAD_TIMEOUT) as http:
+                response = await http.get(url)
+                response.raise_for_status()
+            entry["file"] = _file_name(key, response.headers.get("content-type", ""))
+            entry["size"] = len(response.content)
+            await asyncio.to_thread(_write_file, entry["file"], response.content)
+
+        r = get_async_redis()
+        previous_size = int(await r.hget(_entry_key(key), "size") or 0)
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.hset(_entry_key(key), mapping=entry)
+            pipe.zadd(LRU_KEY, {key: time.time()})
+            pipe.incrby(BYTES_KEY, entry["size"] - previous_size)
+            await pipe.execute()
+        await aevict()
+    except Exception as e:
+        print(f"Image cache write failed: {e}")
+    return url
+
+
+async def aevict():
+    """Async variant of evict"""
+    r = get_async_redis()
+    while await r.zcard(LRU_KEY) > MAX_ENTRIES or int(await r.get(BYTES_KEY) or 0) > MAX_BYTES:
+        popped = await r.zpopmin(LRU_KEY)
+        if not popped:
+            break
+        key = popped[0][0]
+        entry = await r.hgetall(_entry_key(key))
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.delete(_entry_key(key))
+            pipe.incrby(BYTES_KEY, -int(entry.get("size") or 0))
+            pipe.hincrby(STATS_KEY, "evictions", 1)
+            if entry.get("file"):
+                pipe.set(_evicted_key(entry["file"]), entry["url"], ex=_evicted_ttl(entry))
+            await pipe.execute()
+        if entry.get("file"):
+            _remove_file(entry["file"])
+
+
+async def aevicted_url(file_name: str) -> Optional[str]:
+    """Async variant of evicted_url"""
+    return await get_async_redis().get(_evicted_key(file_name))
@@ -6,30 +6,70 @@ using the fal.ai API.
 """
 
 from decouple import config
+from app.fal import image_cache
+from app.utils.limits import upstream_limit, upstream_limit_async
+from app.utils.tracing import annotate
 import fal_client
+import json
 import os
 
 os.environ['FAL_KEY'] = config('FAL_KEY')
 
-def generate_image(prompt: str) -> str:
+MODEL = "fal-ai/flux/schnell"
+
+
+def _arguments(prompt: str) -> dict:
+    return {
+        "prompt": prompt,
+        "image_size": "landscape_4_3",
+        "num_inference_steps": 4,
+        "num_images": 1,
+        "enable_safety_checker": True,
+    }
+
+def _trace_request(request_id: str):
+    """fal queue callback, the request id identifies the generation in fal's dashboard"""
+    annotate(request_id=request_id)
+
+def generate_image(prompt: str, fresh: bool = False) -> str:
     """
     Generate an image from a text prompt using fal.ai API.
+    Images already generated for the same normalized prompt are reused.
 
     Args:
         prompt: Text description of the image to generate
+        fresh: Skip the cache lookup and always generate a new image
 
     Returns:
         str: URL of the generated image
     """
-    result = fal_client.subscribe(
-        "fal-ai/flux/schnell",
-        arguments={
-            "prompt": prompt,
-            "image_size": "landscape_4_3",
-            "num_inference_steps": 4,
-            "num_images": 1,
-            "enable_safety_checker": True,
-        },
-    )
-
-    return result['images'][0]['url']
+    arguments = _arguments(prompt)
+    key = image_cache.cache_key(prompt, arguments)
+    if not fresh:
+        cached = image_cache.lookup(key)
+        if cached:
+            print(f"✅ Reused cached hero image")
+            return cached
+
+    with upstream_limit("fal"):
+        annotate(request_bytes=len(json.dumps(arguments)))
+        result = fal_client.subscribe(MODEL, arguments=arguments, on_enqueue=_trace_request)
+
+    return image_cache.store(key, result['images'][0]['url'])
+
+
+async def generate_image_async(prompt: str, fresh: bool = False) -> str:
+    """Async variant of generate_image"""
+    arguments = _arguments(prompt)
+    key = image_cache.cache_key(prompt, arguments)
+    if not fresh:
+        cached = await image_cache.alookup(key)
+        if cached:
+            print(f"✅ Reused cached hero image")
+            return cached
+
+    async with upstream_limit_async("fal"):
+        annotate(request_bytes=len(json.dumps(arguments)))
+        result = await fal_client.subscribe_async(MODEL, arguments=arguments, on_enqueue=_trace_request)
+
+    return await image_cache.astore(key, result['images'][0]['url'])
@@ -0,0 +1,347 @@
+"""
+Durable Redis job queue for landing page generation.
+
+Layout:
+    jobs:queue        list of runs waiting for a worker (LPUSH in, RESERVE_SCRIPT out)
+    jobs:processing   list of runs currently owned by a worker
+    jobs:leases       sorted set run -> lease deadline (unix time)
+    jobs:dead         dead-letter list of runs that exhausted their retries
+    job:{page_id}     hash with the payload and status of the page's current run
+    inflight:{page_id}
+                      single-flight lock "{product hash}:{token}" of the page's current run
+
+A run is one submission of a page, `{page_id}:{token}`. A worker moves a
+run from the queue to the processing list and takes a lease on it in one
+script, so no run is ever in processing without a lease. While the run goes on the lease is renewed; if the worker dies the
+lease expires and any worker's reaper puts the run back in the queue, or
+in the dead-letter list once it ran out of attempts.
+
+Submissions for a page whose current run is for the same product attach
+to that run instead of starting a new one. A submission for another
+product supersedes it: the lock and the job hash are taken over by the
+new run, a queued old run leaves the queue and a running one is cancelled
+by its worker on the next lease renewal (see extend_lease). A run only
+ever updates the job hash and the lock while it holds their token.
+
+A reservation is one attempt of a run (the job's `attempts` counter once
+reserved). When the reaper takes back a run from a worker that is slow but
+alive, that worker's attempt no longer owns the job: its renewals fail, so
+it stops, and its completion or failure is ignored.
+"""
+from app.utils.log_stream import log_key
+from app.utils.page_sections import Guard, sections_key
+from app.utils.page_store import page_key, version_key
+from typing import Optional, Tuple
+import redis.asyncio as redis
+import hashlib
+import time
+import uuid
+import os
+
+QUEUE_KEY = "jobs:queue"
+PROCESSING_KEY = "jobs:processing"
+LEASES_KEY = "jobs:leases"
+DEAD_KEY = "jobs:dead"
+
+VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", 600))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+# Finished job records are kept for a day so their status can still be read
+JOB_TTL = int(os.getenv("JOB_TTL", 60 * 60 * 24))
+# The lock lives as long as its run is queued or running: it is released when
+# the run ends and renewed with the lease, the TTL only cleans up after a lost run
+LOCK_TTL = JOB_TTL
+
+# Releases the lock when it still belongs to the run's token (ARGV[2])
+_RELEASE_LOCK = """
+local lock = redis.call('GET', KEYS[4])
+if lock and string.sub(lock, -(#ARGV[2] + 1)) == ':' .. ARGV[2] then
+    redis.call('DEL', KEYS[4])
+end
+"""
+
+# KEYS: lock, job, queue, page, version, sections, logs
+# ARGV: product hash, token, lock ttl, now, page id, product description, linkedin url, fresh
+# Returns 1 when a run was enqueued, 0 when the current run is for the same product
+SUBMIT_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current and string.sub(current, 1, #ARGV[1] + 1) == ARGV[1] .. ':' then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1] .. ':' .. ARGV[2], 'EX', ARGV[3])
+redis.call('DEL', KEYS[4], KEYS[5], KEYS[6], KEYS[7])
+local previous = redis.call('HGET', KEYS[2], 'token')
+if previous then
+    redis.call('LREM', KEYS[3], 0, ARGV[5] .. ':' .. previous)
+end
+redis.call('DEL', KEYS[2])
+redis.call('HSET', KEYS[2],
+    'page_id', ARGV[5], 'token', ARGV[2], 'product_description', ARGV[6], 'linkedin_url', ARGV[7],
+    'fresh', ARGV[8], 'status', 'queued', 'stage', '', 'attempts', 0, 'enqueued_at', ARGV[4])
+redis.call('LPUSH', KEYS[3], ARGV[5] .. ':' .. ARGV[2])
+return 1
+"""
+
+# Whether the attempt ARGV[attempt] of the run with token ARGV[token] still holds the job hash
+# `job`: not superseded, not reaped (status running, same attempt). An empty attempt matches any
+_OWNS_ATTEMPT = """
+local function owns_attempt(job, token, attempt)
+    local fields = redis.call('HMGET', job, 'token', 'attempts', 'status')
+    return fields[1] == token and (attempt == '' or fields[2] == attempt) and fields[3] == 'running'
+end
+"""
+
+# KEYS: job, leases, lock; ARGV: run, token, lease deadline, lock ttl, attempt
+# Returns 0 when the attempt lost the run: superseded, or its lease was reaped
+EXTEND_SCRIPT = _OWNS_ATTEMPT + """
+if not owns_attempt(KEYS[1], ARGV[2], ARGV[5]) or not redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[2], 'XX', ARGV[3], ARGV[1])
+local lock = redis.call('GET', KEYS[3])
+if lock and string.sub(lock, -(#ARGV[2] + 1)) == ':' .. ARGV[2] then
+    redis.call('EXPIRE', KEYS[3], ARGV[4])
+end
+return 1
+"""
+
+# KEYS: job; ARGV: token, field, value, attempt
+SET_FIELD_SCRIPT = _OWNS_ATTEMPT + """
+if owns_attempt(KEYS[1], ARGV[1], ARGV[4]) then
+    return redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+end
+return 0
+"""
+
+# KEYS: queue, processing, leases; ARGV: now, lease deadline, worker id
+# Returns the reserved run and its job hash as a flat list, nil if the queue is empty
+RESERVE_SCRIPT = """
+local run = redis.call('LMOVE', KEYS[1], KEYS[2], 'RIGHT', 'LEFT')
+if not run then
+    return nil
+end
+redis.call('ZADD', KEYS[3], ARGV[2], run)
+-- job_key() of the run's page id
+local job = 'job:' .. string.match(run, '^(.*):[^:]*$')
+redis.call('HINCRBY', job, 'attempts', 1)
+redis.call('HSET', job, 'status', 'running', 'started_at', ARGV[1], 'worker', ARGV[3], 'error', '')
+local fields = redis.call('HGETALL', job)
+table.insert(fields, 1, run)
+return fields
+"""
+
+# A superseded run cleans up its own processing entry and lease, nobody else
+# uses its run id. A reaped attempt leaves them alone: they now belong to the
+# reaper's requeue or to the attempt reserved since.
+_RELEASE_RUN = """
+if redis.call('HGET', KEYS[3], 'token') == ARGV[2] then
+    if not owns_attempt(KEYS[3], ARGV[2], ARGV[attempt_arg]) then
+        return lost
+    end
+else
+    redis.call('LREM', KEYS[1], 0, ARGV[1])
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    return superseded
+end
+redis.call('LREM', KEYS[1], 0, ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+"""
+
+# KEYS: processing, leases, job, lock; ARGV: run, token, now, job ttl, attempt
+# Returns 0 when the attempt no longer owned the run
+COMPLETE_SCRIPT = _OWNS_ATTEMPT + """
+local attempt_arg, lost, superseded = 5, 0, 0
+""" + _RELEASE_RUN + """
+redis.call('HSET', KEYS[3], 'status', 'done', 'stage', '', 'finished_at', ARGV[3])
+redis.call('EXPIRE', KEYS[3], ARGV[4])
+""" + _RELEASE_LOCK + """
+return 1
+"""
+
+# KEYS: processing, leases, job, lock, queue, dead
+# ARGV: run, token, now, job ttl, error, max attempts, attempt ('' from the reaper)
+# Returns the new status: queued or failed, superseded when a newer run owns
+# the page, expired when the attempt was reaped
+FAIL_SCRIPT = _OWNS_ATTEMPT + """
+local attempt_arg, lost, superseded = 7, 'expired', 'superseded'
+""" + _RELEASE_RUN + """
+if tonumber(redis.call('HGET', KEYS[3], 'attempts') or '0') < tonumber(ARGV[6]) then
+    redis.call('HSET', KEYS[3], 'status', 'queued', 'stage', '', 'error', ARGV[5])
+    redis.call('LPUSH', KEYS[5], ARGV[1])
+    return 'queued'
+end
+redis.call('HSET', KEYS[3], 'status', 'failed', 'stage', '', 'error', ARGV[5], 'finished_at', ARGV[3])
+redis.call('EXPIRE', KEYS[3], ARGV[4])
+redis.call('LREM', KEYS[6], 0, ARGV[1])
+redis.call('LPUSH', KEYS[6], ARGV[1])
+""" + _RELEASE_LOCK + """
+return 'failed'
+"""
+
+
+def page_id_from_linkedin_url(linkedin_url: str) -> str:
+    """Each LinkedIn user has ONE page, named after their profile slug, that gets overwritten"""
+    return linkedin_url.rstrip('/').split('/')[-1]
+
+
+def job_key(page_id: str) -> str:
+    return f"job:{page_id}"
+
+
+def singleflight_key(page_id: str) -> str:
+    return f"inflight:{page_id}"
+
+
+def product_hash(product_description: str) -> str:
+    return hashlib.sha256(product_description.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def run_id(page_id: str, token: str) -> str:
+    return f"{page_id}:{token}"
+
+
+def split_run(run: str) -> Tuple[str, str]:
+    """(page_id, token) of a run"""
+    page_id, _, token = run.rpartition(":")
+    return page_id, token
+
+
+def run_guard(run: str, attempt: str) -> Guard:
+    """Guard of the page writes of an attempt, see page_sections.WRITE_SCRIPT"""
+    page_id, token = split_run(run)
+    return job_key(page_id), token, attempt
+
+
+async def submit_job(r: redis.Redis, page_id: str, product_description: str, linkedin_url: str, fresh: bool = False) -> bool:
+    """
+    Start a generation unless one for the same product is already in flight.
+
+    Lock, cleanup of the previous run's page and logs and enqueueing happen
+    in one script, so concurrent submissions from any API process agree on a
+    single current run per page. The others attach to it and follow the same page id and
+    log stream.
+
+    Returns:
+        True if a new run was enqueued, False if the caller attached to the current one
+    """
+    created = await r.eval(
+        SUBMIT_SCRIPT, 7,
+        singleflight_key(page_id), job_key(page_id), QUEUE_KEY, page_key(page_id), version_key(page_id), sections_key(page_id),
+        log_key(page_id),
+        product_hash(product_description), uuid.uuid4().hex, LOCK_TTL, time.time(),
+        page_id, product_description, linkedin_url, int(fresh),
+    )
+    return bool(created)
+
+
+async def reserve_job(r: redis.Redis, worker_id: str, timeout: int = 5) -> Optional[dict]:
+    """
+    Block until a run is available, move it to the processing list and lease it.
+
+    Waiting is a BLMOVE of the queue onto its own tail, which wakes up on a
+    new run without taking it; the reservation itself is one script.
+
+    Returns:
+        The job hash with its `run`, or None if nothing was queued within `timeout` seconds
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        now = time.time()
+        reserved = await r.eval(RESERVE_SCRIPT, 3, QUEUE_KEY, PROCESSING_KEY, LEASES_KEY, now, now + VISIBILITY_TIMEOUT, worker_id)
+        if reserved:
+            run, fields = reserved[0], reserved[1:]
+            return {**dict(zip(fields[::2], fields[1::2])), "run": run}
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or await r.blmove(QUEUE_KEY, QUEUE_KEY, max(1, int(remaining)), "RIGHT", "RIGHT") is None:
+            return None
+
+
+async def extend_lease(r: redis.Redis, run: str, attempt: str) -> bool:
+    """
+    Push the lease deadline forward, called periodically while the run goes on.
+
+    Returns:
+        False once the attempt lost the run, superseded by a newer submission
+        or reaped after its lease expired, which should then stop
+    """
+    page_id, token = split_run(run)
+    return bool(await r.eval(
+        EXTEND_SCRIPT, 3, job_key(page_id), LEASES_KEY, singleflight_key(page_id),
+        run, token, time.time() + VISIBILITY_TIMEOUT, LOCK_TTL, attempt,
+    ))
+
+
+async def set_stage(r: redis.Redis, run: str, attempt: str, stage: str):
+    page_id, token = split_run(run)
+    await r.eval(SET_FIELD_SCRIPT, 1, job_key(page_id), token, "stage", stage, attempt)
+
+
+async def complete_job(r: redis.Redis, run: str, attempt: str) -> bool:
+    """Mark the run done and release its lock, returns False if the attempt had lost the run"""
+    page_id, token = split_run(run)
+    return bool(await r.eval(
+        COMPLETE_SCRIPT, 4, PROCESSING_KEY, LEASES_KEY, job_key(page_id), singleflight_key(page_id),
+        run, token, time.time(), JOB_TTL, attempt,
+    ))
+
+
+async def fail_job(r: redis.Redis, run: str, error: str, attempt: str = "") -> str:
+    """
+    Release a failed run: requeue it while it has attempts left, dead-letter it otherwise.
+    The reaper leaves `attempt` empty, it fails whichever attempt holds the run.
+
+    Returns:
+        The new status of the job ("queued" or "failed"), "superseded" when
+        a newer run owns the page, or "expired" when the attempt was reaped
+    """
+    page_id, token = split_run(run)
+    return await r.eval(
+        FAIL_SCRIPT, 6, PROCESSING_KEY, LEASES_KEY, job_key(page_id), singleflight_key(page_id), QUEUE_KEY, DEAD_KEY,
+        run, token, time.time(), JOB_TTL, error, MAX_ATTEMPTS, attempt,
+    )
+
+
+async def requeue_expired(r: redis.Redis) -> int:
+    """
+    Recover runs whose lease expired because their worker died or hung.
+    Safe to run from every worker: only the caller that removes the lease handles the run.
+
+    Returns:
+        Number of runs recovered
+    """
+    expired = await r.zrangebyscore(LEASES_KEY, "-inf", time.time())
+    recovered = 0
+    for run in expired:
+        if await r.zrem(LEASES_KEY, run):
+            await fail_job(r, run, "visibility timeout expired")
+            recovered += 1
+    return recovered
+
+
+async def get_job_status(r: redis.Redis, page_id: str) -> Optional[dict]:
+    """
+    Job hash plus its position in the queue (0 means next to be picked up),
+    or None if the job is unknown.
+    """
+    job = await r.hgetall(job_key(page_id))
+    if not job:
+        return None
+
+    position = None
+    if job.get("status") == "queued":
+        index = await r.lpos(QUEUE_KEY, run_id(page_id, job.get("token", "")))
+        if index is not None:
+            # Jobs are pushed on the left and consumed from the right
+            position = await r.llen(QUEUE_KEY) - index - 1
+
+    return {
+        "page_id": page_id,
+        "status": job.get("status"),
+        "stage": job.get("stage") or None,
+        "attempts": int(job.get("attempts", 0)),
+        "queue_position": position,
+        "error": job.get("error") or None,
+        "enqueued_at": float(job["enqueued_at"]) if job.get("enqueued_at") else None,
+        "started_at": float(job["started_at"]) if job.get("started_at") else None,
+        "finished_at": float(job["finished_at"]) if job.get("finished_at") else None,
+    }
@@ -1,15 +1,33 @@
 from decouple import config
 from mistralai import Mistral
+from app.utils.cache import TTLCache
+from app.utils.jsonstream import JsonObjectParser
+from app.utils.limits import upstream_limit, upstream_limit_async
+from app.utils.tracing import annotate
+from typing import Awaitable, Callable, Dict, List, Optional
+import hashlib
+import httpx
+import requests
 import json
+import threading
+import time
 
 # Initialize the client with your API key
 api_key = config("MISTRAL_KEY")
-client = Mistral(api_key=api_key)
+# MISTRAL_SERVER_URL points the client at a local stand-in (see bench/)
+client = Mistral(api_key=api_key, server_url=config("MISTRAL_SERVER_URL", default=None))
 
+# Descriptions of profile pictures, keyed by image content. A lead's photo
+# rarely changes so entries live for a month by default.
+vision_cache = TTLCache("vision", ttl=config("VISION_CACHE_TTL", default=30 * 24 * 60 * 60, cast=int))
 
-def describe_person_from_url(image_url: str, prompt: str = None) -> str:
-	if prompt is None:
-		prompt = """
+# Landing page copy, keyed by the exact inputs of the prompt
+copy_cache = TTLCache("copy", ttl=config("COPY_CACHE_TTL", default=7 * 24 * 60 * 60, cast=int))
+
+IMAGE_DOWNLOAD_TIMEOUT = 10
+
+
+DEFAULT_VISION_PROMPT = """
 		Describe the person in the image. Age gender, hair color, ethnicity, clothing. and facial traits. if there is none, provide a description of a random person
 		
 		Give enough details to sketch him for a portrait robot
@@ -20,33 +38,129 @@ def describe_person_from_url(image_url: str, prompt: str = None) -> str:
 		
 		"""
 
+
+def _vision_request(image_url: str, prompt: str = None) -> dict:
+	"""Arguments of the Pixtral chat call describing a profile picture"""
+	if prompt is None:
+		prompt = DEFAULT_VISION_PROMPT
+
+	return dict(
+		model="pixtral-12b-2409",
+		messages=[
+			{
+				"role": "user",
+				"content": [
+					{
+						"type": "text",
+						"text": prompt
+					},
+					{
+						"type": "image_url",
+						"image_url": image_url
+					}
+				]
+			}
+		],
+		temperature=0.3,
+		max_tokens=1000
+	)
+
+
+def _vision_cache_key(image_bytes: bytes, prompt: str = None) -> Optional[str]:
+	"""
+	Key a description by the hash of the picture itself and the prompt.
+	None when there is no picture to hash (no URL, or the download failed):
+	those descriptions are not cached, they would all share one key.
+	"""
+	if not image_bytes:
+		return None
+	prompt_hash = hashlib.sha256((prompt or DEFAULT_VISION_PROMPT).encode("utf-8")).hexdigest()[:12]
+	return f"sha256:{hashlib.sha256(image_bytes).hexdigest()}:{prompt_hash}"
+
+
+def _download_image(image_url: str) -> bytes:
+	try:
+		response = requests.get(image_url, timeout=IMAGE_DOWNLOAD_TIMEOUT)
+		response.raise_for_status()
+		return response.content
+	except Exception as e:
+		print(f"Could not download image for hashing: {e}")
+		return b""
+
+
+async def _download_image_async(image_url: str) -> bytes:
+	try:
+		async with httpx.AsyncClient(timeout=IMAGE_DOWNLOAD_TIMEOUT) as http:
+			response = await http.get(image_url)
+			response.raise_for_status()
+			return response.content
+	except Exception as e:
+		print(f"Could not download image for hashing: {e}")
+		return b""
+
+
+def describe_person_from_url(image_url: str, prompt: str = None, use_cache: bool = True) -> str:
+	cache_key = None
+	if use_cache and image_url:
+		cache_key = _vision_cache_key(_download_image(image_url), prompt)
+	if cache_key:
+		cached = vision_cache.get(cache_key)
+		if cached:
+			# Count the latency of the original call as saved
+			vision_cache.count("hits")
+			vision_cache.count("saved_seconds", float(cached.get("latency", 0.0)))
+			print(f"✅ Reused cached image description")
+			return cached["description"]
+		vision_cache.count("misses")
+
 	try:
 		# Use Mistral's Pixtral vision model
-		response = client.chat.complete(
-			model="pixtral-12b-2409",
-			messages=[
-				{
-					"role": "user",
-					"content": [
-						{
-							"type": "text",
-							"text": prompt
-						},
-						{
-							"type": "image_url",
-							"image_url": image_url
-						}
-					]
-				}
-			],
-			temperature=0.3,
-			max_tokens=1000
-		)
+		started = time.perf_counter()
+		with upstream_limit("mistral"):
+			response = client.chat.complete(**_vision_request(image_url, prompt))
+			_trace_response(response)
 
 		description = response.choices[0].message.content.strip()
 
 		print(f"✅ Successfully described image from: {image_url}")
 
+		if cache_key:
+			vision_cache.set(cache_key, {"description": description, "latency": time.perf_counter() - started})
+
+		return description
+
+	except Exception as e:
+		print(f"❌ Error describing image: {e}")
+		raise
+
+
+async def describe_person_from_url_async(image_url: str, prompt: str = None, use_cache: bool = True) -> str:
+	"""Async variant of describe_person_from_url"""
+	cache_key = None
+	if use_cache and image_url:
+		cache_key = _vision_cache_key(await _download_image_async(image_url), prompt)
+	if cache_key:
+		cached = await vision_cache.aget(cache_key)
+		if cached:
+			await vision_cache.acount("hits")
+			await vision_cache.acount("saved_seconds", float(cached.get("latency", 0.0)))
+			print(f"✅ Reused cached image description")
+			return cached["description"]
+		await vision_cache.acount("misses")
+
+	try:
+		started = time.perf_counter()
+		async with upstream_limit_async("mistral"):
+			response = await client.chat.complete_async(**_vision_request(image_url, prompt))
+			_trace_response(response)
+
+		description = response.choices[0].message.content.strip()
+
+		print(f"✅ Successfully described image from: {image_url}")
+
+		if cache_key:
+			await vision_cache.aset(cache_key, {"description": description, "latency": time.perf_counter() - started})
+
 		return description
 
 	except Exception as e:
@@ -70,18 +184,8 @@ def generate_image_prompt(product_description: str, lead_description: str) -> st
 	return prompt
 
 
-def generate_landing_page_content(product_description: str, job_title: str, last_posts_texts: list = None) -> dict:
-	"""
-	Generate complete landing page content tailored to the product and target audience.
-
-	Args:
-		product_description: Description of the product
-		job_title: Job title of the target lead
-		last_posts_texts: List of recent post texts from the LinkedIn profile
-
-	Returns:
-		Dictionary with landing page content structured for LandingPage model
-	"""
+def _landing_page_request(product_description: str, job_title: str, last_posts_texts: list = None) -> dict:
+	"""Arguments of the mistral-large chat call generating the landing page copy"""
 	# Build context from posts if available
 	posts_context = ""
 	if last_posts_texts and len(last_posts_texts) > 0:
@@ -146,7 +250,7 @@ Return ONLY valid JSON in this exact structure, no additional text:
   ]
 }}"""
 
-	response = client.chat.complete(
+	return dict(
 		model="mistral-large-latest",
 		messages=[
 			{
@@ -159,5 +263,213 @@ Return ONLY valid JSON in this exact structure, no additional text:
 		response_format={"type": "json_object"}
 	)
 
-	content = response.choices[0].message.content
-	return json.loads(content)
+
+def _copy_cache_key(request: dict, product_description: str, job_title: str, last_posts_texts: list = None) -> str:
+	"""Canonical hash of exactly what the prompt is built from, plus the model settings"""
+	posts = [post_text[:300] for post_text in (last_posts_texts or [])[:3] if post_text]
+	inputs = {
+		"product_description": product_description,
+		"job_title": job_title,
+		"posts": posts,
+		"model": request["model"],
+		"temperature": request["temperature"],
+		"max_tokens": request["max_tokens"],
+	}
+	canonical = json.dumps(inputs, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+	return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# Sections of the generated copy, each published as soon as all of its keys are complete
+COPY_SECTIONS = {
+	"hero": ("product_name", "hero_title", "hero_subtitle", "hero_social_proof", "hero_cta_primary", "hero_cta_secondary"),
+	"features": ("features_headline", "features"),
+	"testimonials": ("testimonials_headline", "testimonials"),
+}
+
+
+class _SectionTracker:
+	"""Collects the members of the streamed copy and tells which sections they completed"""
+
+	def __init__(self):
+		self.content = {}
+		self.published = set()
+
+	def add(self, key: str, value) -> List[str]:
+		self.content[key] = value
+		return self.completed()
+
+	def completed(self) -> List[str]:
+		names = [
+			name for name, keys in COPY_SECTIONS.items()
+			if name not in self.published and all(key in self.content for key in keys)
+		]
+		self.published.update(names)
+		return names
+
+	def section(self, name: str) -> dict:
+		return {key: self.content[key] for key in COPY_SECTIONS[name]}
+
+
+def _delta_text(event) -> str:
+	"""Text carried by a chat stream event, if any"""
+	delta = event.data.choices[0].delta.content if event.data.choices else None
+	return delta if isinstance(delta, str) else ""
+
+
+def _trace_response(response):
+	"""Record the request id and token counts of a completion (or its last stream chunk) on the trace"""
+	usage = getattr(response, "usage", None)
+	annotate(
+		request_id=getattr(response, "id", None),
+		prompt_tokens=getattr(usage, "prompt_tokens", None),
+		completion_tokens=getattr(usage, "completion_tokens", None),
+	)
+
+
+def _stream_copy(request: dict, on_section: Callable[[str, dict], None]) -> dict:
+	"""
+	Stream the completion and parse the JSON object as it arrives, calling
+	`on_section(name, fields)` as each section of COPY_SECTIONS closes.
+	Sections left unpublished (e.g. the output wasn't parseable incrementally)
+	are published from the full document at the end.
+	"""
+	parser = JsonObjectParser()
+	tracker = _SectionTracker()
+	text = []
+	incremental = True
+	with upstream_limit("mistral"):
+		for event in client.chat.stream(**request):
+			delta = _delta_text(event)
+			text.append(delta)
+			if event.data.usage:
+				_trace_response(event.data)
+			if not incremental or not delta:
+				continue
+			try:
+				members = parser.feed(delta)
+			except ValueError:
+				incremental = False
+				continue
+			for key, value in members:
+				for name in tracker.add(key, value):
+					on_section(name, tracker.section(name))
+
+	content = json.loads("".join(text))
+	tracker.content = dict(content)
+	for name in tracker.completed():
+		on_section(name, tracker.section(name))
+	return content
+
+
+async def _stream_copy_async(request: dict, on_section: Callable[[str, dict], Awaitable[None]]) -> dict:
+	"""Async variant of _stream_copy, `on_section` is a coroutine function"""
+	parser = JsonObjectParser()
+	tracker = _SectionTracker()
+	text = []
+	incremental = True
+	async with upstream_limit_async("mistral"):
+		response = await client.chat.stream_async(**request)
+		async for event in response:
+			delta = _delta_text(event)
+			text.append(delta)
+			if event.data.usage:
+				_trace_response(event.data)
+			if not incremental or not delta:
+				continue
+			try:
+				members = parser.feed(delta)
+			except ValueError:
+				incremental = False
+				continue
+			for key, value in members:
+				for name in tracker.add(key, value):
+					await on_section(name, tracker.section(name))
+
+	content = json.loads("".join(text))
+	tracker.content = dict(content)
+	for name in tracker.completed():
+		await on_section(name, tracker.section(name))
+	return content
+
+
+def _cached_sections(content: dict) -> Dict[str, dict]:
+	tracker = _SectionTracker()
+	tracker.content = content
+	return {name: tracker.section(name) for name in tracker.completed()}
+
+
+def generate_landing_page_content(product_description: str, job_title: str, last_posts_texts: list = None, fresh: bool = False, on_section: Optional[Callable[[str, dict], None]] = None) -> dict:
+	"""
+	Generate complete landing page content tailored to the product and target audience.
+	Results are memoized on the prompt inputs, so regenerating a page after a
+	downstream failure doesn't pay for the LLM call again.
+
+	Args:
+		product_description: Description of the product
+		job_title: Job title of the target lead
+		last_posts_texts: List of recent post texts from the LinkedIn profile
+		fresh: Bypass the cache to get a new variant (the result replaces the cached one)
+		on_section: Streaming mode, called with (name, fields) as each of COPY_SECTIONS
+		            is complete, while the rest of the completion is still generating
+
+	Returns:
+		Dictionary with landing page content structured for LandingPage model
+	"""
+	request = _landing_page_request(product_description, job_title, last_posts_texts)
+	cache_key = _copy_cache_key(request, product_description, job_title, last_posts_texts)
+	# Only the inline computation streams, not a stale-while-revalidate refresh thread
+	caller = threading.current_thread()
+	state = {"streamed": False}
+
+	def complete() -> dict:
+		if on_section and threading.current_thread() is caller:
+			state["streamed"] = True
+			return _stream_copy(request, on_section)
+
+		with upstream_limit("mistral"):
+			response = client.chat.complete(**request)
+			_trace_response(response)
+
+		content = response.choices[0].message.content
+		return json.loads(content)
+
+	if fresh:
+		content = complete()
+		copy_cache.set(cache_key, content)
+		return content
+	content = copy_cache.get_or_compute(cache_key, complete)
+	if on_section and not state["streamed"]:
+		for name, fields in _cached_sections(content).items():
+			on_section(name, fields)
+	return content
+
+
+async def generate_landing_page_content_async(product_description: str, job_title: str, last_posts_texts: list = None, fresh: bool = False, on_section: Optional[Callable[[str, dict], Awaitable[None]]] = None) -> dict:
+	"""Async variant of generate_landing_page_content, `on_section` is a coroutine function"""
+	request = _landing_page_request(product_description, job_title, last_posts_texts)
+	cache_key = _copy_cache_key(request, product_description, job_title, last_posts_texts)
+	# Only the inline computation streams, not a stale-while-revalidate refresh
+	state = {"live": True, "streamed": False}
+
+	async def complete() -> dict:
+		if on_section and state["live"]:
+			state["streamed"] = True
+			return await _stream_copy_async(request, on_section)
+
+		async with upstream_limit_async("mistral"):
+			response = await client.chat.complete_async(**request)
+			_trace_response(response)
+
+		content = response.choices[0].message.content
+		return json.loads(content)
+
+	if fresh:
+		content = await complete()
+		await copy_cache.aset(cache_key, content)
+		return content
+	content = await copy_cache.aget_or_compute(cache_key, complete)
+	state["live"] = False
+	if on_section and not state["streamed"]:
+		for name, fields in _cached_sections(content).items():
+			await on_section(name, fields)
+	return content
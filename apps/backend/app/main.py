@@ -1,6 +1,6 @@
-from fastapi import FastAPI, HTTPException, Form, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Form, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import redis.asyncio as redis
@@ -8,8 +8,21 @@ import json
 import os
 import logging
 import asyncio
-from typing import Dict, Set
-from app.workflow import workflow
+from typing import List, Optional
+from app.jobs import submit_job, get_job_status, page_id_from_linkedin_url
+from app.utils.redis_client import get_async_redis, get_async_binary_redis, close_async_redis
+from app.assets import ASSET_NAME_PATTERN, MEDIA_TYPES, asset_path
+from app.fal import image_cache
+from app.batch import detect_format, parse_rows, run_batch
+from app.utils.cache import all_cache_stats
+from app.utils.limits import limit_stats
+from app.utils.metrics import add_gauge_async, render_metrics
+from app.utils.tracing import load_trace, render_waterfall
+from app.utils.notifications import CompletionWaiter, FAILED
+from app.utils.page_sections import SECTIONS, SECTION_FIELDS, PENDING, READY, project_page, read_sections
+from app.utils.landing_render import LandingRenderer
+from app.utils.page_store import queue_page_write, read_page, decode_page, is_compressed, page_json
+from app.utils.log_stream import LogFanout, parse_stream_id, format_entries
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,10 +31,13 @@ logger = logging.getLogger(__name__)
 app = FastAPI(title="Landing Page API")
 
 # Mount static files for frontend (if directory exists)
-frontend_dist = "/app/frontend/dist"
+frontend_dist = os.getenv("FRONTEND_DIST", "/app/frontend/dist")
 if os.path.exists(frontend_dist):
     app.mount("/assets", StaticFiles(directory=f"{frontend_dist}/assets"), name="assets")
 
+# index.html rendered with the page content, see serve_landing_page
+landing_renderer = LandingRenderer(f"{frontend_dist}/index.html", int(os.getenv("LANDING_CACHE_SIZE", 256)))
+
 # CORS middleware to allow frontend requests
 app.add_middleware(
     CORSMiddleware,
@@ -33,26 +49,43 @@ app.add_middleware(
 
 # Redis connection
 redis_client = None
+# Same server, returning raw bytes for the pages served as stored
+binary_redis = None
+
+# One Redis stream reader per page, fanned out to the local WebSocket connections
+log_fanout: LogFanout = None
+
+# Single pub/sub subscription resolving the /api/content long-polls
+completion_waiter: CompletionWaiter = None
+# Longest wait accepted by /api/content/{id}?wait=
+MAX_CONTENT_WAIT = 60
+
+# Complete pages may be cached this long, then revalidated with their ETag
+CONTENT_CACHE_CONTROL = os.getenv("CONTENT_CACHE_CONTROL", "public, max-age=60")
 
-# WebSocket connections for log streaming
-active_connections: Dict[str, Set[WebSocket]] = {}
-log_queues: Dict[str, asyncio.Queue] = {}
+# Bulk generation: rows in flight per batch, and how long a row may take
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 10))
+MAX_BATCH_CONCURRENCY = int(os.getenv("MAX_BATCH_CONCURRENCY", 50))
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", 1000))
+BATCH_ROW_TIMEOUT = int(os.getenv("BATCH_ROW_TIMEOUT", 600))
 
 @app.on_event("startup")
 async def startup_event():
-    global redis_client
-    redis_host = os.getenv("REDIS_HOST", "redis")
-    redis_port = int(os.getenv("REDIS_PORT", 6379))
-    redis_client = await redis.from_url(
-        f"redis://{redis_host}:{redis_port}",
-        encoding="utf-8",
-        decode_responses=True
-    )
+    global redis_client, binary_redis, log_fanout, completion_waiter
+    # Shared process-wide pool (see app.utils.redis_client)
+    redis_client = get_async_redis()
+    binary_redis = get_async_binary_redis()
+    log_fanout = LogFanout(redis_client)
+    completion_waiter = CompletionWaiter(redis_client)
+    await completion_waiter.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    if redis_client:
-        await redis_client.close()
+    if log_fanout:
+        await log_fanout.close()
+    if completion_waiter:
+        await completion_waiter.close()
+    await close_async_redis()
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -169,6 +202,10 @@ async def root():
                     />
                 </div>
                 
+                <div class="form-group">
+                    <label><input type="checkbox" id="fresh" name="fresh" style="width: auto;" /> Generate a fresh variant (skip cached image and copy)</label>
+                </div>
+                
                 <button type="submit">Generate Landing Page</button>
             </form>
             
@@ -178,11 +215,16 @@ async def root():
         
         <script>
             let ws = null;
+            let lastLogId = null;
+            let keepStreaming = false;
             
             function connectWebSocket(pageId) {
                 const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-                const wsUrl = `${protocol}//${window.location.host}/ws/logs/${pageId}`;
+                // Resume after the last event received when reconnecting
+                const resume = lastLogId ? `?last_id=${encodeURIComponent(lastLogId)}` : '';
+                const wsUrl = `${protocol}//${window.location.host}/ws/logs/${pageId}${resume}`;
                 
+                keepStreaming = true;
                 ws = new WebSocket(wsUrl);
                 const logsContainer = document.getElementById('logsContainer');
                 
@@ -193,10 +235,14 @@ async def root():
                 
                 ws.onmessage = (event) => {
                     const data = JSON.parse(event.data);
-                    if (data.logs && data.logs.length > 0) {
-                        logsContainer.innerHTML = data.logs.map(log => 
-                            `<div class="log-line">${log}</div>`
-                        ).join('');
+                    if (data.events && data.events.length > 0) {
+                        for (const logEvent of data.events) {
+                            const line = document.createElement('div');
+                            line.className = 'log-line';
+                            line.textContent = logEvent.message;
+                            logsContainer.appendChild(line);
+                            lastLogId = logEvent.id;
+                        }
                     }
                 };
                 
@@ -206,27 +252,46 @@ async def root():
                 
                 ws.onclose = () => {
                     console.log('WebSocket disconnected');
+                    if (keepStreaming) {
+                        setTimeout(() => { if (keepStreaming) connectWebSocket(pageId); }, 1000);
+                    }
                 };
             }
             
             function disconnectWebSocket() {
+                keepStreaming = false;
                 if (ws) {
                     ws.close();
                     ws = null;
                 }
             }
 
-            async function checkPageReady(pageId, maxAttempts = 60) {
-                for (let i = 0; i < maxAttempts; i++) {
+            async function checkPageReady(pageId, timeoutMs = 180000) {
+                // Long-poll: the server answers as soon as a section or the whole page is
+                // stored, partial answers just mean the generation is still going
+                const deadline = Date.now() + timeoutMs;
+                while (Date.now() < deadline) {
                     try {
-                        const response = await fetch('/api/content/' + pageId);
+                        const response = await fetch('/api/content/' + pageId + '?wait=60');
+                        const data = await response.json();
                         if (response.ok) {
-                            return true;
+                            // Partial pages come back with the sections still pending
+                            const states = Object.values(data.status || {});
+                            if (states.every(state => state === 'ready')) {
+                                return true;
+                            }
+                            if (states.includes('failed')) {
+                                return false;
+                            }
+                            continue;
+                        }
+                        if (data.detail && data.detail.startsWith('Generation failed')) {
+                            return false;
                         }
                     } catch (error) {
-                        console.log('Checking...', i + 1);
+                        console.log('Checking...');
+                        await new Promise(resolve => setTimeout(resolve, 2000));
                     }
-                    await new Promise(resolve => setTimeout(resolve, 2000)); // Wait 2 seconds
                 }
                 return false;
             }
@@ -237,6 +302,7 @@ async def root():
                 const formData = new FormData();
                 formData.append('product_description', document.getElementById('product_description').value);
                 formData.append('linkedin_url', document.getElementById('linkedin_url').value);
+                formData.append('fresh', document.getElementById('fresh').checked);
                 
                 try {
                     const response = await fetch('/api/generate', {
@@ -252,6 +318,8 @@ async def root():
                         const pageId = data.landing_page_url.split('id=')[1];
                         
                         // Connect to WebSocket for logs
+                        lastLogId = null;
+                        document.getElementById('logsContainer').innerHTML = '';
                         connectWebSocket(pageId);
                         
                         // Show loading state
@@ -292,63 +360,244 @@ async def root():
 
 @app.post("/api/generate")
 async def generate_landing_page(
-    background_tasks: BackgroundTasks,
     product_description: str = Form(...),
-    linkedin_url: str = Form(...)
+    linkedin_url: str = Form(...),
+    fresh: bool = Form(False)
 ):
     """
     Generate a landing page based on product description and LinkedIn URL
-    Runs the workflow in the background
+    Enqueues a job in Redis, the generation itself runs in a worker process (app.worker)
+    Set `fresh` to bypass the generation caches and get a new variant
     """
     # Extract username from LinkedIn URL - each user has ONE page that gets overwritten
-    username = linkedin_url.rstrip('/').split('/')[-1]
-    
-    # Delete old page data from Redis before starting generation
-    # This ensures the frontend polling won't find stale data
-    try:
-        await redis_client.delete(f"page:{username}")
-        logger.info(f"Deleted old page data for: {username}")
-    except Exception as e:
-        logger.warning(f"Could not delete old page data: {e}")
+    username = page_id_from_linkedin_url(linkedin_url)
     
     # Use relative URL so it works regardless of deployment location
     landing_page_url = f"/landing?id={username}"
     
-    # Run workflow in background with the username as page_id
-    background_tasks.add_task(workflow, product_description, linkedin_url, username)
+    # Queue the generation with the username as page_id, or attach to the
+    # identical generation already in flight (double-clicks, retries, several reps)
+    try:
+        created = await submit_job(redis_client, username, product_description, linkedin_url, fresh=fresh)
+    except redis.RedisError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+
+    if created:
+        logger.info(f"Queued generation for: {username}")
+    else:
+        logger.info(f"Attached to in-flight generation for: {username}")
     
     return {
-        "message": "Landing page generation started!",
+        "message": "Landing page generation started!" if created else "Landing page generation already in progress!",
         "landing_page_url": landing_page_url,
         "page_id": username,
-        "status": "processing"
+        "status": "queued" if created else "attached"
     }
 
+@app.post("/api/generate/batch")
+async def generate_batch(
+    request: Request,
+    concurrency: int = Query(BATCH_CONCURRENCY, ge=1, le=MAX_BATCH_CONCURRENCY),
+    fresh: bool = Query(False)
+):
+    """
+    Generate landing pages for a list of leads
+    Body: JSONL or CSV (with header) rows of linkedin_url, product_description
+    Rows are queued as jobs, at most `concurrency` at a time, and the response
+    streams NDJSON: a `result` line per row as it completes, each followed by
+    a `progress` line {total, done, failed, in_flight, throughput_per_minute, eta_seconds}
+    Rows for the same LinkedIn profile share one generation (see app.batch)
+    """
+    text = (await request.body()).decode("utf-8", errors="replace")
+    rows = parse_rows(text, detect_format(text, request.headers.get("content-type")))
+    if not rows:
+        raise HTTPException(status_code=400, detail="No rows in batch")
+    if len(rows) > BATCH_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {BATCH_MAX_ROWS} rows")
+
+    async def run_row(row: dict) -> dict:
+        page_id = page_id_from_linkedin_url(row["linkedin_url"])
+        # Register before submitting so the completion can't be missed
+        future = completion_waiter.register(page_id)
+        try:
+            await submit_job(redis_client, page_id, row["product_description"], row["linkedin_url"], fresh=fresh)
+            status = await completion_waiter.wait(future, BATCH_ROW_TIMEOUT)
+        finally:
+            completion_waiter.unregister(page_id, future)
+        if status is None:
+            raise asyncio.TimeoutError()
+        if status == FAILED:
+            raise RuntimeError("Generation failed")
+        return {"page_id": page_id, "landing_page_url": f"/landing?id={page_id}"}
+
+    async def stream():
+        async for line in run_batch(rows, run_row, concurrency=concurrency):
+            yield json.dumps(line) + "\n"
+
+    logger.info(f"Started batch of {len(rows)} rows (concurrency {concurrency})")
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/api/jobs/{page_id}")
+async def get_job(page_id: str):
+    """
+    Get the status of the generation job of a page
+    Returns: {status, stage, attempts, queue_position, error, timestamps}
+    """
+    try:
+        job = await get_job_status(redis_client, page_id)
+    except redis.RedisError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Job not found for ID: {page_id}"
+        )
+
+    return job
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Sections requested with ?fields=hero,features (all of them when omitted)"""
+    if not fields:
+        return list(SECTIONS)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SECTION_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)} (expected {', '.join(SECTIONS)})"
+        )
+    return names
+
+def pending_sections(sections) -> Optional[set]:
+    """Requested sections still pending, None while the page has no sections stored"""
+    if sections is None:
+        return None
+    return {name for name, state in sections[1].items() if state == PENDING}
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Whether gzip has a non-zero q-value in Accept-Encoding, by name or through *"""
+    qualities = {}
+    for item in (accept_encoding or "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+def page_response(request: Request, stored: bytes, version: str, names: List[str], projected: bool) -> Response:
+    """
+    Complete page with its ETag, 304 when the client already has this version
+    The stored bytes are returned as-is, unless a projection was asked for
+    or they are gzipped and the client doesn't accept gzip
+    """
+    gzipped = not projected and is_compressed(stored) and accepts_gzip(request.headers.get("accept-encoding"))
+    # Each representation has its own ETag, caches must not serve one for the other
+    etag = f'"{version}-{"+".join(names)}"' if projected else f'"{version}-gz"' if gzipped else f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": CONTENT_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if projected:
+        content = project_page(decode_page(stored), names)
+        content["status"] = {name: READY for name in names}
+        return JSONResponse(content, headers=headers)
+
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    elif is_compressed(stored):
+        stored = page_json(stored)
+    return Response(content=stored, media_type="application/json", headers=headers)
+
 @app.get("/api/content/{page_id}")
-async def get_content(page_id: str):
+async def get_content(
+    request: Request,
+    page_id: str,
+    wait: int = Query(0, ge=0, le=MAX_CONTENT_WAIT),
+    fields: Optional[str] = Query(None)
+):
     """
     Get page content by ID from Redis
-    Returns: {title, subtitle, and any other stored fields}
+    A complete page is returned as stored, with an ETag (If-None-Match -> 304)
+    While the page is generating, returns the sections that are ready so far,
+    with a `status` map {section: pending|ready|failed} (no status means complete)
+    With ?fields=hero,hero_image,logos,features,testimonials, returns only those sections
+    With ?wait=N, waits up to N seconds while the requested sections are pending
+    and returns as soon as one of them, or the whole page, is stored (long-poll)
+    Returns: {id, title, subtitle, and any other ready fields}
     """
+    names = parse_fields(fields)
+    future = completion_waiter.register(page_id, sections=True) if wait else None
     try:
         # Get data from Redis
-        data = await redis_client.get(f"page:{page_id}")
+        stored, version = await read_page(binary_redis, page_id)
+        sections = None if stored else await read_sections(redis_client, page_id, names)
+
+        pending = pending_sections(sections)
+        deadline = asyncio.get_running_loop().time() + wait
+        while stored is None and future is not None and pending != set():
+            status = await completion_waiter.wait(future, deadline - asyncio.get_running_loop().time())
+            completion_waiter.unregister(page_id, future)
+            future = None
+            if status == FAILED:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Generation failed for ID: {page_id}"
+                )
+            if status is not None and asyncio.get_running_loop().time() < deadline:
+                # Registered again before reading, so the next section can't slip in between
+                future = completion_waiter.register(page_id, sections=True)
+            stored, version = await read_page(binary_redis, page_id)
+            if stored is None:
+                sections = await read_sections(redis_client, page_id, names)
+                now_pending = pending_sections(sections)
+                if now_pending is not None and (pending is None or now_pending < pending):
+                    break
 
-        if data is None:
+        if stored is not None:
+            return page_response(request, stored, version, names, projected=bool(fields))
+
+        if sections is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"Content not found for ID: {page_id}"
             )
 
-        # Parse JSON data
-        content = json.loads(data)
-        return content
+        # Partial page, changes as the generation goes
+        content, status = sections
+        return JSONResponse({"id": page_id, **content, "status": status}, headers={"Cache-Control": "no-store"})
 
     except redis.RedisError as e:
         raise HTTPException(
             status_code=500,
             detail=f"Database error: {str(e)}"
         )
+    finally:
+        if future is not None:
+            completion_waiter.unregister(page_id, future)
 
 @app.post("/api/content/{page_id}")
 async def create_content(
@@ -411,10 +660,9 @@ async def create_content(
                 content["companyLogos"]["logo4"] = company_logo4
 
         # Store in Redis
-        await redis_client.set(
-            f"page:{page_id}",
-            json.dumps(content)
-        )
+        async with redis_client.pipeline(transaction=True) as pipe:
+            queue_page_write(pipe, page_id, content)
+            await pipe.execute()
 
         return {"message": "Content saved successfully", "data": content}
 
@@ -424,6 +672,25 @@ async def create_content(
             detail=f"Database error: {str(e)}"
         )
 
+@app.get("/api/trace/{page_id}")
+async def get_trace(page_id: str, view: str = Query("json", pattern="^(json|waterfall)$")):
+    """
+    Span tree of the page's last generation (stages, upstream calls, cache lookups)
+    ?view=waterfall renders it as a compact text timeline
+    """
+    try:
+        trace = await load_trace(redis_client, page_id)
+    except redis.RedisError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    if view == "waterfall":
+        return Response(content=render_waterfall(trace), media_type="text/plain; charset=utf-8")
+    return trace
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
@@ -433,49 +700,177 @@ async def health_check():
     except Exception as e:
         return {"status": "unhealthy", "error": str(e)}
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss counters of the upstream caches"""
+    try:
+        return await all_cache_stats()
+    except redis.RedisError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+
+@app.get("/api/upstream/stats")
+async def upstream_stats():
+    """Request, retry, error and latency counters of the upstream HTTP clients"""
+    try:
+        stats = {}
+        async for key in redis_client.scan_iter(match="http:stats:*"):
+            counters = {field: float(value) for field, value in (await redis_client.hgetall(key)).items()}
+            requests_count = counters.get("requests", 0)
+            counters["avg_latency_seconds"] = round(counters.get("latency_seconds_total", 0) / requests_count, 3) if requests_count else 0.0
+            stats[key[len("http:stats:"):]] = counters
+        return stats
+    except redis.RedisError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+
+@app.get("/api/upstream/limits")
+async def upstream_limits():
+    """Cluster-wide limits of each upstream, with the calls in flight and waiting for a slot"""
+    try:
+        return await limit_stats()
+    except redis.RedisError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics of every API and worker process"""
+    try:
+        return Response(content=await render_metrics(), media_type="text/plain; version=0.0.4")
+    except redis.RedisError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+
 @app.websocket("/ws/logs/{page_id}")
-async def websocket_logs(websocket: WebSocket, page_id: str):
-    """WebSocket endpoint for streaming generation logs"""
+async def websocket_logs(websocket: WebSocket, page_id: str, last_id: Optional[str] = None):
+    """
+    WebSocket endpoint for streaming generation logs
+    Sends {"events": [{"id", "message"}]} batches; reconnect with ?last_id=<id>
+    to resume after the last event received
+    """
+    if last_id:
+        try:
+            parse_stream_id(last_id)
+        except ValueError:
+            # Rejected before the handshake completes (HTTP 403)
+            await websocket.close(code=1008, reason=f"Invalid last_id: {last_id}")
+            return
+
     await websocket.accept()
+    await add_gauge_async("pioneer_websocket_connections", 1)
     
-    # Add this connection to active connections
-    if page_id not in active_connections:
-        active_connections[page_id] = set()
-    active_connections[page_id].add(websocket)
+    # Subscribe before reading the backlog so nothing written in between is lost
+    queue = await log_fanout.subscribe(page_id)
+    sender = asyncio.create_task(send_logs(websocket, page_id, queue, last_id))
     
     try:
-        # Keep connection alive and send logs from Redis
+        # Only used to notice the client going away
         while True:
-            # Check for logs in Redis
-            log_key = f"logs:{page_id}"
-            logs = await redis_client.lrange(log_key, -5, -1)  # Get last 5 logs
-            
-            if logs:
-                await websocket.send_json({"logs": logs})
-            
-            await asyncio.sleep(0.5)  # Check every 500ms
-            
+            await websocket.receive_text()
     except WebSocketDisconnect:
-        active_connections[page_id].discard(websocket)
-        if not active_connections[page_id]:
-            del active_connections[page_id]
+        pass
+    finally:
+        sender.cancel()
+        log_fanout.unsubscribe(page_id, queue)
+        await add_gauge_async("pioneer_websocket_connections", -1)
+
+async def send_logs(websocket: WebSocket, page_id: str, queue: asyncio.Queue, last_id: Optional[str]):
+    """Send the backlog after last_id, then every new event pushed by the fan-out"""
+    cursor = parse_stream_id(last_id) if last_id else (0, 0)
+
+    async def send(entries):
+        nonlocal cursor
+        entries = [entry for entry in entries if parse_stream_id(entry[0]) > cursor]
+        if entries:
+            cursor = parse_stream_id(entries[-1][0])
+            await websocket.send_json({"events": format_entries(entries)})
 
-async def emit_log(page_id: str, message: str):
-    """Emit a log message to Redis for WebSocket streaming"""
     try:
-        log_key = f"logs:{page_id}"
-        await redis_client.rpush(log_key, message)
-        await redis_client.expire(log_key, 300)  # Expire logs after 5 minutes
-        # Keep only last 5 logs
-        await redis_client.ltrim(log_key, -5, -1)
+        await send(await log_fanout.backlog(page_id, last_id))
+        while True:
+            await send(await queue.get())
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
-        logger.error(f"Failed to emit log: {e}")
+        logger.warning(f"Stopped streaming logs for {page_id}: {e}")
+        # Don't leave the client on an open socket that never sends anything
+        await websocket.close(code=1011)
+
+@app.get("/cache/images/{name}")
+async def serve_cached_image(name: str):
+    """
+    Serve a hero image kept by the image cache (shared volume with the workers)
+    Once evicted, redirects to the image's fal URL for the pages still linking here
+    """
+    if not image_cache.FILE_NAME_PATTERN.fullmatch(name):
+        raise HTTPException(status_code=404, detail="Image not found")
+    path = image_cache.file_path(name)
+    if os.path.exists(path):
+        return FileResponse(path, media_type=image_cache.MEDIA_TYPES[name.rsplit(".", 1)[1]])
+
+    try:
+        url = await image_cache.aevicted_url(name)
+    except redis.RedisError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+    if url is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return RedirectResponse(url, status_code=307)
+
+@app.get("/media/{name}")
+async def serve_asset(name: str):
+    """
+    Serve a mirrored image (see app.assets)
+    Files are content-addressed and never change, so they are cached forever
+    """
+    path = asset_path(name)
+    if not ASSET_NAME_PATTERN.fullmatch(name) or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return FileResponse(
+        path,
+        media_type=MEDIA_TYPES[name.rsplit(".", 1)[1]],
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
 
 @app.get("/landing")
-async def serve_landing_page():
-    """Serve the React landing page"""
-    frontend_index = "/app/frontend/dist/index.html"
-    if os.path.exists(frontend_index):
-        return FileResponse(frontend_index)
-    else:
+async def serve_landing_page(request: Request, id: Optional[str] = None):
+    """
+    Serve the React landing page
+    With ?id= of a generated page, its content is embedded in the HTML
+    (window.__PAGE_CONTENT__) with a preload of the hero image, so the app
+    renders without a round trip to /api/content
+    """
+    try:
+        template = landing_renderer.template
+    except OSError:
         raise HTTPException(status_code=404, detail="Landing page not found")
+
+    stored = None
+    if id:
+        try:
+            stored, version = await read_page(binary_redis, id)
+        except redis.RedisError as e:
+            logger.warning(f"Serving landing page {id} without content: {e}")
+
+    if stored is None:
+        # Unknown or still generating, the app fetches the content itself
+        return HTMLResponse(content=template, headers={"Cache-Control": "no-cache"})
+
+    etag = f'"{landing_renderer.template_version}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": CONTENT_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    body = landing_renderer.get(id, version, lambda: decode_page(stored))
+    return HTMLResponse(content=body, headers=headers)
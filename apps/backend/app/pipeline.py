@@ -0,0 +1,240 @@
+"""
+Minimal stage DAG runner for the generation workflow.
+
+A workflow is a list of stages that declare which named values they read
+and which named values they produce. Stages whose inputs are all available
+are started right away, so independent branches run concurrently and the
+total latency ends up close to the longest branch instead of the sum.
+"""
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import inspect
+import time
+
+
+@dataclass
+class Stage:
+    """A single step of the workflow"""
+    name: str
+    fn: Callable[..., Any]
+    inputs: Tuple[str, ...] = ()
+    # A single output name stores the return value as-is, several names
+    # unpack a returned tuple in order.
+    outputs: Tuple[str, ...] = ()
+    # Optional stages swallow their errors and publish `default` instead
+    optional: bool = False
+    default: Any = None
+
+
+@dataclass
+class StageTiming:
+    """Wall clock timing of a stage, relative to the start of the run"""
+    name: str
+    started_at: float
+    finished_at: float
+    ok: bool = True
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return self.finished_at - self.started_at
+
+
+@dataclass
+class RunResult:
+    """Values produced by a run and the timing of every stage"""
+    values: Dict[str, Any]
+    timings: List[StageTiming] = field(default_factory=list)
+    total: float = 0.0
+
+    def summary(self) -> str:
+        parts = [f"{t.name}={t.duration:.2f}s" for t in self.timings]
+        return f"total={self.total:.2f}s " + " ".join(parts)
+
+
+def validate_stages(stages: List[Stage], initial: Dict[str, Any]):
+    """Check that every input is produced exactly once and that the graph has no cycle"""
+    produced = set(initial)
+    for stage in stages:
+        for name in stage.outputs:
+            if name in produced:
+                raise ValueError(f"Value '{name}' is produced more than once (stage '{stage.name}')")
+            produced.add(name)
+
+    for stage in stages:
+        missing = [name for name in stage.inputs if name not in produced]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown values: {missing}")
+
+    # Kahn's algorithm on the value graph
+    available = set(initial)
+    remaining = list(stages)
+    while remaining:
+        ready = [s for s in remaining if all(name in available for name in s.inputs)]
+        if not ready:
+            raise ValueError(f"Cycle detected between stages: {[s.name for s in remaining]}")
+        for stage in ready:
+            available.update(stage.outputs)
+            remaining.remove(stage)
+
+
+def _publish(stage: Stage, result: Any, values: Dict[str, Any]):
+    if len(stage.outputs) == 1:
+        values[stage.outputs[0]] = result
+    elif stage.outputs:
+        for name, value in zip(stage.outputs, result):
+            values[name] = value
+
+
+def _publish_default(stage: Stage, values: Dict[str, Any]):
+    for name in stage.outputs:
+        values[name] = stage.default
+
+
+def run_stages(
+    stages: List[Stage],
+    initial: Dict[str, Any],
+    max_workers: int = 4,
+    on_stage_start: Optional[Callable[[Stage], None]] = None,
+    on_stage_end: Optional[Callable[[StageTiming], None]] = None,
+) -> RunResult:
+    """
+    Run the stages on a thread pool, starting each one as soon as its inputs are ready.
+
+    Args:
+        stages: Stages of the workflow, in any order
+        initial: Values available before any stage runs
+        max_workers: Maximum number of stages running at the same time
+        on_stage_start: Optional callback invoked when a stage is started
+        on_stage_end: Optional callback invoked with the timing of each finished stage, failed ones included
+
+    Returns:
+        RunResult with every produced value and per-stage timings
+
+    Raises:
+        The first exception raised by a non optional stage. Stages already
+        running are awaited but no new stage is started.
+    """
+    validate_stages(stages, initial)
+
+    values = dict(initial)
+    timings: List[StageTiming] = []
+    pending = list(stages)
+    running = {}
+    start = time.perf_counter()
+    error = None
+
+    def timed(stage: Stage, args: list):
+        began = time.perf_counter() - start
+        try:
+            return stage.fn(*args), began, None
+        except Exception as e:
+            return None, began, e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            if error is None:
+                ready = [s for s in pending if all(name in values for name in s.inputs)]
+                for stage in ready:
+                    pending.remove(stage)
+                    if on_stage_start:
+                        on_stage_start(stage)
+                    args = [values[name] for name in stage.inputs]
+                    running[executor.submit(timed, stage, args)] = stage
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                result, began, exc = future.result()
+                finished = time.perf_counter() - start
+                timings.append(StageTiming(stage.name, began, finished, ok=exc is None, error=str(exc) if exc else None))
+                if on_stage_end:
+                    on_stage_end(timings[-1])
+
+                if exc is None:
+                    _publish(stage, result, values)
+                elif stage.optional:
+                    _publish_default(stage, values)
+                elif error is None:
+                    error = exc
+
+    if error is not None:
+        raise error
+
+    return RunResult(values=values, timings=timings, total=time.perf_counter() - start)
+
+
+async def arun_stages(
+    stages: List[Stage],
+    initial: Dict[str, Any],
+    on_stage_start: Optional[Callable[[Stage], Any]] = None,
+    on_stage_end: Optional[Callable[[StageTiming], Any]] = None,
+) -> RunResult:
+    """
+    Async counterpart of run_stages.
+
+    Coroutine stages run as tasks on the current event loop, plain functions
+    are called inline and must therefore be cheap (no blocking I/O).
+    `on_stage_start` and `on_stage_end` may be plain or coroutine functions.
+    """
+    validate_stages(stages, initial)
+
+    values = dict(initial)
+    timings: List[StageTiming] = []
+    pending = list(stages)
+    running = {}
+    start = time.perf_counter()
+    error = None
+
+    async def timed(stage: Stage, args: list):
+        began = time.perf_counter() - start
+        try:
+            result = stage.fn(*args)
+            if inspect.isawaitable(result):
+                result = await result
+            return result, began, None
+        except Exception as e:
+            return None, began, e
+
+    while pending or running:
+        if error is None:
+            ready = [s for s in pending if all(name in values for name in s.inputs)]
+            for stage in ready:
+                pending.remove(stage)
+                if on_stage_start:
+                    started = on_stage_start(stage)
+                    if inspect.isawaitable(started):
+                        await started
+                args = [values[name] for name in stage.inputs]
+                running[asyncio.ensure_future(timed(stage, args))] = stage
+
+        if not running:
+            break
+
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            stage = running.pop(task)
+            result, began, exc = task.result()
+            finished = time.perf_counter() - start
+            timings.append(StageTiming(stage.name, began, finished, ok=exc is None, error=str(exc) if exc else None))
+            if on_stage_end:
+                ended = on_stage_end(timings[-1])
+                if inspect.isawaitable(ended):
+                    await ended
+
+            if exc is None:
+                _publish(stage, result, values)
+            elif stage.optional:
+                _publish_default(stage, values)
+            elif error is None:
+                error = exc
+
+    if error is not None:
+        raise error
+
+    return RunResult(values=values, timings=timings, total=time.perf_counter() - start)
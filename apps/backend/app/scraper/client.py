@@ -0,0 +1,288 @@
+"""
+HTTP client for Apify's run-sync-get-dataset-items endpoint.
+
+One instance is shared per process: it keeps a pooled requests.Session and a
+pooled httpx.AsyncClient, authenticates with a bearer header (the token never
+appears in a URL, so not in error messages or traces), applies connect/read
+timeouts to every call, retries the failures that happen before the actor
+run starts with jittered exponential backoff and refuses responses larger
+than `max_response_bytes`. Request, retry, error
+and latency counters are kept in Redis under `http:stats:apify`.
+"""
+from app.utils.jsonstream import iter_json_array, aiter_json_array
+from app.utils.redis_client import get_redis, get_async_redis
+from app.utils.tracing import annotate
+from requests.adapters import HTTPAdapter
+from typing import AsyncIterator, Iterator, Optional
+import asyncio
+import httpx
+import json
+import random
+import requests
+import time
+
+APIFY_ACTS_URL = "https://api.apify.com/v2/acts"
+STATS_KEY = "http:stats:apify"
+# Refusals that come back before a run is created. A read timeout, or a 500/502/504,
+# can come from a run that already started, retrying it would start a second run
+RETRYABLE_STATUSES = {429, 503}
+CHUNK_SIZE = 16 * 1024
+
+
+class ApifyError(Exception):
+	"""Raised when an actor run can't be fetched, after retries"""
+
+	def __init__(self, message: str, status_code: Optional[int] = None):
+		super().__init__(message)
+		self.status_code = status_code
+
+
+class ResponseTooLarge(ApifyError):
+	pass
+
+
+class ApifyClient:
+	def __init__(
+		self,
+		token: str,
+		base_url: str = APIFY_ACTS_URL,
+		connect_timeout: float = 10.0,
+		read_timeout: float = 300.0,
+		max_retries: int = 3,
+		backoff_base: float = 1.0,
+		backoff_max: float = 30.0,
+		max_response_bytes: int = 20 * 1024 * 1024,
+		pool_size: int = 20,
+	):
+		"""
+		Args:
+			token: Apify API token
+			base_url: Acts endpoint, overridable for local stand-ins
+			connect_timeout: Seconds to establish the connection
+			read_timeout: Seconds to wait between bytes; actor runs are synchronous and slow
+			max_retries: Retries after the first attempt on 429/503 and connection errors
+			backoff_base: First backoff ceiling in seconds, doubled on each retry
+			backoff_max: Upper bound of a single backoff
+			max_response_bytes: Responses larger than this are rejected
+			pool_size: Keep-alive connections kept per client
+		"""
+		self.token = token
+		self.base_url = base_url.rstrip("/")
+		self.connect_timeout = connect_timeout
+		self.read_timeout = read_timeout
+		self.max_retries = max_retries
+		self.backoff_base = backoff_base
+		self.backoff_max = backoff_max
+		self.max_response_bytes = max_response_bytes
+		self.pool_size = pool_size
+		self._session = None
+		self._async_client = None
+
+	def actor_url(self, actor: str) -> str:
+		return f"{self.base_url}/{actor}/run-sync-get-dataset-items"
+
+	@property
+	def session(self) -> requests.Session:
+		if self._session is None:
+			session = requests.Session()
+			session.headers["Authorization"] = f"Bearer {self.token}"
+			adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+			session.mount("https://", adapter)
+			session.mount("http://", adapter)
+			self._session = session
+		return self._session
+
+	@property
+	def async_client(self) -> httpx.AsyncClient:
+		if self._async_client is None:
+			self._async_client = httpx.AsyncClient(
+				timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+				headers={"Authorization": f"Bearer {self.token}"},
+				limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+			)
+		return self._async_client
+
+	def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+		"""Full jitter exponential backoff, honouring Retry-After when the server sends one"""
+		if retry_after:
+			try:
+				return min(float(retry_after), self.backoff_max)
+			except ValueError:
+				pass
+		return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+	def _trace(self, payload: dict, attempt: int, status_code: Optional[int] = None, headers=None):
+		"""Describe the request on the current trace span"""
+		annotate(request_bytes=len(json.dumps(payload)), retries=attempt, status=status_code)
+		request_id = headers and (headers.get("X-Apify-Request-Id") or headers.get("X-Request-Id"))
+		if request_id:
+			annotate(request_id=request_id)
+
+	def _check_size(self, size: int):
+		if size > self.max_response_bytes:
+			raise ResponseTooLarge(f"Apify response exceeds {self.max_response_bytes} bytes")
+
+	# Stats
+
+	def _record(self, latency: float, retries: int, failed: bool):
+		try:
+			with get_redis().pipeline(transaction=False) as pipe:
+				pipe.hincrby(STATS_KEY, "requests", 1)
+				pipe.hincrby(STATS_KEY, "retries", retries)
+				pipe.hincrby(STATS_KEY, "errors", int(failed))
+				pipe.hincrbyfloat(STATS_KEY, "latency_seconds_total", latency)
+				pipe.execute()
+		except Exception:
+			pass
+
+	async def _arecord(self, latency: float, retries: int, failed: bool):
+		try:
+			async with get_async_redis().pipeline(transaction=False) as pipe:
+				pipe.hincrby(STATS_KEY, "requests", 1)
+				pipe.hincrby(STATS_KEY, "retries", retries)
+				pipe.hincrby(STATS_KEY, "errors", int(failed))
+				pipe.hincrbyfloat(STATS_KEY, "latency_seconds_total", latency)
+				await pipe.execute()
+		except Exception:
+			pass
+
+	# Sync API
+
+	def _open(self, actor: str, payload: dict) -> requests.Response:
+		"""POST the actor run, retrying until a 2xx response starts streaming"""
+		started = time.perf_counter()
+		attempt = 0
+		while True:
+			try:
+				response = self.session.post(
+					self.actor_url(actor), json=payload, stream=True,
+					timeout=(self.connect_timeout, self.read_timeout),
+				)
+			except requests.ReadTimeout as e:
+				self._record(time.perf_counter() - started, attempt, True)
+				self._trace(payload, attempt)
+				raise ApifyError(f"Apify request timed out after {self.read_timeout}s") from e
+			except requests.ConnectionError as e:
+				if attempt >= self.max_retries:
+					self._record(time.perf_counter() - started, attempt, True)
+					self._trace(payload, attempt)
+					raise ApifyError(f"Apify request failed: {e}") from e
+				time.sleep(self._backoff(attempt))
+				attempt += 1
+				continue
+
+			if response.status_code in RETRYABLE_STATUSES and attempt < self.max_retries:
+				delay = self._backoff(attempt, response.headers.get("Retry-After"))
+				response.close()
+				time.sleep(delay)
+				attempt += 1
+				continue
+
+			self._record(time.perf_counter() - started, attempt, response.status_code >= 400)
+			self._trace(payload, attempt, response.status_code, response.headers)
+			if response.status_code >= 400:
+				response.close()
+				raise ApifyError(f"Apify returned HTTP {response.status_code} for {actor}", response.status_code)
+
+			declared = response.headers.get("Content-Length")
+			if declared and declared.isdigit() and int(declared) > self.max_response_bytes:
+				response.close()
+				self._check_size(int(declared))
+			return response
+
+	def _limited_chunks(self, response: requests.Response) -> Iterator[bytes]:
+		received = 0
+		for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+			received += len(chunk)
+			self._check_size(received)
+			annotate(response_bytes=received)
+			yield chunk
+
+	def run_actor(self, actor: str, payload: dict) -> list:
+		"""Run an actor synchronously and return its dataset items"""
+		with self._open(actor, payload) as response:
+			return json.loads(b"".join(self._limited_chunks(response)))
+
+	def stream_actor(self, actor: str, payload: dict) -> Iterator[dict]:
+		"""Yield dataset items as they are downloaded, stop iterating to close the connection early"""
+		with self._open(actor, payload) as response:
+			yield from iter_json_array(self._limited_chunks(response))
+
+	# Async API
+
+	async def _aopen(self, actor: str, payload: dict) -> httpx.Response:
+		started = time.perf_counter()
+		attempt = 0
+		while True:
+			request = self.async_client.build_request("POST", self.actor_url(actor), json=payload)
+			try:
+				response = await self.async_client.send(request, stream=True)
+			except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+				if attempt >= self.max_retries:
+					await self._arecord(time.perf_counter() - started, attempt, True)
+					self._trace(payload, attempt)
+					raise ApifyError(f"Apify request failed: {e}") from e
+				await asyncio.sleep(self._backoff(attempt))
+				attempt += 1
+				continue
+			except httpx.ReadTimeout as e:
+				await self._arecord(time.perf_counter() - started, attempt, True)
+				self._trace(payload, attempt)
+				raise ApifyError(f"Apify request timed out after {self.read_timeout}s") from e
+			except httpx.TransportError as e:
+				await self._arecord(time.perf_counter() - started, attempt, True)
+				self._trace(payload, attempt)
+				raise ApifyError(f"Apify request failed: {e}") from e
+
+			if response.status_code in RETRYABLE_STATUSES and attempt < self.max_retries:
+				delay = self._backoff(attempt, response.headers.get("Retry-After"))
+				await response.aclose()
+				await asyncio.sleep(delay)
+				attempt += 1
+				continue
+
+			await self._arecord(time.perf_counter() - started, attempt, response.status_code >= 400)
+			self._trace(payload, attempt, response.status_code, response.headers)
+			if response.status_code >= 400:
+				await response.aclose()
+				raise ApifyError(f"Apify returned HTTP {response.status_code} for {actor}", response.status_code)
+
+			declared = response.headers.get("Content-Length")
+			if declared and declared.isdigit() and int(declared) > self.max_response_bytes:
+				await response.aclose()
+				self._check_size(int(declared))
+			return response
+
+	async def _alimited_chunks(self, response: httpx.Response) -> AsyncIterator[bytes]:
+		received = 0
+		async for chunk in response.aiter_bytes(CHUNK_SIZE):
+			received += len(chunk)
+			self._check_size(received)
+			annotate(response_bytes=received)
+			yield chunk
+
+	async def arun_actor(self, actor: str, payload: dict) -> list:
+		"""Async variant of run_actor"""
+		response = await self._aopen(actor, payload)
+		try:
+			body = b"".join([chunk async for chunk in self._alimited_chunks(response)])
+		finally:
+			await response.aclose()
+		return json.loads(body)
+
+	async def astream_actor(self, actor: str, payload: dict) -> AsyncIterator[dict]:
+		"""Async variant of stream_actor"""
+		response = await self._aopen(actor, payload)
+		try:
+			async for item in aiter_json_array(self._alimited_chunks(response)):
+				yield item
+		finally:
+			await response.aclose()
+
+	async def aclose(self):
+		if self._async_client is not None:
+			await self._async_client.aclose()
+			self._async_client = None
+		if self._session is not None:
+			self._session.close()
+			self._session = None
@@ -1,10 +1,39 @@
 from decouple import config
-import requests
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+from contextlib import aclosing, closing
+from app.scraper.client import ApifyClient, APIFY_ACTS_URL
+from app.utils.cache import TTLCache
+from app.utils.limits import upstream_limit, upstream_limit_async
+from app.utils.microbatch import MicroBatcher
+import asyncio
+import re
 
 token = config('APIFY_TOKEN')
 
+# Shared pooled client, see app.scraper.client
+apify = ApifyClient(
+	token,
+	base_url=config('APIFY_ACTS_URL', default=APIFY_ACTS_URL),
+	connect_timeout=config('APIFY_CONNECT_TIMEOUT', default=10.0, cast=float),
+	read_timeout=config('APIFY_READ_TIMEOUT', default=300.0, cast=float),
+	max_retries=config('APIFY_MAX_RETRIES', default=3, cast=int),
+	max_response_bytes=config('APIFY_MAX_RESPONSE_BYTES', default=20 * 1024 * 1024, cast=int),
+)
+
+POSTS_ACTOR = "supreme_coder~linkedin-post"
+REACTIONS_ACTOR = "apimaestro~linkedin-post-reactions"
+
+# Number of reactors used as testimonials on a page
+MAX_REACTORS = 6
+ACTIVITY_ID_PATTERN = re.compile(r"activity[-:](\d+)")
+
+# Single-lead scrapes arriving within this window share one actor run (0 disables),
+# and batched runs carry at most APIFY_BATCH_MAX_SIZE profiles or posts
+APIFY_BATCH_WINDOW_MS = config('APIFY_BATCH_WINDOW_MS', default=100, cast=int)
+APIFY_BATCH_MAX_SIZE = config('APIFY_BATCH_MAX_SIZE', default=10, cast=int)
+
 class BasicData(BaseModel):
 	first_name: str
 	last_name: str
@@ -21,13 +50,49 @@ class Reactor(BaseModel):
 	profile_url: str
 	profile_picture_url: str
 
-def get_basic_data(linkedin_url="https://www.linkedin.com/in/roxannevarza/", post_count=2) -> BasicData:
+
+# Profiles are served from cache for PROFILE_CACHE_TTL seconds, then served
+# stale for PROFILE_CACHE_STALE_TTL more seconds while being refreshed
+profile_cache = TTLCache(
+	"profiles",
+	ttl=config('PROFILE_CACHE_TTL', default=6 * 60 * 60, cast=int),
+	stale_ttl=config('PROFILE_CACHE_STALE_TTL', default=3 * 24 * 60 * 60, cast=int),
+	dump=lambda basic_data: basic_data.model_dump(),
+	load=lambda data: BasicData(**data),
+)
+
+
+# Reactors of a post, keyed by post URN
+reactors_cache = TTLCache(
+	"reactors",
+	ttl=config('REACTORS_CACHE_TTL', default=24 * 60 * 60, cast=int),
+	dump=lambda reactors: [reactor.model_dump() for reactor in reactors],
+	load=lambda data: [Reactor(**reactor) for reactor in data],
+)
+
+
+def normalize_profile_url(linkedin_url: str) -> str:
+	"""
+	Canonical form of a profile URL, so that trailing slashes, query strings,
+	country subdomains and casing don't produce different cache keys.
+	"""
+	parts = urlsplit(linkedin_url.strip())
+	path = parts.path.rstrip('/').lower()
+	return f"linkedin.com{path}"
+
+
+def _profile_cache_key(linkedin_url: str, post_count: int) -> str:
+	return f"{normalize_profile_url(linkedin_url)}:{post_count}"
+
+
+def get_basic_data(linkedin_url="https://www.linkedin.com/in/roxannevarza/", post_count=2, use_cache=True) -> BasicData:
 	"""
 	Get basic data from a LinkedIn profile formatted as BasicData BaseModel.
 
 	Args:
 		linkedin_url (str): LinkedIn profile URL
 		post_count (int): Number of recent posts to fetch (default: 2)
+		use_cache (bool): Read through the profile cache (default: True)
 
 	Returns:
 		BasicData: Structured profile data with first_name, last_name, profile_picture_url,
@@ -35,22 +100,159 @@ def get_basic_data(linkedin_url="https://www.linkedin.com/in/roxannevarza/", pos
 
 	Example response structure shown in comment on line 31
 	"""
-	payload = {
+	if not use_cache:
+		return _fetch_basic_data(linkedin_url, post_count)
+	return profile_cache.get_or_compute(
+		_profile_cache_key(linkedin_url, post_count),
+		lambda: _fetch_basic_data(linkedin_url, post_count),
+	)
+
+
+async def get_basic_data_async(linkedin_url: str, post_count: int = 2, use_cache: bool = True) -> BasicData:
+	"""Async variant of get_basic_data, using a shared httpx client"""
+	if not use_cache:
+		return await _fetch_basic_data_async(linkedin_url, post_count)
+	return await profile_cache.aget_or_compute(
+		_profile_cache_key(linkedin_url, post_count),
+		lambda: _fetch_basic_data_async(linkedin_url, post_count),
+	)
+
+
+def get_basic_data_many(linkedin_urls: List[str], post_count: int = 2, use_cache: bool = True) -> Dict[str, BasicData]:
+	"""
+	Get the BasicData of several profiles, scraping the uncached ones in
+	batched actor runs of up to APIFY_BATCH_MAX_SIZE profiles each.
+
+	Args:
+		linkedin_urls (List[str]): LinkedIn profile URLs
+		post_count (int): Number of recent posts to fetch per profile (default: 2)
+		use_cache (bool): Read through the profile cache (default: True)
+
+	Returns:
+		Dict[str, BasicData]: Profiles by the URL they were requested with,
+		                      profiles without posts are left out
+	"""
+	profiles = {}
+	misses = []
+	for linkedin_url in dict.fromkeys(linkedin_urls):
+		cached = profile_cache.get(_profile_cache_key(linkedin_url, post_count)) if use_cache else None
+		if cached is not None:
+			profiles[linkedin_url] = cached
+		else:
+			misses.append(linkedin_url)
+
+	for start in range(0, len(misses), APIFY_BATCH_MAX_SIZE):
+		fetched = _fetch_basic_data_many(misses[start:start + APIFY_BATCH_MAX_SIZE], post_count)
+		for linkedin_url, basic_data in fetched.items():
+			profile_cache.set(_profile_cache_key(linkedin_url, post_count), basic_data)
+		profiles.update(fetched)
+	return profiles
+
+
+async def get_basic_data_many_async(linkedin_urls: List[str], post_count: int = 2, use_cache: bool = True) -> Dict[str, BasicData]:
+	"""Async variant of get_basic_data_many, the batches run concurrently"""
+	linkedin_urls = list(dict.fromkeys(linkedin_urls))
+	profiles = {}
+	misses = linkedin_urls
+	if use_cache:
+		cached = await asyncio.gather(*(profile_cache.aget(_profile_cache_key(url, post_count)) for url in linkedin_urls))
+		profiles = {url: basic_data for url, basic_data in zip(linkedin_urls, cached) if basic_data is not None}
+		misses = [url for url in linkedin_urls if url not in profiles]
+
+	batches = [misses[start:start + APIFY_BATCH_MAX_SIZE] for start in range(0, len(misses), APIFY_BATCH_MAX_SIZE)]
+	for fetched in await asyncio.gather(*(_fetch_basic_data_many_async(batch, post_count) for batch in batches)):
+		for linkedin_url, basic_data in fetched.items():
+			await profile_cache.aset(_profile_cache_key(linkedin_url, post_count), basic_data)
+		profiles.update(fetched)
+	return profiles
+
+
+def _no_posts_error(linkedin_url: str) -> ValueError:
+	return ValueError(f"No posts found for LinkedIn profile: {linkedin_url}")
+
+
+def _fetch_basic_data(linkedin_url: str, post_count: int) -> BasicData:
+	profiles = _fetch_basic_data_many([linkedin_url], post_count)
+	if linkedin_url not in profiles:
+		raise _no_posts_error(linkedin_url)
+	return profiles[linkedin_url]
+
+
+async def _fetch_basic_data_async(linkedin_url: str, post_count: int) -> BasicData:
+	"""Single profile scrape, micro-batched with the other ones arriving within APIFY_BATCH_WINDOW_MS"""
+	if APIFY_BATCH_WINDOW_MS <= 0:
+		profiles = await _fetch_basic_data_many_async([linkedin_url], post_count)
+		if linkedin_url not in profiles:
+			raise _no_posts_error(linkedin_url)
+		return profiles[linkedin_url]
+	return await _profile_batcher.load((linkedin_url, post_count))
+
+
+async def _load_profiles(keys: List[tuple]) -> dict:
+	"""MicroBatcher loader, keys are (linkedin_url, post_count)"""
+	by_post_count: Dict[int, List[str]] = {}
+	for linkedin_url, post_count in keys:
+		by_post_count.setdefault(post_count, []).append(linkedin_url)
+
+	results = {}
+	runs = [_fetch_basic_data_many_async(urls, post_count) for post_count, urls in by_post_count.items()]
+	for post_count, profiles in zip(by_post_count, await asyncio.gather(*runs)):
+		results.update({(linkedin_url, post_count): basic_data for linkedin_url, basic_data in profiles.items()})
+	return results
+
+
+def _fetch_basic_data_many(linkedin_urls: List[str], post_count: int) -> Dict[str, BasicData]:
+	with upstream_limit("apify"):
+		posts_data = apify.run_actor(POSTS_ACTOR, _basic_data_payload(linkedin_urls, post_count))
+	return _split_basic_data(posts_data, linkedin_urls)
+
+
+async def _fetch_basic_data_many_async(linkedin_urls: List[str], post_count: int) -> Dict[str, BasicData]:
+	async with upstream_limit_async("apify"):
+		posts_data = await apify.arun_actor(POSTS_ACTOR, _basic_data_payload(linkedin_urls, post_count))
+	return _split_basic_data(posts_data, linkedin_urls)
+
+
+def _basic_data_payload(linkedin_urls: List[str], post_count: int) -> dict:
+	return {
 		"deepScrape": False,
 		"limitPerSource": post_count,
 		"rawData": True,
-		"urls": [
-			linkedin_url
-		]
+		"urls": linkedin_urls
 	}
 
-	url = f"https://api.apify.com/v2/acts/supreme_coder~linkedin-post/run-sync-get-dataset-items?token={token}"
 
-	response = requests.post(url, json=payload)
-	posts_data = response.json()
+def _split_basic_data(posts_data: list, linkedin_urls: List[str]) -> Dict[str, BasicData]:
+	"""
+	Group the dataset items of a multi-profile run by the profile they were
+	scraped for, matched on `inputUrl`, or on `authorProfileId` against the
+	profile slug, and build one BasicData per profile.
+	"""
+	# Several spellings of a profile can share a run, each caller gets its posts
+	by_url: Dict[str, List[str]] = {}
+	by_slug: Dict[str, List[str]] = {}
+	for url in dict.fromkeys(linkedin_urls):
+		normalized = normalize_profile_url(url)
+		by_url.setdefault(normalized, []).append(url)
+		by_slug.setdefault(normalized.rsplit('/', 1)[-1], []).append(url)
+
+	posts_by_url: Dict[str, list] = {}
+	for post in posts_data or []:
+		urls = by_url.get(normalize_profile_url(post.get("inputUrl") or ""))
+		if urls is None:
+			urls = by_slug.get((post.get("authorProfileId") or "").lower())
+		if urls is None and len(by_url) == 1:
+			urls = next(iter(by_url.values()))
+		for linkedin_url in urls or ():
+			posts_by_url.setdefault(linkedin_url, []).append(post)
 
+	return {url: _parse_basic_data(posts, url) for url, posts in posts_by_url.items()}
+
+
+def _parse_basic_data(posts_data: list, linkedin_url: str) -> BasicData:
+	"""Build BasicData from the dataset items returned by the posts actor"""
 	if not posts_data or len(posts_data) == 0:
-		raise ValueError(f"No posts found for LinkedIn profile: {linkedin_url}")
+		raise _no_posts_error(linkedin_url)
 
 	# Extract data from the first post's author information
 	first_post = posts_data[0]
@@ -78,39 +280,237 @@ def get_basic_data(linkedin_url="https://www.linkedin.com/in/roxannevarza/", pos
 # [{'type': 'image', 'images': ['https://media.licdn.com/dms/image/v2/D4E22AQH1OY0i4f5syA/feedshare-shrink_800/B4EZpaept9HMAg-/0/1762454578409?e=1764806400&v=beta&t=kLUeBU2anMbNz9dCZnb6iKNwp1iFj57hHxSEnppQ1lQ'], 'isActivity': False, 'urn': 'urn:li:activity:7392270291852488704', 'url': 'https://www.linkedin.com/posts/roxannevarza_just-gonna-put-this-here-via-challenges-activity-7392270291852488704-7ZTW?utm_source=combined_share_message&utm_medium=member_desktop&rcm=ACoAABxDsfABgJsLEUdI8vdnLv9UfDiShk5adv4', 'timeSincePosted': '1w', 'shareUrn': 'urn:li:share:7392270290933874688', 'text': 'Just gonna put this here. \nVia Challenges', 'attributes': [{'start': 31, 'length': 10, 'type': 'COMPANY_NAME', 'company': {'name': 'Challenges', 'universalName': 'challenges', 'trackingId': 'Yrib2KjRTCuVWGhKF2SNkA==', 'active': True, 'showcase': False, 'entityUrn': 'urn:li:fs_miniCompany:80846', 'logoUrl': 'https://media.licdn.com/dms/image/v2/C4E0BAQE4KID6Jzqr5w/company-logo_200_200/company-logo_200_200/0/1671881075529?e=1764806400&v=beta&t=AAUmjfqSe94gTC33Vd3A_CQPt49f4ZJpqiw2BFmqoUo'}}], 'comments': [], 'reactions': [], 'numShares': 0, 'numLikes': 193, 'numComments': 9, 'canReact': True, 'canPostComments': True, 'canShare': True, 'commentingDisabled': False, 'allowedCommentersScope': 'ALL', 'rootShare': True, 'shareAudience': 'PUBLIC', 'author': {'firstName': 'Roxanne', 'lastName': 'VARZA', 'occupation': 'Director @ STATION F / Scout @ Sequoia Capital / Innovation lead for AI Summit', 'id': '10052742', 'publicId': 'roxannevarza', 'trackingId': 'wRlm+O1KRji7QaIL5II1Eg==', 'profileId': 'ACoAAACZZIYBkT_JY9FJZeU4dKd_VPKuaLfhVy4', 'picture': 'https://media.licdn.com/dms/image/v2/C4D03AQHk78uSMTKdiw/profile-displayphoto-shrink_100_100/profile-displayphoto-shrink_100_100/0/1575483889283?e=1764806400&v=beta&t=XF2cGkeNhH2t2M42_Pxt3Itfoi3j6IGUOVvLmG6_M8o', 'backgroundImage': 'https://media.licdn.com/dms/image/v2/D4E16AQGntNRcmsU7sQ/profile-displaybackgroundimage-shrink_350_1400/B4EZgZ2.C6GoAc-/0/1752780501277?e=1764806400&v=beta&t=OsFMWxI9euGkXzGi7lA4WTgzMnqiIVTKBX8BeqS76zw'}, 'authorProfileId': 'roxannevarza', 'authorProfilePicture': 'https://media.licdn.com/dms/image/v2/C4D03AQHk78uSMTKdiw/profile-displayphoto-shrink_100_100/profile-displayphoto-shrink_100_100/0/1575483889283?e=1764806400&v=beta&t=XF2cGkeNhH2t2M42_Pxt3Itfoi3j6IGUOVvLmG6_M8o', 'authorType': 'Person', 'authorHeadline': 'Director @ STATION F / Scout @ Sequoia Capital / Innovation lead for AI Summit', 'authorName': 'Roxanne VARZA', 'authorProfileUrl': 'https://www.linkedin.com/in/roxannevarza?miniProfileUrn=urn%3Ali%3Afs_miniProfile%3AACoAAACZZIYBkT_JY9FJZeU4dKd_VPKuaLfhVy4', 'authorUrn': 'urn:li:member:10052742', 'postedAtTimestamp': 1762454579318, 'postedAtISO': '2025-11-06T18:42:59.318Z', 'inputUrl': 'https://www.linkedin.com/in/roxannevarza/'}]
 
 
-def get_reactions(linkedin_post_url="https://www.linkedin.com/posts/roxannevarza_just-gonna-put-this-here-via-challenges-activity-7392270291852488704-7ZTW?utm_source=combined_share_message&utm_medium=member_desktop&rcm=ACoAABxDsfABgJsLEUdI8vdnLv9UfDiShk5adv4") -> List[Reactor]:
+def get_reactions(linkedin_post_url="https://www.linkedin.com/posts/roxannevarza_just-gonna-put-this-here-via-challenges-activity-7392270291852488704-7ZTW?utm_source=combined_share_message&utm_medium=member_desktop&rcm=ACoAABxDsfABgJsLEUdI8vdnLv9UfDiShk5adv4", max_reactors=MAX_REACTORS, use_cache=True) -> List[Reactor]:
 	"""
 	Get reactions from a LinkedIn post formatted as a list of Reactor BaseModel objects.
 
+	Only usable reactors (with a name and a picture) are returned. The dataset
+	is parsed as it is downloaded and the request is closed once
+	`max_reactors` of them were found.
+
 	Args:
 		linkedin_post_url (str): LinkedIn post URL
+		max_reactors (int): Maximum number of reactors to return (default: 6)
+		use_cache (bool): Read through the reactors cache (default: True)
 
 	Returns:
 		List[Reactor]: List of reactors with reaction_type, name, headline, profile_url, and profile_picture_url
 
 	Example response format shown in comment on line 81
 	"""
-	payload = {
-		"post_urls": [linkedin_post_url]
+	if not use_cache:
+		return _fetch_reactions(linkedin_post_url, max_reactors)
+	return reactors_cache.get_or_compute(
+		_reactors_cache_key(linkedin_post_url, max_reactors),
+		lambda: _fetch_reactions(linkedin_post_url, max_reactors),
+	)
+
+
+async def get_reactions_async(linkedin_post_url: str, max_reactors: int = MAX_REACTORS, use_cache: bool = True) -> List[Reactor]:
+	"""Async variant of get_reactions, using a shared httpx client"""
+	if not use_cache:
+		return await _fetch_reactions_async(linkedin_post_url, max_reactors)
+	return await reactors_cache.aget_or_compute(
+		_reactors_cache_key(linkedin_post_url, max_reactors),
+		lambda: _fetch_reactions_async(linkedin_post_url, max_reactors),
+	)
+
+
+def post_urn(linkedin_post_url: str) -> str:
+	"""
+	Stable identifier of a post, e.g. urn:li:activity:7392270291852488704.
+	Post URLs carry a slug and tracking parameters that change between shares.
+	"""
+	match = ACTIVITY_ID_PATTERN.search(linkedin_post_url)
+	if match:
+		return f"urn:li:activity:{match.group(1)}"
+	return linkedin_post_url.split('?')[0].rstrip('/')
+
+
+def _reactors_cache_key(linkedin_post_url: str, max_reactors: int) -> str:
+	return f"{post_urn(linkedin_post_url)}:{max_reactors}"
+
+
+def get_reactions_many(linkedin_post_urls: List[str], max_reactors: int = MAX_REACTORS, use_cache: bool = True) -> Dict[str, List[Reactor]]:
+	"""
+	Get the reactors of several posts, fetching the uncached ones in batched
+	actor runs of up to APIFY_BATCH_MAX_SIZE posts each.
+
+	Returns:
+		Dict[str, List[Reactor]]: Reactors by the post URL they were requested with
+	"""
+	reactions = {}
+	misses = []
+	for post_url in dict.fromkeys(linkedin_post_urls):
+		cached = reactors_cache.get(_reactors_cache_key(post_url, max_reactors)) if use_cache else None
+		if cached is not None:
+			reactions[post_url] = cached
+		else:
+			misses.append(post_url)
+
+	for start in range(0, len(misses), APIFY_BATCH_MAX_SIZE):
+		fetched = _fetch_reactions_many(misses[start:start + APIFY_BATCH_MAX_SIZE], max_reactors)
+		for post_url, reactors in fetched.items():
+			reactors_cache.set(_reactors_cache_key(post_url, max_reactors), reactors)
+		reactions.update(fetched)
+	return reactions
+
+
+async def get_reactions_many_async(linkedin_post_urls: List[str], max_reactors: int = MAX_REACTORS, use_cache: bool = True) -> Dict[str, List[Reactor]]:
+	"""Async variant of get_reactions_many, the batches run concurrently"""
+	linkedin_post_urls = list(dict.fromkeys(linkedin_post_urls))
+	reactions = {}
+	misses = linkedin_post_urls
+	if use_cache:
+		cached = await asyncio.gather(*(reactors_cache.aget(_reactors_cache_key(url, max_reactors)) for url in linkedin_post_urls))
+		reactions = {url: reactors for url, reactors in zip(linkedin_post_urls, cached) if reactors is not None}
+		misses = [url for url in linkedin_post_urls if url not in reactions]
+
+	batches = [misses[start:start + APIFY_BATCH_MAX_SIZE] for start in range(0, len(misses), APIFY_BATCH_MAX_SIZE)]
+	for fetched in await asyncio.gather(*(_fetch_reactions_many_async(batch, max_reactors) for batch in batches)):
+		for post_url, reactors in fetched.items():
+			await reactors_cache.aset(_reactors_cache_key(post_url, max_reactors), reactors)
+		reactions.update(fetched)
+	return reactions
+
+
+def _reactions_payload(linkedin_post_urls: List[str], max_reactors: int) -> dict:
+	return {
+		"post_urls": linkedin_post_urls,
+		# Ask the actor for a few more than needed, some reactors have no picture
+		"limit": max_reactors * 3
 	}
-	# url = f"https://api.apify.com/v2/acts/apimaestro~linkedin-post-reactions/run-sync-get-dataset-items?token={token}"
-
-	response = requests.post("https://api.apify.com/v2/acts/apimaestro~linkedin-post-reactions/run-sync-get-dataset-items?token=" + token, json=payload)
-	reactions_data = response.json()
-
-	# Parse reactions and create Reactor objects
-	reactors = []
-	for reaction in reactions_data:
-		reactor_info = reaction.get("reactor", {})
-		profile_pictures = reactor_info.get("profile_pictures", {})
-
-		reactor = Reactor(
-			reaction_type=reaction.get("reaction_type", ""),
-			name=reactor_info.get("name", ""),
-			headline=reactor_info.get("headline", ""),
-			profile_url=reactor_info.get("profile_url", ""),
-			profile_picture_url=profile_pictures.get("medium", "")
-		)
-		reactors.append(reactor)
-
-	return reactors
+
+
+def _fetch_reactions(linkedin_post_url: str, max_reactors: int) -> List[Reactor]:
+	return _fetch_reactions_many([linkedin_post_url], max_reactors)[linkedin_post_url]
+
+
+async def _fetch_reactions_async(linkedin_post_url: str, max_reactors: int) -> List[Reactor]:
+	"""Single post lookup, micro-batched with the other ones arriving within APIFY_BATCH_WINDOW_MS"""
+	if APIFY_BATCH_WINDOW_MS <= 0:
+		return (await _fetch_reactions_many_async([linkedin_post_url], max_reactors))[linkedin_post_url]
+	return await _reactions_batcher.load((linkedin_post_url, max_reactors))
+
+
+async def _load_reactions(keys: List[tuple]) -> dict:
+	"""MicroBatcher loader, keys are (linkedin_post_url, max_reactors)"""
+	by_limit: Dict[int, List[str]] = {}
+	for post_url, max_reactors in keys:
+		by_limit.setdefault(max_reactors, []).append(post_url)
+
+	results = {}
+	runs = [_fetch_reactions_many_async(urls, max_reactors) for max_reactors, urls in by_limit.items()]
+	for max_reactors, reactions in zip(by_limit, await asyncio.gather(*runs)):
+		results.update({(post_url, max_reactors): reactors for post_url, reactors in reactions.items()})
+	return results
+
+
+class _ReactorCollector:
+	"""
+	Assigns the streamed dataset items of a multi-post run to their post,
+	matched by URN on the post URL the item carries, and tells when every
+	post has `max_reactors` usable reactors so the download can stop early.
+	"""
+
+	def __init__(self, linkedin_post_urls: List[str], max_reactors: int):
+		self.post_urls = list(dict.fromkeys(linkedin_post_urls))
+		# Keyed by URN, several spellings of a post share its reactors
+		self.by_urn: Dict[str, List[Reactor]] = {post_urn(url): [] for url in self.post_urls}
+		self.max_reactors = max_reactors
+		self.unattributed = 0
+
+	def _urn(self, reaction: dict) -> Optional[str]:
+		if len(self.by_urn) == 1:
+			return next(iter(self.by_urn))
+		metadata = reaction.get("_metadata") or {}
+		source = metadata.get("post_url") or reaction.get("post_url") or reaction.get("input") or ""
+		urn = post_urn(source)
+		return urn if urn in self.by_urn else None
+
+	def add(self, reaction: dict):
+		urn = self._urn(reaction)
+		if urn is None:
+			self.unattributed += 1
+			return
+		if len(self.by_urn[urn]) >= self.max_reactors:
+			return
+		reactor = _parse_reactor(reaction)
+		if reactor:
+			self.by_urn[urn].append(reactor)
+
+	@property
+	def complete(self) -> bool:
+		return all(len(reactors) >= self.max_reactors for reactors in self.by_urn.values())
+
+	def unresolved(self) -> List[str]:
+		"""
+		Posts left without reactors in a run that had items matching no post:
+		their reactors may be among those, so an empty list can't be trusted.
+		"""
+		if not self.unattributed:
+			return []
+		first_urls: Dict[str, str] = {}
+		for url in self.post_urls:
+			first_urls.setdefault(post_urn(url), url)
+		unresolved = [url for urn, url in first_urls.items() if not self.by_urn[urn]]
+		print(f"⚠️ {self.unattributed} reactions matched none of {len(self.by_urn)} posts, fetching {len(unresolved)} post(s) one by one")
+		return unresolved
+
+	def set(self, linkedin_post_url: str, reactors: List[Reactor]):
+		self.by_urn[post_urn(linkedin_post_url)] = reactors
+
+	@property
+	def reactors(self) -> Dict[str, List[Reactor]]:
+		return {url: self.by_urn[post_urn(url)] for url in self.post_urls}
+
+
+def _fetch_reactions_many(linkedin_post_urls: List[str], max_reactors: int) -> Dict[str, List[Reactor]]:
+	collector = _ReactorCollector(linkedin_post_urls, max_reactors)
+	with upstream_limit("apify"), closing(apify.stream_actor(REACTIONS_ACTOR, _reactions_payload(linkedin_post_urls, max_reactors))) as reactions:
+		for reaction in reactions:
+			collector.add(reaction)
+			if collector.complete:
+				break
+	for post_url in collector.unresolved():
+		collector.set(post_url, _fetch_reactions_many([post_url], max_reactors)[post_url])
+	return collector.reactors
+
+
+async def _fetch_reactions_many_async(linkedin_post_urls: List[str], max_reactors: int) -> Dict[str, List[Reactor]]:
+	collector = _ReactorCollector(linkedin_post_urls, max_reactors)
+	async with upstream_limit_async("apify"), aclosing(apify.astream_actor(REACTIONS_ACTOR, _reactions_payload(linkedin_post_urls, max_reactors))) as reactions:
+		async for reaction in reactions:
+			collector.add(reaction)
+			if collector.complete:
+				break
+	unresolved = collector.unresolved()
+	refetched = await asyncio.gather(*(_fetch_reactions_many_async([post_url], max_reactors) for post_url in unresolved))
+	for post_url, reactions in zip(unresolved, refetched):
+		collector.set(post_url, reactions[post_url])
+	return collector.reactors
+
+
+def _parse_reactor(reaction: dict) -> Optional[Reactor]:
+	"""Create a Reactor from a dataset item, or None if it has no name or picture"""
+	reactor_info = reaction.get("reactor") or {}
+	profile_pictures = reactor_info.get("profile_pictures") or {}
+
+	if not reactor_info.get("name") or not profile_pictures.get("medium"):
+		return None
+
+	return Reactor(
+		reaction_type=reaction.get("reaction_type", ""),
+		name=reactor_info.get("name", ""),
+		headline=reactor_info.get("headline", ""),
+		profile_url=reactor_info.get("profile_url", ""),
+		profile_picture_url=profile_pictures.get("medium", "")
+	)
+
+
+# Micro-batchers behind the async single-lead calls, see _fetch_basic_data_async
+_profile_batcher = MicroBatcher(
+	_load_profiles, APIFY_BATCH_WINDOW_MS, APIFY_BATCH_MAX_SIZE,
+	missing=lambda key: _no_posts_error(key[0]),
+)
+_reactions_batcher = MicroBatcher(_load_reactions, APIFY_BATCH_WINDOW_MS, APIFY_BATCH_MAX_SIZE)
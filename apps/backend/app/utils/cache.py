@@ -0,0 +1,248 @@
+"""
+Read-through Redis cache shared by the sync and async upstream wrappers.
+
+Entries are stored as JSON `{"v": value, "t": stored_at}`. An entry younger
+than `ttl` is fresh. Between `ttl` and `ttl + stale_ttl` it is stale: it is
+still served immediately, and a single background refresh is started
+(stale-while-revalidate). Hits, misses and stale hits are counted per cache
+in `cache:stats:{name}`.
+
+Redis errors never fail the caller, the value is just computed again.
+"""
+from app.utils.redis_client import get_redis, get_async_redis
+from app.utils.tracing import annotate
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import json
+import threading
+import time
+
+# Only one refresh per key runs at a time, across processes
+REFRESH_LOCK_TTL = 120
+
+
+# Lookup outcomes recorded on the current trace span, as `cache.{name}`
+TRACED_RESULTS = {"hits": "hit", "misses": "miss", "stale_hits": "stale"}
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _trace_lookup(name: str, field: str):
+    if field in TRACED_RESULTS:
+        annotate(**{f"cache.{name}": TRACED_RESULTS[field]})
+
+
+class TTLCache:
+    def __init__(
+        self,
+        name: str,
+        ttl: int,
+        stale_ttl: int = 0,
+        dump: Callable[[Any], Any] = _identity,
+        load: Callable[[Any], Any] = _identity,
+    ):
+        """
+        Args:
+            name: Cache name, used as key prefix and in the stats
+            ttl: Seconds during which an entry is served without refresh
+            stale_ttl: Extra seconds during which a stale entry is served while it is refreshed
+            dump: Converts a value to something JSON serializable
+            load: Converts the JSON value back
+        """
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.dump = dump
+        self.load = load
+        self._background = set()
+
+    def key(self, key: str) -> str:
+        return f"cache:{self.name}:{key}"
+
+    @property
+    def stats_key(self) -> str:
+        return f"cache:stats:{self.name}"
+
+    def _encode(self, value: Any) -> str:
+        return json.dumps({"v": self.dump(value), "t": time.time()})
+
+    def _decode(self, raw: Optional[str]):
+        """Returns (value, is_fresh), or (None, None) on a miss"""
+        if raw is None:
+            return None, None
+        entry = json.loads(raw)
+        age = time.time() - entry["t"]
+        if age > self.ttl + self.stale_ttl:
+            return None, None
+        return self.load(entry["v"]), age <= self.ttl
+
+    # Sync API
+
+    def get(self, key: str) -> Any:
+        try:
+            value, _ = self._decode(get_redis().get(self.key(key)))
+            return value
+        except Exception as e:
+            print(f"Cache {self.name} read failed: {e}")
+            return None
+
+    def set(self, key: str, value: Any):
+        try:
+            get_redis().set(self.key(key), self._encode(value), ex=self.ttl + self.stale_ttl)
+        except Exception as e:
+            print(f"Cache {self.name} write failed: {e}")
+
+    def delete(self, key: str):
+        try:
+            get_redis().delete(self.key(key))
+        except Exception as e:
+            print(f"Cache {self.name} delete failed: {e}")
+
+    def count(self, field: str, amount: float = 1):
+        _trace_lookup(self.name, field)
+        try:
+            if isinstance(amount, float):
+                get_redis().hincrbyfloat(self.stats_key, field, amount)
+            else:
+                get_redis().hincrby(self.stats_key, field, amount)
+        except Exception:
+            pass
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Return the cached value, computing and storing it on a miss"""
+        try:
+            value, fresh = self._decode(get_redis().get(self.key(key)))
+        except Exception as e:
+            print(f"Cache {self.name} read failed: {e}")
+            value, fresh = None, None
+
+        if fresh is None:
+            self.count("misses")
+            value = compute()
+            self.set(key, value)
+            return value
+
+        if fresh:
+            self.count("hits")
+        else:
+            self.count("stale_hits")
+            if self._acquire_refresh(key):
+                thread = threading.Thread(target=self._refresh, args=(key, compute), daemon=True)
+                thread.start()
+        return value
+
+    def _acquire_refresh(self, key: str) -> bool:
+        try:
+            return bool(get_redis().set(self.key(key) + ":refreshing", 1, nx=True, ex=REFRESH_LOCK_TTL))
+        except Exception:
+            return False
+
+    def _refresh(self, key: str, compute: Callable[[], Any]):
+        try:
+            self.set(key, compute())
+            self.count("refreshes")
+        except Exception as e:
+            print(f"Cache {self.name} background refresh failed: {e}")
+        finally:
+            try:
+                get_redis().delete(self.key(key) + ":refreshing")
+            except Exception:
+                pass
+
+    # Async API
+
+    async def aget(self, key: str) -> Any:
+        try:
+            value, _ = self._decode(await get_async_redis().get(self.key(key)))
+            return value
+        except Exception as e:
+            print(f"Cache {self.name} read failed: {e}")
+            return None
+
+    async def aset(self, key: str, value: Any):
+        try:
+            await get_async_redis().set(self.key(key), self._encode(value), ex=self.ttl + self.stale_ttl)
+        except Exception as e:
+            print(f"Cache {self.name} write failed: {e}")
+
+    async def adelete(self, key: str):
+        try:
+            await get_async_redis().delete(self.key(key))
+        except Exception as e:
+            print(f"Cache {self.name} delete failed: {e}")
+
+    async def acount(self, field: str, amount: float = 1):
+        _trace_lookup(self.name, field)
+        try:
+            if isinstance(amount, float):
+                await get_async_redis().hincrbyfloat(self.stats_key, field, amount)
+            else:
+                await get_async_redis().hincrby(self.stats_key, field, amount)
+        except Exception:
+            pass
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of get_or_compute, `compute` is a coroutine function"""
+        try:
+            value, fresh = self._decode(await get_async_redis().get(self.key(key)))
+        except Exception as e:
+            print(f"Cache {self.name} read failed: {e}")
+            value, fresh = None, None
+
+        if fresh is None:
+            await self.acount("misses")
+            value = await compute()
+            await self.aset(key, value)
+            return value
+
+        if fresh:
+            await self.acount("hits")
+        else:
+            await self.acount("stale_hits")
+            if await self._aacquire_refresh(key):
+                task = asyncio.create_task(self._arefresh(key, compute))
+                # Keep a reference so the task is not garbage collected mid-flight
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+        return value
+
+    async def _aacquire_refresh(self, key: str) -> bool:
+        try:
+            return bool(await get_async_redis().set(self.key(key) + ":refreshing", 1, nx=True, ex=REFRESH_LOCK_TTL))
+        except Exception:
+            return False
+
+    async def _arefresh(self, key: str, compute: Callable[[], Awaitable[Any]]):
+        try:
+            await self.aset(key, await compute())
+            await self.acount("refreshes")
+        except Exception as e:
+            print(f"Cache {self.name} background refresh failed: {e}")
+        finally:
+            try:
+                await get_async_redis().delete(self.key(key) + ":refreshing")
+            except Exception:
+                pass
+
+
+
+def _with_hit_rate(raw: Dict[str, str]) -> dict:
+    stats = {field: float(value) for field, value in raw.items()}
+    hits = stats.get("hits", 0) + stats.get("stale_hits", 0)
+    lookups = hits + stats.get("misses", 0)
+    stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+    return stats
+
+
+async def all_cache_stats() -> dict:
+    """
+    Stats of every cache, keyed by cache name. Read from Redis so that the
+    API reports the counters of caches used in worker processes.
+    """
+    r = get_async_redis()
+    stats = {}
+    async for key in r.scan_iter(match="cache:stats:*"):
+        stats[key[len("cache:stats:"):]] = _with_hit_rate(await r.hgetall(key))
+    return stats
@@ -0,0 +1,125 @@
+"""
+Incremental JSON parsing for large upstream responses.
+
+The parsers are push based: feed them decoded text as it arrives and they
+return the values that became complete, so a caller can stop reading (and
+close the connection) as soon as it has what it needs.
+"""
+from typing import AsyncIterator, Iterable, Iterator, List
+import codecs
+import json
+
+
+class _ContainerParser:
+    """
+    Splits a top-level JSON container into its members without buffering the
+    whole document. Members are decoded with json.loads once the comma or
+    closing character following them has been seen.
+    """
+    opening = ""
+    kind = ""
+
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def _decode(self, text: str) -> list:
+        raise NotImplementedError
+
+    def _flush(self, out: list):
+        text = "".join(self._buffer).strip()
+        self._buffer = []
+        if text:
+            out.extend(self._decode(text))
+
+    def feed(self, text: str) -> List:
+        """Consume a chunk of text and return the elements completed by it"""
+        out = []
+        for char in text:
+            if self._finished:
+                break
+
+            if not self._started:
+                if char == self.opening:
+                    self._started = True
+                elif not char.isspace():
+                    raise ValueError(f"Expected a JSON {self.kind}, got {char!r}")
+                continue
+
+            if self._in_string:
+                self._buffer.append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                if self._depth == 0:
+                    # Closing bracket of the top-level container
+                    self._flush(out)
+                    self._finished = True
+                    break
+                self._depth -= 1
+            elif char == "," and self._depth == 0:
+                self._flush(out)
+                continue
+
+            self._buffer.append(char)
+        return out
+
+
+class JsonArrayParser(_ContainerParser):
+    """feed() returns the array elements completed by each chunk"""
+    opening = "["
+    kind = "array"
+
+    def _decode(self, text: str) -> list:
+        return [json.loads(text)]
+
+
+class JsonObjectParser(_ContainerParser):
+    """feed() returns the (key, value) members of the object completed by each chunk"""
+    opening = "{"
+    kind = "object"
+
+    def _decode(self, text: str) -> list:
+        return list(json.loads("{" + text + "}").items())
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator:
+    """Yield the elements of a JSON array streamed as UTF-8 byte chunks"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parser = JsonArrayParser()
+    for chunk in chunks:
+        yield from parser.feed(decoder.decode(chunk))
+        if parser.finished:
+            return
+    yield from parser.feed(decoder.decode(b"", final=True))
+
+
+async def aiter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator:
+    """Async variant of iter_json_array"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parser = JsonArrayParser()
+    async for chunk in chunks:
+        for element in parser.feed(decoder.decode(chunk)):
+            yield element
+        if parser.finished:
+            return
+    for element in parser.feed(decoder.decode(b"", final=True)):
+        yield element
@@ -0,0 +1,80 @@
+"""
+Server-side rendering of /landing: the SPA's index.html with the page
+content embedded, so the app renders without calling /api/content first.
+
+The template is read once. Rendered pages are kept in memory per page id
+and reused as long as the stored page version is unchanged; rewriting the
+page gives it a new version, which replaces the entry on the next request.
+"""
+from collections import OrderedDict
+from typing import Optional
+import hashlib
+import html
+import json
+import re
+
+TITLE_PATTERN = re.compile(r"<title>.*?</title>", re.S)
+# `sizes` of the hero <picture> in Hero.tsx
+HERO_IMAGE_SIZES = "(min-width: 1024px) 50vw, 100vw"
+
+
+def script_json(content: dict) -> str:
+    """JSON safe to inline in a <script> element (json.dumps already escapes non-ASCII)"""
+    return (
+        json.dumps(content)
+        .replace("<", "\\u003c")
+        .replace(">", "\\u003e")
+        .replace("&", "\\u0026")
+    )
+
+
+class LandingRenderer:
+    def __init__(self, template_path: str, max_entries: int = 256):
+        self.template_path = template_path
+        self.max_entries = max_entries
+        self._template: Optional[str] = None
+        self.template_version = ""
+        # page_id -> (version, rendered bytes), least recently used first
+        self._rendered: "OrderedDict[str, tuple]" = OrderedDict()
+
+    @property
+    def template(self) -> str:
+        if self._template is None:
+            with open(self.template_path, encoding="utf-8") as f:
+                self._template = f.read()
+            self.template_version = hashlib.sha256(self._template.encode("utf-8")).hexdigest()[:8]
+        return self._template
+
+    def render(self, content: dict) -> bytes:
+        head = [f"<script>window.__PAGE_CONTENT__ = {script_json(content)};</script>"]
+        if content.get("heroImageUrl"):
+            # Mirrored heroes preload the srcset of the <picture>'s first source,
+            # browsers skip the preload when they don't support its type
+            sources = content.get("heroImageSources") or []
+            href = sources[0]["srcSet"].split(", ")[-1].split(" ")[0] if sources else content["heroImageUrl"]
+            responsive = (
+                f' type="{html.escape(sources[0]["type"])}" imagesrcset="{html.escape(sources[0]["srcSet"])}"'
+                f' imagesizes="{HERO_IMAGE_SIZES}"'
+            ) if sources else ""
+            head.insert(0, f'<link rel="preload" as="image" href="{html.escape(href)}"{responsive} fetchpriority="high" />')
+
+        page = self.template
+        if content.get("productName"):
+            title = html.escape(f"{content['productName']} - {content.get('title') or ''}".strip(" -"))
+            page = TITLE_PATTERN.sub(lambda _: f"<title>{title}</title>", page, count=1)
+        page = page.replace("</head>", "  " + "\n    ".join(head) + "\n  </head>", 1)
+        return page.encode("utf-8")
+
+    def get(self, page_id: str, version: str, load_content) -> bytes:
+        """Rendered page for this version, `load_content()` is only called when it must be rendered"""
+        cached = self._rendered.get(page_id)
+        if cached and cached[0] == version:
+            self._rendered.move_to_end(page_id)
+            return cached[1]
+
+        rendered = self.render(load_content())
+        self._rendered[page_id] = (version, rendered)
+        self._rendered.move_to_end(page_id)
+        while len(self._rendered) > self.max_entries:
+            self._rendered.popitem(last=False)
+        return rendered
@@ -0,0 +1,308 @@
+"""
+Cluster-wide rate and concurrency limits per upstream (Apify, Mistral, fal).
+
+Every worker and API process takes its upstream calls through the same
+Redis state, so a batch of leads spread over several workers doesn't open
+more concurrent calls, or more calls per second, than a provider accepts:
+
+    limits:{upstream}:holders    sorted set ticket -> lease deadline of the calls in flight
+    limits:{upstream}:waiters    sorted set ticket -> arrival order of the queued callers
+    limits:{upstream}:heartbeat  hash ticket -> deadline, waiters that stop polling are dropped
+    limits:{upstream}:bucket     hash {tokens, ts} of the token bucket
+    limits:{upstream}:seq        arrival counter
+
+A call is admitted when it is at the head of the waiters queue, a
+concurrency slot is free and the bucket holds a token, all checked in one
+Lua script on Redis time. Callers never fail on a full limit, they wait
+their turn: the queue is FIFO across the cluster. Holders renew their
+lease while the call runs, so a crashed worker frees its slot once the
+lease expires.
+
+Settings (environment), per upstream NAME:
+    UPSTREAM_LIMIT_{NAME}   concurrent calls
+    UPSTREAM_RATE_{NAME}    calls started per second, 0 disables the bucket
+    UPSTREAM_BURST_{NAME}   bucket size
+When Redis is unreachable, calls fall back to a per-process semaphore.
+"""
+from app.utils.metrics import observe, observe_async
+from app.utils.redis_client import get_redis, get_async_redis
+from app.utils.tracing import annotate, span
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Tuple
+import asyncio
+import os
+import redis
+import threading
+import time
+import uuid
+
+DEFAULT_LIMITS = {
+    "apify": 5,
+    "mistral": 5,
+    "fal": 5,
+}
+DEFAULT_RATES = {
+    "apify": 2.0,
+    "mistral": 5.0,
+    "fal": 2.0,
+}
+UPSTREAMS = tuple(DEFAULT_LIMITS)
+
+# A holder renews its lease every LEASE_SECONDS / 3 while its call runs
+LEASE_SECONDS = int(os.getenv("UPSTREAM_LEASE_SECONDS", 60))
+# A waiter not seen for this long (crashed, cancelled) loses its place
+WAITER_TTL_SECONDS = 5
+POLL_SECONDS = int(os.getenv("UPSTREAM_LIMIT_POLL_MS", 100)) / 1000
+
+# KEYS: holders, waiters, heartbeat, bucket, seq
+# ARGV: ticket, concurrency, rate, burst, lease, waiter ttl
+# Returns {1, 0} once admitted, else {0, suggested wait in ms}
+ACQUIRE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local ticket = ARGV[1]
+local concurrency = tonumber(ARGV[2])
+local rate = tonumber(ARGV[3])
+local burst = tonumber(ARGV[4])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if not redis.call('ZSCORE', KEYS[2], ticket) then
+    redis.call('ZADD', KEYS[2], redis.call('INCR', KEYS[5]), ticket)
+end
+redis.call('HSET', KEYS[3], ticket, now + tonumber(ARGV[6]))
+
+-- Drop the waiters at the head of the queue that stopped polling
+while true do
+    local head = redis.call('ZRANGE', KEYS[2], 0, 0)[1]
+    if head == ticket then break end
+    local deadline = tonumber(redis.call('HGET', KEYS[3], head) or '0')
+    if deadline >= now then return {0, 0} end
+    redis.call('ZREM', KEYS[2], head)
+    redis.call('HDEL', KEYS[3], head)
+end
+
+if redis.call('ZCARD', KEYS[1]) >= concurrency then
+    return {0, 0}
+end
+
+local tokens = burst
+if rate > 0 then
+    local bucket = redis.call('HMGET', KEYS[4], 'tokens', 'ts')
+    if bucket[1] then
+        tokens = math.min(burst, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * rate)
+    end
+    if tokens < 1 then
+        redis.call('HSET', KEYS[4], 'tokens', tokens, 'ts', now)
+        return {0, math.ceil((1 - tokens) / rate * 1000)}
+    end
+    redis.call('HSET', KEYS[4], 'tokens', tokens - 1, 'ts', now)
+end
+
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[5]), ticket)
+redis.call('ZREM', KEYS[2], ticket)
+redis.call('HDEL', KEYS[3], ticket)
+return {1, 0}
+"""
+
+# KEYS: holders; ARGV: ticket, lease. Only renews a lease still held
+RENEW_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return redis.call('ZADD', KEYS[1], 'XX', now + tonumber(ARGV[2]), ARGV[1])
+end
+return 0
+"""
+
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+_thread_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_semaphores_lock = threading.Lock()
+
+
+def limit_for(upstream: str) -> int:
+    return int(os.getenv(f"UPSTREAM_LIMIT_{upstream.upper()}", DEFAULT_LIMITS.get(upstream, 5)))
+
+
+def rate_for(upstream: str) -> Tuple[float, float]:
+    """(calls per second, burst) of the upstream's token bucket"""
+    rate = float(os.getenv(f"UPSTREAM_RATE_{upstream.upper()}", DEFAULT_RATES.get(upstream, 0)))
+    burst = float(os.getenv(f"UPSTREAM_BURST_{upstream.upper()}", max(limit_for(upstream), 1)))
+    return rate, burst
+
+
+def _keys(upstream: str) -> list:
+    prefix = f"limits:{upstream}"
+    return [f"{prefix}:holders", f"{prefix}:waiters", f"{prefix}:heartbeat", f"{prefix}:bucket", f"{prefix}:seq"]
+
+
+def _acquire_args(upstream: str, ticket: str) -> list:
+    rate, burst = rate_for(upstream)
+    return [ticket, limit_for(upstream), rate, burst, LEASE_SECONDS, WAITER_TTL_SECONDS]
+
+
+def _wait_seconds(hint_ms: int) -> float:
+    return max(POLL_SECONDS, min(hint_ms / 1000, 1.0))
+
+
+# Sync API
+
+def _thread_semaphore(upstream: str) -> threading.BoundedSemaphore:
+    with _semaphores_lock:
+        if upstream not in _thread_semaphores:
+            _thread_semaphores[upstream] = threading.BoundedSemaphore(limit_for(upstream))
+        return _thread_semaphores[upstream]
+
+
+def _renew_until(upstream: str, ticket: str, done: threading.Event):
+    while not done.wait(LEASE_SECONDS / 3):
+        try:
+            get_redis().eval(RENEW_SCRIPT, 1, _keys(upstream)[0], ticket, LEASE_SECONDS)
+        except redis.RedisError as e:
+            print(f"Failed to renew {upstream} lease: {e}")
+
+
+@contextmanager
+def upstream_limit(upstream: str):
+    """Hold a slot of the upstream's cluster-wide limit for the duration of the block"""
+    with span(upstream):
+        r = get_redis()
+        keys = _keys(upstream)
+        ticket = uuid.uuid4().hex
+        queued = time.perf_counter()
+        try:
+            while True:
+                admitted, hint_ms = r.eval(ACQUIRE_SCRIPT, len(keys), *keys, *_acquire_args(upstream, ticket))
+                if admitted:
+                    break
+                time.sleep(_wait_seconds(hint_ms))
+        except redis.RedisError as e:
+            print(f"⚠️ {upstream} limiter unavailable, limiting this process only: {e}")
+            with _thread_semaphore(upstream):
+                yield
+            return
+        except BaseException:
+            _leave(r, keys, ticket)
+            raise
+
+        admitted_at = time.perf_counter()
+        annotate(queue_wait=round(admitted_at - queued, 3))
+        observe("pioneer_upstream_queue_wait_seconds", admitted_at - queued, {"provider": upstream})
+        done = threading.Event()
+        threading.Thread(target=_renew_until, args=(upstream, ticket, done), daemon=True).start()
+        outcome = "failure"
+        try:
+            yield
+            outcome = "success"
+        finally:
+            done.set()
+            _leave(r, keys, ticket)
+            observe("pioneer_upstream_request_duration_seconds", time.perf_counter() - admitted_at, {"provider": upstream, "outcome": outcome})
+
+
+def _leave(r: redis.Redis, keys: list, ticket: str):
+    try:
+        with r.pipeline(transaction=False) as pipe:
+            pipe.zrem(keys[0], ticket)
+            pipe.zrem(keys[1], ticket)
+            pipe.hdel(keys[2], ticket)
+            pipe.execute()
+    except redis.RedisError as e:
+        print(f"Failed to release limiter ticket: {e}")
+
+
+# Async API
+
+def _semaphore(upstream: str) -> asyncio.Semaphore:
+    if upstream not in _semaphores:
+        _semaphores[upstream] = asyncio.Semaphore(limit_for(upstream))
+    return _semaphores[upstream]
+
+
+async def _renew_forever_async(upstream: str, ticket: str):
+    while True:
+        await asyncio.sleep(LEASE_SECONDS / 3)
+        try:
+            await get_async_redis().eval(RENEW_SCRIPT, 1, _keys(upstream)[0], ticket, LEASE_SECONDS)
+        except redis.RedisError as e:
+            print(f"Failed to renew {upstream} lease: {e}")
+
+
+async def _leave_async(r, keys: list, ticket: str):
+    try:
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.zrem(keys[0], ticket)
+            pipe.zrem(keys[1], ticket)
+            pipe.hdel(keys[2], ticket)
+            await pipe.execute()
+    except redis.RedisError as e:
+        print(f"Failed to release limiter ticket: {e}")
+
+
+@asynccontextmanager
+async def upstream_limit_async(upstream: str):
+    """Async variant of upstream_limit"""
+    with span(upstream):
+        r = get_async_redis()
+        keys = _keys(upstream)
+        ticket = uuid.uuid4().hex
+        queued = time.perf_counter()
+        try:
+            while True:
+                admitted, hint_ms = await r.eval(ACQUIRE_SCRIPT, len(keys), *keys, *_acquire_args(upstream, ticket))
+                if admitted:
+                    break
+                await asyncio.sleep(_wait_seconds(hint_ms))
+        except redis.RedisError as e:
+            print(f"⚠️ {upstream} limiter unavailable, limiting this process only: {e}")
+            async with _semaphore(upstream):
+                yield
+            return
+        except BaseException:
+            # Cancelled while queued: give the place up right away
+            await asyncio.shield(_leave_async(r, keys, ticket))
+            raise
+
+        admitted_at = time.perf_counter()
+        annotate(queue_wait=round(admitted_at - queued, 3))
+        await observe_async("pioneer_upstream_queue_wait_seconds", admitted_at - queued, {"provider": upstream})
+        renewer = asyncio.create_task(_renew_forever_async(upstream, ticket))
+        outcome = "failure"
+        try:
+            yield
+            outcome = "success"
+        finally:
+            renewer.cancel()
+            await asyncio.shield(_leave_async(r, keys, ticket))
+            await observe_async("pioneer_upstream_request_duration_seconds", time.perf_counter() - admitted_at, {"provider": upstream, "outcome": outcome})
+
+
+async def limit_stats() -> Dict[str, dict]:
+    """Configured limits and current usage of every upstream"""
+    r = get_async_redis()
+    stats = {}
+    for upstream in UPSTREAMS:
+        keys = _keys(upstream)
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.time()
+            pipe.zrange(keys[0], 0, -1, withscores=True)
+            pipe.zcard(keys[1])
+            pipe.hmget(keys[3], "tokens", "ts")
+            (seconds, micros), holders, waiting, (tokens, ts) = await pipe.execute()
+
+        now = seconds + micros / 1_000_000
+        rate, burst = rate_for(upstream)
+        if rate <= 0:
+            available = None
+        elif tokens is None:
+            available = burst
+        else:
+            available = round(min(burst, float(tokens) + (now - float(ts)) * rate), 2)
+        stats[upstream] = {
+            "concurrency": limit_for(upstream),
+            "rate_per_second": rate,
+            "burst": burst,
+            "in_flight": sum(1 for _, deadline in holders if deadline > now),
+            "waiting": waiting,
+            "tokens": available,
+        }
+    return stats
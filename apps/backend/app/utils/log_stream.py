@@ -0,0 +1,128 @@
+"""
+Generation logs as Redis Streams, fanned out to WebSocket clients.
+
+Each page has a stream `logs:{page_id}` whose entry IDs increase monotonically,
+so a client can resume from the last ID it has seen. In the API process a
+single XREAD BLOCK loop, on a connection of its own, reads the streams of
+every page with connected sockets and pushes new entries to their local
+subscribers, so Redis load doesn't depend on the number of sockets and the
+blocking read never holds more than one connection of the shared pool.
+A page's first subscriber wakes the loop up through a private stream so it
+starts reading the new page at once.
+"""
+import redis.asyncio as redis
+import asyncio
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+
+# Entries kept per page and how long the stream lives after the last line
+LOG_STREAM_MAXLEN = 200
+LOG_TTL = 300
+# How long the reader blocks in XREAD before looping
+READ_BLOCK_MS = 15000
+LOG_KEY_PREFIX = "logs:"
+
+
+def log_key(page_id: str) -> str:
+    return f"{LOG_KEY_PREFIX}{page_id}"
+
+
+def parse_stream_id(stream_id: str) -> Tuple[int, int]:
+    """Stream IDs are `<ms>-<seq>`, compare them as tuples. Raises ValueError on anything else"""
+    ms, _, seq = stream_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def format_entries(entries: List) -> List[dict]:
+    return [{"id": entry_id, "message": fields.get("message", "")} for entry_id, fields in entries]
+
+
+class LogFanout:
+    """Single Redis reader for every watched page, fanning entries out to subscriber queues"""
+
+    def __init__(self, r: redis.Redis):
+        self.r = r
+        # Holds one connection of the pool for the blocking reads
+        self.reader_redis = r.client()
+        self.wakeup_key = f"{LOG_KEY_PREFIX}wakeup:{uuid.uuid4().hex}"
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        # Last entry read per watched page
+        self.cursors: Dict[str, str] = {}
+        self.reader: Optional[asyncio.Task] = None
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(queues) for queues in self.subscribers.values())
+
+    async def subscribe(self, page_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self.subscribers.setdefault(page_id, set()).add(queue)
+        if page_id not in self.cursors:
+            # Start from the beginning: subscribers drop what they already sent,
+            # which avoids losing lines written while the reader was starting
+            self.cursors[page_id] = "0-0"
+            if self.reader is None:
+                self.reader = asyncio.create_task(self._read())
+            else:
+                await self._wake()
+        return queue
+
+    def unsubscribe(self, page_id: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(page_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            # The reader stops reading the page on its next loop
+            del self.subscribers[page_id]
+            self.cursors.pop(page_id, None)
+
+    async def backlog(self, page_id: str, last_id: Optional[str] = None) -> List:
+        """Entries after `last_id` (exclusive), or the whole stream"""
+        start = f"({last_id}" if last_id else "-"
+        return await self.r.xrange(log_key(page_id), min=start, max="+")
+
+    async def _wake(self):
+        async with self.r.pipeline(transaction=False) as pipe:
+            pipe.xadd(self.wakeup_key, {"wake": 1}, maxlen=1)
+            pipe.expire(self.wakeup_key, LOG_TTL)
+            await pipe.execute()
+
+    async def _read(self):
+        wakeup_cursor = "0-0"
+        while True:
+            streams = {self.wakeup_key: wakeup_cursor}
+            streams.update({log_key(page_id): cursor for page_id, cursor in self.cursors.items()})
+            try:
+                response = await self.reader_redis.xread(streams, block=READ_BLOCK_MS, count=100)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Failed to read logs: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            for key, entries in response or []:
+                if not entries:
+                    continue
+                if key == self.wakeup_key:
+                    wakeup_cursor = entries[-1][0]
+                    continue
+                page_id = key[len(LOG_KEY_PREFIX):]
+                if page_id not in self.cursors:
+                    continue
+                self.cursors[page_id] = entries[-1][0]
+                for queue in list(self.subscribers.get(page_id, ())):
+                    queue.put_nowait(entries)
+
+    async def close(self):
+        if self.reader:
+            self.reader.cancel()
+            self.reader = None
+        self.subscribers.clear()
+        self.cursors.clear()
+        try:
+            await self.r.delete(self.wakeup_key)
+        except Exception:
+            pass
+        await self.reader_redis.aclose()
@@ -1,22 +1,97 @@
 """
 Utility for emitting real-time logs to WebSocket clients via Redis
 """
-import redis
+from app.utils.redis_client import get_redis, get_async_redis
+from app.utils.log_stream import log_key, LOG_STREAM_MAXLEN, LOG_TTL
+from typing import List, Tuple
+import asyncio
 import os
 
+# When > 0, async log lines are buffered for this many milliseconds and
+# written in a single pipeline, coalescing the bursts of the parallel stages
+LOG_BATCH_INTERVAL_MS = int(os.getenv('LOG_BATCH_INTERVAL_MS', 0))
+LOG_BATCH_MAX_LINES = int(os.getenv('LOG_BATCH_MAX_LINES', 100))
+
+
+def _queue_log(pipe, page_id: str, message: str):
+    """Append to the page's log stream, keeping a bounded history"""
+    pipe.xadd(log_key(page_id), {"message": message}, maxlen=LOG_STREAM_MAXLEN, approximate=True)
+    pipe.expire(log_key(page_id), LOG_TTL)  # Expire logs after 5 minutes
+
+
 def emit_log(page_id: str, message: str):
     """
     Emit a log message to Redis for WebSocket streaming
     This is a synchronous function that can be called from the workflow
     """
     try:
-        redis_host = os.getenv('REDIS_HOST', 'redis')
-        r = redis.Redis(host=redis_host, port=6379, decode_responses=True)
-        
-        log_key = f"logs:{page_id}"
-        r.rpush(log_key, message)
-        r.expire(log_key, 300)  # Expire logs after 5 minutes
-        # Keep only last 5 logs
-        r.ltrim(log_key, -5, -1)
+        with get_redis().pipeline(transaction=True) as pipe:
+            _queue_log(pipe, page_id, message)
+            pipe.execute()
+    except Exception as e:
+        print(f"Failed to emit log: {e}")
+
+
+class AsyncLogBatcher:
+    """Buffers log lines and writes them in one round trip per interval"""
+
+    def __init__(self, interval_ms: int, max_lines: int):
+        self.interval = interval_ms / 1000
+        self.max_lines = max_lines
+        self.buffer: List[Tuple[str, str]] = []
+        self._flush_task = None
+        self._background = set()
+
+    def add(self, page_id: str, message: str):
+        self.buffer.append((page_id, message))
+        if len(self.buffer) >= self.max_lines:
+            task = asyncio.create_task(self.flush())
+            # Keep a reference so the task is not garbage collected mid-flight
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        await self.flush()
+
+    async def flush(self):
+        lines, self.buffer = self.buffer, []
+        if not lines:
+            return
+        try:
+            async with get_async_redis().pipeline(transaction=True) as pipe:
+                for page_id, message in lines:
+                    _queue_log(pipe, page_id, message)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Failed to emit {len(lines)} log line(s): {e}")
+
+
+_batcher = AsyncLogBatcher(LOG_BATCH_INTERVAL_MS, LOG_BATCH_MAX_LINES) if LOG_BATCH_INTERVAL_MS > 0 else None
+
+
+async def emit_log_async(page_id: str, message: str):
+    """
+    Async variant of emit_log for the async workflow
+    Uses the shared async pool, and the micro-batcher when LOG_BATCH_INTERVAL_MS is set
+    """
+    if _batcher is not None:
+        _batcher.add(page_id, message)
+        return
+
+    try:
+        async with get_async_redis().pipeline(transaction=True) as pipe:
+            _queue_log(pipe, page_id, message)
+            await pipe.execute()
     except Exception as e:
         print(f"Failed to emit log: {e}")
+
+
+async def flush_logs():
+    """Write the buffered log lines now, e.g. before shutting down"""
+    if _batcher is not None:
+        await _batcher.flush()
+        # Along with the flushes already under way
+        await asyncio.gather(*_batcher._background)
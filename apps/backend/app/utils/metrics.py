@@ -0,0 +1,240 @@
+"""
+Prometheus metrics shared by the API and worker processes.
+
+Generations run in the workers while /metrics is served by the API, so
+the values are kept in Redis and every process adds to the same series:
+
+    metrics:counters              hash series -> value
+    metrics:histograms            hash "{series}|{bucket}", "{series}|sum", "{series}|count" -> value
+    metrics:gauges:{process id}   hash series -> value of this process, expires unless refreshed
+
+A series is the metric name with its labels in exposition format, e.g.
+`pioneer_generations_total{outcome="success"}`. Histogram buckets are
+stored per bucket and made cumulative when rendered. Gauges are kept per
+process with a TTL, so a process that dies stops counting instead of
+leaving its connections or generations behind.
+
+The hit/miss counters of the caches (`cache:stats:*`) and the queue
+lengths are read as they are when rendering.
+"""
+from app.jobs import QUEUE_KEY, PROCESSING_KEY
+from app.utils.redis_client import get_redis, get_async_redis
+from typing import Dict, Optional
+import asyncio
+import os
+import socket
+
+COUNTERS_KEY = "metrics:counters"
+HISTOGRAMS_KEY = "metrics:histograms"
+GAUGES_PREFIX = "metrics:gauges:"
+GAUGE_TTL = 60
+
+PROCESS_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+# Seconds, from a cached response to a long LLM completion
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+# name -> (type, help)
+METRICS = {
+    "pioneer_workflow_stage_duration_seconds": ("histogram", "Duration of each workflow stage"),
+    "pioneer_workflow_duration_seconds": ("histogram", "Duration of a whole generation"),
+    "pioneer_generations_total": ("counter", "Generations by outcome"),
+    "pioneer_jobs_total": ("counter", "Queued jobs processed by the workers, by outcome"),
+    "pioneer_upstream_request_duration_seconds": ("histogram", "Duration of upstream calls by provider"),
+    "pioneer_upstream_queue_wait_seconds": ("histogram", "Time spent waiting for an upstream rate/concurrency slot"),
+    "pioneer_generations_in_flight": ("gauge", "Generations currently running"),
+    "pioneer_websocket_connections": ("gauge", "Open log WebSocket connections"),
+    "pioneer_cache_events_total": ("counter", "Cache hits, misses and other events by cache"),
+    "pioneer_jobs_queued": ("gauge", "Jobs waiting for a worker"),
+    "pioneer_jobs_processing": ("gauge", "Jobs owned by a worker"),
+}
+
+# Process-local gauge values, written to Redis on every change
+_gauges: Dict[str, float] = {}
+_heartbeat = None
+
+
+def series(name: str, labels: Optional[dict] = None) -> str:
+    if not labels:
+        return name
+    rendered = ",".join(f'{key}="{_escape(str(value))}"' for key, value in sorted(labels.items()))
+    return f"{name}{{{rendered}}}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _bucket(value: float) -> str:
+    for bound in BUCKETS:
+        if value <= bound:
+            return str(bound)
+    return "+Inf"
+
+
+def _queue_observe(pipe, name: str, value: float, labels: Optional[dict]):
+    key = series(name, labels)
+    pipe.hincrby(HISTOGRAMS_KEY, f"{key}|{_bucket(value)}", 1)
+    pipe.hincrbyfloat(HISTOGRAMS_KEY, f"{key}|sum", value)
+    pipe.hincrby(HISTOGRAMS_KEY, f"{key}|count", 1)
+
+
+def _queue_gauge(pipe, key: str):
+    gauges_key = GAUGES_PREFIX + PROCESS_ID
+    pipe.hset(gauges_key, key, _gauges[key])
+    pipe.expire(gauges_key, GAUGE_TTL)
+
+
+# Sync API
+
+def inc_counter(name: str, labels: Optional[dict] = None, amount: float = 1):
+    try:
+        get_redis().hincrbyfloat(COUNTERS_KEY, series(name, labels), amount)
+    except Exception as e:
+        print(f"Failed to record metric {name}: {e}")
+
+
+def observe(name: str, value: float, labels: Optional[dict] = None):
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            _queue_observe(pipe, name, value, labels)
+            pipe.execute()
+    except Exception as e:
+        print(f"Failed to record metric {name}: {e}")
+
+
+def add_gauge(name: str, delta: float, labels: Optional[dict] = None):
+    key = series(name, labels)
+    _gauges[key] = _gauges.get(key, 0) + delta
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            _queue_gauge(pipe, key)
+            pipe.execute()
+    except Exception as e:
+        print(f"Failed to record metric {name}: {e}")
+
+
+# Async API
+
+async def inc_counter_async(name: str, labels: Optional[dict] = None, amount: float = 1):
+    try:
+        await get_async_redis().hincrbyfloat(COUNTERS_KEY, series(name, labels), amount)
+    except Exception as e:
+        print(f"Failed to record metric {name}: {e}")
+
+
+async def observe_async(name: str, value: float, labels: Optional[dict] = None):
+    try:
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            _queue_observe(pipe, name, value, labels)
+            await pipe.execute()
+    except Exception as e:
+        print(f"Failed to record metric {name}: {e}")
+
+
+async def add_gauge_async(name: str, delta: float, labels: Optional[dict] = None):
+    """Change a gauge of this process, its value is kept alive while the event loop runs"""
+    global _heartbeat
+    key = series(name, labels)
+    _gauges[key] = _gauges.get(key, 0) + delta
+    if _heartbeat is None or _heartbeat.done():
+        _heartbeat = asyncio.create_task(_refresh_gauges())
+    try:
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            _queue_gauge(pipe, key)
+            await pipe.execute()
+    except Exception as e:
+        print(f"Failed to record metric {name}: {e}")
+
+
+async def _refresh_gauges():
+    """Rewrite this process' gauges before they expire"""
+    while True:
+        await asyncio.sleep(GAUGE_TTL / 3)
+        try:
+            async with get_async_redis().pipeline(transaction=False) as pipe:
+                for key in _gauges:
+                    _queue_gauge(pipe, key)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Failed to refresh gauges: {e}")
+
+
+# Exposition
+
+def _metric_name(key: str) -> str:
+    return key.split("{", 1)[0]
+
+
+def _with_label(key: str, label: str, value: str) -> str:
+    """Add a label to a series, e.g. the `le` of a histogram bucket"""
+    pair = f'{label}="{value}"'
+    if key.endswith("}"):
+        return f"{key[:-1]},{pair}}}"
+    return f"{key}{{{pair}}}"
+
+
+def _format(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+async def render_metrics() -> str:
+    """Every metric of the cluster in the Prometheus text format"""
+    r = get_async_redis()
+    samples: Dict[str, list] = {name: [] for name in METRICS}
+
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.hgetall(COUNTERS_KEY)
+        pipe.hgetall(HISTOGRAMS_KEY)
+        pipe.llen(QUEUE_KEY)
+        pipe.llen(PROCESSING_KEY)
+        counters, histograms, queued, processing = await pipe.execute()
+
+    for key, value in counters.items():
+        samples.setdefault(_metric_name(key), []).append((key, float(value)))
+
+    # {series: {bucket: count}} then cumulative buckets per series
+    by_series: Dict[str, Dict[str, float]] = {}
+    for field, value in histograms.items():
+        key, part = field.rsplit("|", 1)
+        by_series.setdefault(key, {})[part] = float(value)
+    for key, parts in sorted(by_series.items()):
+        cumulative = 0.0
+        name = _metric_name(key)
+        for bound in [str(b) for b in BUCKETS] + ["+Inf"]:
+            cumulative += parts.get(bound, 0)
+            samples.setdefault(name, []).append((_with_label(key.replace(name, f"{name}_bucket", 1), "le", bound), cumulative))
+        samples[name].append((key.replace(name, f"{name}_sum", 1), parts.get("sum", 0)))
+        samples[name].append((key.replace(name, f"{name}_count", 1), parts.get("count", 0)))
+
+    gauges: Dict[str, float] = {}
+    async for gauges_key in r.scan_iter(match=GAUGES_PREFIX + "*"):
+        for key, value in (await r.hgetall(gauges_key)).items():
+            gauges[key] = gauges.get(key, 0) + float(value)
+    for name in ("pioneer_generations_in_flight", "pioneer_websocket_connections"):
+        gauges.setdefault(name, 0)
+    for key, value in gauges.items():
+        samples.setdefault(_metric_name(key), []).append((key, value))
+
+    async for stats_key in r.scan_iter(match="cache:stats:*"):
+        cache = stats_key[len("cache:stats:"):]
+        for event, value in (await r.hgetall(stats_key)).items():
+            if event.endswith("seconds"):
+                continue
+            samples["pioneer_cache_events_total"].append(
+                (series("pioneer_cache_events_total", {"cache": cache, "event": event}), float(value))
+            )
+
+    samples["pioneer_jobs_queued"].append(("pioneer_jobs_queued", queued))
+    samples["pioneer_jobs_processing"].append(("pioneer_jobs_processing", processing))
+
+    lines = []
+    for name, values in samples.items():
+        if not values:
+            continue
+        kind, help_text = METRICS.get(name, ("untyped", ""))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{key} {_format(value)}" for key, value in values)
+    return "\n".join(lines) + "\n"
+
@@ -0,0 +1,95 @@
+"""
+Coalesces concurrent single-key loads into batched calls.
+
+Keys requested within `window_ms` of the first pending one (or until
+`max_size` distinct keys are pending) are loaded with a single
+`load_many(keys)` call. Callers asking for the same key share its result.
+
+The batched call is traced on its own and copied into the trace of every
+caller, under a `batched` span that names the batch (see tracing.link_batch).
+"""
+from app.utils.tracing import current_span, link_batch, record_batch, span
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+import asyncio
+
+# A caller's future and its `batched` span, if it is traced
+Waiter = Tuple[asyncio.Future, Optional[tuple]]
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        load_many: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        window_ms: int,
+        max_size: int,
+        missing: Callable[[Hashable], Exception] = KeyError,
+    ):
+        """
+        Args:
+            load_many: Coroutine function returning {key: value} for the keys it found
+            window_ms: How long the first key waits for others to join its batch
+            max_size: Distinct keys in a batch, reaching it flushes immediately
+            missing: Builds the exception raised for keys absent from the result
+        """
+        self.load_many = load_many
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self.missing = missing
+        self._pending: Dict[Hashable, List[Waiter]] = {}
+        self._timer = None
+        self._running = set()
+
+    async def load(self, key: Hashable) -> Any:
+        with span("batched", key=str(key)):
+            future = asyncio.get_running_loop().create_future()
+            self._pending.setdefault(key, []).append((future, current_span()))
+            if len(self._pending) >= self.max_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.create_task(self._flush_later())
+            return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        self._flush()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        task = asyncio.create_task(self._run(pending))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, pending: Dict[Hashable, List[Waiter]]):
+        waiters = [waiter for key_waiters in pending.values() for waiter in key_waiters]
+        error = None
+        try:
+            # Traced apart from the caller whose load started the batch, then linked to all of them
+            with record_batch(keys=len(pending), callers=len(waiters)) as batch:
+                results = await self.load_many(list(pending))
+        except Exception as e:
+            error = e
+        for _, caller in waiters:
+            if caller is not None:
+                link_batch(caller, batch)
+
+        if error is not None:
+            for future, _ in waiters:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for key, key_waiters in pending.items():
+            for future, _ in key_waiters:
+                if future.done():
+                    continue
+                if key in results:
+                    future.set_result(results[key])
+                else:
+                    future.set_exception(self.missing(key))
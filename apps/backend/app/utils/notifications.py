@@ -0,0 +1,101 @@
+"""
+Page completion notifications over Redis pub/sub.
+
+Whoever stores a page publishes on `page-ready:{page_id}`, as does the
+workflow for each section it publishes (payload `section`). The API holds a
+single pattern subscription and resolves the futures of the requests
+currently waiting for that page, so a long-poll costs no Redis connection.
+"""
+import redis
+import redis.asyncio as aioredis
+import asyncio
+from typing import Dict, Optional, Set
+
+READY_CHANNEL_PREFIX = "page-ready:"
+
+# Payloads published on the channel
+READY = "ready"
+FAILED = "failed"
+# One section is ready, the page is still generating
+SECTION = "section"
+
+
+def ready_channel(page_id: str) -> str:
+    return f"{READY_CHANNEL_PREFIX}{page_id}"
+
+
+def notify_page(r: redis.Redis, page_id: str, status: str = READY):
+    r.publish(ready_channel(page_id), status)
+
+
+async def notify_page_async(r: aioredis.Redis, page_id: str, status: str = READY):
+    await r.publish(ready_channel(page_id), status)
+
+
+class CompletionWaiter:
+    """Dispatches page-ready notifications to the local requests waiting for them"""
+
+    def __init__(self, r: aioredis.Redis):
+        self.r = r
+        self.waiters: Dict[str, Set[asyncio.Future]] = {}
+        # Waiters that also wake up when a single section is published
+        self.section_waiters: Dict[str, Set[asyncio.Future]] = {}
+        self._pubsub = None
+        self._listener = None
+
+    async def start(self):
+        self._pubsub = self.r.pubsub()
+        await self._pubsub.psubscribe(f"{READY_CHANNEL_PREFIX}*")
+        self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+        if self._pubsub:
+            await self._pubsub.aclose()
+
+    def register(self, page_id: str, sections: bool = False) -> asyncio.Future:
+        """Register before checking whether the page exists, so a notification can't slip in between"""
+        future = asyncio.get_running_loop().create_future()
+        waiters = self.section_waiters if sections else self.waiters
+        waiters.setdefault(page_id, set()).add(future)
+        return future
+
+    def unregister(self, page_id: str, future: asyncio.Future):
+        for waiters in (self.waiters, self.section_waiters):
+            futures = waiters.get(page_id)
+            if futures is None:
+                continue
+            futures.discard(future)
+            if not futures:
+                del waiters[page_id]
+
+    async def wait(self, future: asyncio.Future, timeout: float) -> Optional[str]:
+        """Status published for the page, or None on timeout"""
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _listen(self):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    page_id = message["channel"][len(READY_CHANNEL_PREFIX):]
+                    futures = set(self.section_waiters.pop(page_id, ()))
+                    if message["data"] != SECTION:
+                        futures |= self.waiters.pop(page_id, set())
+                    for future in futures:
+                        if not future.done():
+                            future.set_result(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Page notification listener failed: {e}")
+                await asyncio.sleep(1)
+                try:
+                    await self._pubsub.psubscribe(f"{READY_CHANNEL_PREFIX}*")
+                except Exception:
+                    pass
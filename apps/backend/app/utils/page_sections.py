@@ -0,0 +1,186 @@
+"""
+Section-level storage of pages.
+
+A page is stored per section in the hash `page:{page_id}:sections`:
+
+    {section}          the section's fields in the API page format (JSON)
+    status:{section}   pending | ready | failed
+
+The workflow resets every section to pending when it starts and publishes
+each one as soon as it is known (logos after the scrape, the hero copy
+while the features are still streaming from the LLM, the hero image once
+fal is done...) and notifies the page's long-polls (see notifications).
+The complete page is still written to `page:{page_id}`
+at the end, for the readers that want it whole.
+
+Writes are a single script: page, sections and notification go together,
+and when the writer is a queued run they only go if its attempt still owns
+the job (`guard`, see jobs.run_guard), so a superseded or reaped run never
+overwrites the page of the run that replaced it.
+"""
+from app.utils.notifications import READY as PAGE_READY, SECTION, ready_channel
+from app.utils.page_store import encode_page, page_key, version_key
+from app.utils.redis_client import get_redis, get_async_redis
+from typing import Dict, Iterable, List, Optional, Tuple
+import redis.asyncio as aioredis
+import json
+
+# Sections of an unfinished generation are dropped after a day
+SECTIONS_TTL = 60 * 60 * 24
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+# (job key, token, attempt) of the run allowed to write, None for unguarded writes
+Guard = Optional[Tuple[str, str, str]]
+
+# KEYS: sections, job, page, version
+# ARGV: token, attempt, channel, notification, page body, page version, sections ttl, field, value...
+# Returns 0 without writing when the guard's attempt no longer owns the job (same check as jobs._OWNS_ATTEMPT)
+WRITE_SCRIPT = """
+if ARGV[1] ~= '' then
+    local fields = redis.call('HMGET', KEYS[2], 'token', 'attempts', 'status')
+    if fields[1] ~= ARGV[1] or fields[2] ~= ARGV[2] or fields[3] ~= 'running' then
+        return 0
+    end
+end
+if ARGV[5] ~= '' then
+    redis.call('SET', KEYS[3], ARGV[5])
+    redis.call('SET', KEYS[4], ARGV[6])
+end
+if #ARGV > 7 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 8))
+    redis.call('EXPIRE', KEYS[1], ARGV[7])
+end
+redis.call('PUBLISH', ARGV[3], ARGV[4])
+return 1
+"""
+
+# Page fields (API format) held by each section
+SECTION_FIELDS = {
+    "hero": ("productName", "title", "subtitle", "description", "ctaPrimary", "ctaSecondary"),
+    "hero_image": ("heroImageUrl", "heroImageSources"),
+    "logos": ("companyLogos",),
+    "features": ("features", "featuresHeadline"),
+    # testimonial1/2 are set on pages written through POST /api/content
+    "testimonials": ("testimonialsHeadline", "allTestimonials", "testimonial1", "testimonial2"),
+}
+SECTIONS = tuple(SECTION_FIELDS)
+
+
+def sections_key(page_id: str) -> str:
+    return f"page:{page_id}:sections"
+
+
+def status_field(name: str) -> str:
+    return f"status:{name}"
+
+
+def split_page(page: dict) -> Dict[str, dict]:
+    """Sections of a complete page"""
+    return {
+        name: {field: page[field] for field in fields if field in page}
+        for name, fields in SECTION_FIELDS.items()
+    }
+
+
+def project_page(page: dict, names: Iterable[str]) -> dict:
+    """Keep the id and the fields of the given sections"""
+    projected = {"id": page.get("id")}
+    for name in names:
+        for field in SECTION_FIELDS[name]:
+            if field in page:
+                projected[field] = page[field]
+    return projected
+
+
+def parse_sections(raw: Dict[str, str], names: Iterable[str]) -> Tuple[dict, Dict[str, str]]:
+    """Merge the ready sections of a raw hash into page fields, with the status of each section"""
+    content = {}
+    status = {}
+    for name in names:
+        status[name] = raw.get(status_field(name), PENDING)
+        if status[name] == READY and name in raw:
+            content.update(json.loads(raw[name]))
+    return content, status
+
+
+# Pipelined writes
+
+def _queue_reset(pipe, page_id: str):
+    pipe.delete(sections_key(page_id))
+    pipe.hset(sections_key(page_id), mapping={status_field(name): PENDING for name in SECTIONS})
+    pipe.expire(sections_key(page_id), SECTIONS_TTL)
+
+
+def _write_args(page_id: str, sections: Dict[str, dict], page: Optional[dict], guard: Guard) -> List:
+    """WRITE_SCRIPT keys and args: ready sections, and the complete page if given"""
+    job, token, attempt = guard or (sections_key(page_id), "", "")
+    body, version = encode_page(page) if page is not None else (b"", "")
+    notification = SECTION if page is None else PAGE_READY
+    args = [token, attempt, ready_channel(page_id), notification, body, version, SECTIONS_TTL]
+    for name, data in sections.items():
+        args += [name, json.dumps(data), status_field(name), READY]
+    return [4, sections_key(page_id), job, page_key(page_id), version_key(page_id), *args]
+
+
+# Sync API
+
+def reset_sections(page_id: str):
+    try:
+        with get_redis().pipeline(transaction=True) as pipe:
+            _queue_reset(pipe, page_id)
+            pipe.execute()
+    except Exception as e:
+        print(f"Failed to reset sections: {e}")
+
+
+def write_page(page_id: str, page: dict, guard: Guard = None) -> bool:
+    """Write the complete page and all its sections, False if the guard's run lost the job"""
+    return bool(get_redis().eval(WRITE_SCRIPT, *_write_args(page_id, split_page(page), page, guard)))
+
+
+def publish_section(page_id: str, name: str, data: dict, guard: Guard = None):
+    try:
+        get_redis().eval(WRITE_SCRIPT, *_write_args(page_id, {name: data}, None, guard))
+    except Exception as e:
+        print(f"Failed to publish section {name}: {e}")
+
+
+# Async API
+
+async def reset_sections_async(page_id: str):
+    try:
+        async with get_async_redis().pipeline(transaction=True) as pipe:
+            _queue_reset(pipe, page_id)
+            await pipe.execute()
+    except Exception as e:
+        print(f"Failed to reset sections: {e}")
+
+
+async def write_page_async(page_id: str, page: dict, guard: Guard = None) -> bool:
+    return bool(await get_async_redis().eval(WRITE_SCRIPT, *_write_args(page_id, split_page(page), page, guard)))
+
+
+async def publish_section_async(page_id: str, name: str, data: dict, guard: Guard = None):
+    try:
+        await get_async_redis().eval(WRITE_SCRIPT, *_write_args(page_id, {name: data}, None, guard))
+    except Exception as e:
+        print(f"Failed to publish section {name}: {e}")
+
+
+async def fail_pending_sections(r: aioredis.Redis, page_id: str):
+    """Mark the sections a failed generation never produced"""
+    statuses = await r.hmget(sections_key(page_id), [status_field(name) for name in SECTIONS])
+    failed = {status_field(name): FAILED for name, status in zip(SECTIONS, statuses) if status == PENDING}
+    if failed:
+        await r.hset(sections_key(page_id), mapping=failed)
+
+
+async def read_sections(r: aioredis.Redis, page_id: str, names: Optional[Iterable[str]] = None) -> Optional[Tuple[dict, Dict[str, str]]]:
+    """(ready fields, status map) of the page's sections, or None if it has none stored"""
+    raw = await r.hgetall(sections_key(page_id))
+    if not raw:
+        return None
+    return parse_sections(raw, names or SECTIONS)
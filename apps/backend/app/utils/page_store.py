@@ -0,0 +1,75 @@
+"""
+Storage format of complete pages.
+
+`page:{page_id}` holds the page as it is served: its JSON bytes, or the
+same bytes gzip-compressed when PAGE_STORAGE_ENCODING=gzip. Reads return
+the stored bytes without a decode/encode round trip; compressed pages go
+out as-is with `Content-Encoding: gzip` to the clients that accept it.
+
+`page:{page_id}:version` is a hash of the JSON bytes written in the same
+transaction. It is the page's ETag and changes whenever the page is rewritten.
+"""
+from typing import Optional, Tuple
+import gzip
+import hashlib
+import json
+import os
+
+# json (default) or gzip, readers handle both so the setting can change at any time
+PAGE_STORAGE_ENCODING = os.getenv("PAGE_STORAGE_ENCODING", "json")
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def page_key(page_id: str) -> str:
+    return f"page:{page_id}"
+
+
+def version_key(page_id: str) -> str:
+    return f"page:{page_id}:version"
+
+
+def page_version(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:16]
+
+
+def encode_page(page: dict) -> Tuple[bytes, str]:
+    """Stored bytes and version of a page"""
+    body = json.dumps(page).encode("utf-8")
+    version = page_version(body)
+    if PAGE_STORAGE_ENCODING == "gzip":
+        # mtime=0 so the same page always compresses to the same bytes
+        body = gzip.compress(body, mtime=0)
+    return body, version
+
+
+def is_compressed(stored: bytes) -> bool:
+    return stored[:2] == GZIP_MAGIC
+
+
+def page_json(stored: bytes) -> bytes:
+    """JSON bytes of a stored page"""
+    return gzip.decompress(stored) if is_compressed(stored) else stored
+
+
+def decode_page(stored: bytes) -> dict:
+    return json.loads(page_json(stored))
+
+
+def queue_page_write(pipe, page_id: str, page: dict) -> str:
+    """Queue the write of the page and its version on a pipeline, returns the version"""
+    body, version = encode_page(page)
+    pipe.set(page_key(page_id), body)
+    pipe.set(version_key(page_id), version)
+    return version
+
+
+async def read_page(r, page_id: str) -> Tuple[Optional[bytes], Optional[str]]:
+    """
+    (stored bytes, version) of a page in one round trip, or (None, None).
+    `r` must return raw bytes (see get_async_binary_redis).
+    """
+    stored, version = await r.mget(page_key(page_id), version_key(page_id))
+    if stored is None:
+        return None, None
+    # Pages written before versions existed get one from their content
+    return stored, version.decode() if version else page_version(page_json(stored))
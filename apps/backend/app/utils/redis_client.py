@@ -0,0 +1,88 @@
+"""
+Process-wide Redis connection pools shared by the sync and async code paths.
+
+Every module gets its client from here instead of opening its own, so a
+process keeps a bounded set of long-lived connections whatever the number
+of jobs, log lines or requests it handles.
+
+Settings (environment):
+    REDIS_HOST, REDIS_PORT       server address
+    REDIS_MAX_CONNECTIONS        size of each pool (sync and async)
+"""
+import redis
+import redis.asyncio as aioredis
+import os
+
+_pool = None
+_client = None
+_async_pool = None
+_async_client = None
+_binary_pool = None
+_binary_client = None
+
+
+def _settings(decode_responses: bool = True) -> dict:
+    return {
+        "host": os.getenv('REDIS_HOST', 'redis'),
+        "port": int(os.getenv('REDIS_PORT', 6379)),
+        "max_connections": int(os.getenv('REDIS_MAX_CONNECTIONS', 200)),
+        "decode_responses": decode_responses,
+    }
+
+
+def get_redis() -> redis.Redis:
+    """Process-wide sync Redis client backed by a thread-safe connection pool"""
+    global _pool, _client
+    if _client is None:
+        _pool = redis.ConnectionPool(**_settings())
+        _client = redis.Redis(connection_pool=_pool)
+    return _client
+
+
+def get_async_redis() -> aioredis.Redis:
+    """
+    Process-wide async Redis client, created lazily on first use.
+    The client holds its own connection pool, so it is safe to share
+    between concurrent workflows running on the same event loop.
+    """
+    global _async_pool, _async_client
+    if _async_client is None:
+        _async_pool = aioredis.ConnectionPool(**_settings())
+        _async_client = aioredis.Redis(connection_pool=_async_pool)
+    return _async_client
+
+
+def get_async_binary_redis() -> aioredis.Redis:
+    """
+    Async client returning raw bytes, for values served as stored
+    (e.g. compressed pages) that must not be decoded as text.
+    """
+    global _binary_pool, _binary_client
+    if _binary_client is None:
+        _binary_pool = aioredis.ConnectionPool(**_settings(decode_responses=False))
+        _binary_client = aioredis.Redis(connection_pool=_binary_pool)
+    return _binary_client
+
+
+async def close_async_redis():
+    """Close the shared async clients and their pools, used on shutdown"""
+    global _async_pool, _async_client, _binary_pool, _binary_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        await _async_pool.disconnect()
+        _async_client = None
+        _async_pool = None
+    if _binary_client is not None:
+        await _binary_client.aclose()
+        await _binary_pool.disconnect()
+        _binary_client = None
+        _binary_pool = None
+
+
+def close_redis():
+    global _pool, _client
+    if _client is not None:
+        _client.close()
+        _pool.disconnect()
+        _client = None
+        _pool = None
@@ -0,0 +1,238 @@
+"""
+Per-generation traces: a tree of timed spans recorded while a workflow
+runs, stored in Redis so a slow page can be diagnosed after the fact.
+
+    workflow
+    ├─ scrape
+    │  └─ apify          request_bytes, response_bytes, retries, request_id
+    ├─ vision
+    │  └─ mistral        request_id, prompt/completion tokens, cache.vision=hit|miss
+    └─ ...
+
+The current span lives in a context variable, so it follows asyncio tasks
+and `asyncio.to_thread` on its own; plain threads (the sync workflow's
+stage pool) are given it with `use_span`. Code running outside a traced
+workflow gets no-op spans.
+
+A call made once for several workflows (see MicroBatcher) is traced on its
+own with `record_batch`, then copied into each caller's trace by
+`link_batch`, under a span carrying the batch id they share.
+
+The last trace of a page is kept under `trace:{page_id}` for TRACE_TTL.
+"""
+from app.utils.redis_client import get_redis, get_async_redis
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import itertools
+import json
+import os
+import time
+import uuid
+
+TRACE_TTL = int(os.getenv("TRACE_TTL", 60 * 60 * 24))
+WATERFALL_WIDTH = 40
+
+
+def trace_key(page_id: str) -> str:
+    return f"trace:{page_id}"
+
+
+@dataclass
+class Span:
+    id: int
+    parent: Optional[int]
+    name: str
+    start: float
+    end: Optional[float] = None
+    status: str = "ok"
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+class Trace:
+    def __init__(self, page_id: str):
+        self.page_id = page_id
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self._ids = itertools.count()
+        self.spans: List[Span] = []
+
+    def now(self) -> float:
+        return time.perf_counter() - self._origin
+
+    def open(self, name: str, parent: Optional[Span], attrs: dict) -> Span:
+        span = Span(next(self._ids), parent.id if parent else None, name, self.now(), attrs=dict(attrs))
+        self.spans.append(span)
+        return span
+
+    def to_dict(self) -> dict:
+        root = self.spans[0]
+        return {
+            "page_id": self.page_id,
+            "started_at": self.started_at,
+            "duration": round((root.end if root.end is not None else self.now()) - root.start, 3),
+            "status": root.status,
+            "spans": [
+                {
+                    "id": s.id,
+                    "parent": s.parent,
+                    "name": s.name,
+                    "start": round(s.start, 3),
+                    "duration": round(s.end - s.start, 3) if s.end is not None else None,
+                    "status": s.status,
+                    "attrs": s.attrs,
+                }
+                for s in self.spans
+            ],
+        }
+
+
+_current: ContextVar[Optional[Tuple[Trace, Span]]] = ContextVar("trace_span", default=None)
+
+
+def current_span() -> Optional[Tuple[Trace, Span]]:
+    return _current.get()
+
+
+@contextmanager
+def record_trace(page_id: str, **attrs):
+    """Trace the block as the root span of the page's generation, yields the Trace"""
+    with _record(Trace(page_id), "workflow", attrs) as trace:
+        yield trace
+
+
+@contextmanager
+def record_batch(**attrs):
+    """Trace the block on its own as a call shared by several callers, yields the Trace for link_batch"""
+    with _record(Trace(f"batch-{uuid.uuid4().hex[:12]}"), "batch", attrs) as trace:
+        yield trace
+
+
+@contextmanager
+def _record(trace: Trace, name: str, attrs: dict):
+    root = trace.open(name, None, attrs)
+    token = _current.set((trace, root))
+    try:
+        yield trace
+    except BaseException as e:
+        root.status = "error"
+        root.attrs["error"] = str(e) or type(e).__name__
+        raise
+    finally:
+        root.end = trace.now()
+        _current.reset(token)
+
+
+@contextmanager
+def use_span(current: Optional[Tuple[Trace, Span]]):
+    """Make a span captured with current_span() the current one, e.g. in a worker thread"""
+    token = _current.set(current)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time the block as a child of the current span, yields None outside a trace"""
+    current = _current.get()
+    if current is None:
+        yield None
+        return
+
+    trace, parent = current
+    child = trace.open(name, parent, attrs)
+    token = _current.set((trace, child))
+    try:
+        yield child
+    except BaseException as e:
+        child.status = "error"
+        child.attrs["error"] = str(e) or type(e).__name__
+        raise
+    finally:
+        child.end = trace.now()
+        _current.reset(token)
+
+
+def link_batch(caller: Tuple[Trace, Span], batch: Trace):
+    """Copy the spans of a batch under a caller's span, which gets the batch id"""
+    trace, parent = caller
+    parent.attrs["batch"] = batch.page_id
+    offset = batch._origin - trace._origin
+    ids = {None: parent.id}
+    for s in batch.spans:
+        copied = Span(
+            next(trace._ids), ids[s.parent], s.name, s.start + offset,
+            s.end + offset if s.end is not None else None, s.status, dict(s.attrs),
+        )
+        ids[s.id] = copied.id
+        trace.spans.append(copied)
+
+
+def annotate(**attrs):
+    """Set attributes on the current span, if any"""
+    current = _current.get()
+    if current is not None:
+        current[1].attrs.update(attrs)
+
+
+# Storage
+
+def save_trace(trace: Trace):
+    try:
+        get_redis().set(trace_key(trace.page_id), json.dumps(trace.to_dict()), ex=TRACE_TTL)
+    except Exception as e:
+        print(f"Failed to save trace: {e}")
+
+
+async def save_trace_async(trace: Trace):
+    try:
+        await get_async_redis().set(trace_key(trace.page_id), json.dumps(trace.to_dict()), ex=TRACE_TTL)
+    except Exception as e:
+        print(f"Failed to save trace: {e}")
+
+
+async def load_trace(r, page_id: str) -> Optional[dict]:
+    raw = await r.get(trace_key(page_id))
+    return json.loads(raw) if raw else None
+
+
+# Waterfall
+
+def _format_attrs(attrs: dict) -> str:
+    parts = [f"{key}={value}" for key, value in attrs.items() if key != "error" and value is not None]
+    if "error" in attrs:
+        parts.append(f"error={attrs['error']!r}")
+    return " ".join(parts)
+
+
+def render_waterfall(trace: dict, width: int = WATERFALL_WIDTH) -> str:
+    """
+    One line per span, children indented under their parent:
+    name, start offset, duration, a bar on the trace's time axis and the attributes.
+    """
+    total = trace["duration"] or 1e-9
+    children: Dict[Optional[int], list] = {}
+    for s in trace["spans"]:
+        children.setdefault(s["parent"], []).append(s)
+
+    lines = [f"trace {trace['page_id']} {trace['status']} {trace['duration']:.2f}s"]
+
+    def visit(s: dict, depth: int):
+        duration = s["duration"] if s["duration"] is not None else total - s["start"]
+        begin = min(width - 1, int(s["start"] / total * width))
+        length = max(1, round(duration / total * width))
+        bar = " " * begin + "█" * min(length, width - begin)
+        label = ("  " * depth + s["name"])[:28]
+        marker = "!" if s["status"] == "error" else " "
+        lines.append(
+            f"{label:<28}{marker}{s['start']:>8.2f}s {duration:>8.2f}s |{bar:<{width}}| {_format_attrs(s['attrs'])}".rstrip()
+        )
+        for child in sorted(children.get(s["id"], []), key=lambda c: c["start"]):
+            visit(child, depth + 1)
+
+    for root in children.get(None, []):
+        visit(root, 0)
+    return "\n".join(lines) + "\n"
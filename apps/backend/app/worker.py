@@ -0,0 +1,140 @@
+"""
+Worker process consuming landing page generation jobs from Redis.
+
+Run with `python -m app.worker`. Several workers (processes or containers)
+can consume the same queue; each one runs up to WORKER_CONCURRENCY jobs
+at the same time on its event loop.
+"""
+from app.assets import collect_garbage
+from app.jobs import (
+    VISIBILITY_TIMEOUT, reserve_job, extend_lease, set_stage, complete_job, fail_job, requeue_expired, run_guard,
+)
+from app.utils.logger import emit_log_async, flush_logs
+from app.utils.metrics import inc_counter_async
+from app.utils.notifications import notify_page_async, FAILED
+from app.utils.page_sections import fail_pending_sections
+from app.utils.redis_client import get_async_redis, get_async_binary_redis, close_async_redis
+from app.workflow import workflow_async
+import asyncio
+import os
+import socket
+import uuid
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 4))
+REAPER_INTERVAL = int(os.getenv("JOB_REAPER_INTERVAL", 15))
+ASSETS_GC_INTERVAL = int(os.getenv("ASSETS_GC_INTERVAL", 60 * 60))
+# Seconds between lease renewals, which is also how soon a superseded or reaped run stops
+LEASE_CHECK_INTERVAL = int(os.getenv("JOB_LEASE_CHECK_INTERVAL", 10))
+
+worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+async def keep_lease(run: str, attempt: str, workflow: asyncio.Task, lost: asyncio.Event):
+    """Renew the lease well before it expires, until cancelled; stop the run once it lost its lease"""
+    r = get_async_redis()
+    while True:
+        await asyncio.sleep(min(VISIBILITY_TIMEOUT / 3, LEASE_CHECK_INTERVAL))
+        try:
+            renewed = await extend_lease(r, run, attempt)
+        except Exception as e:
+            # Try again on the next renewal, the lease outlives a few of them
+            print(f"Failed to renew the lease of {run}: {e}")
+            continue
+        if not renewed:
+            lost.set()
+            workflow.cancel()
+            return
+
+
+async def process_job(job: dict):
+    r = get_async_redis()
+    page_id, run, attempt = job["page_id"], job["run"], job["attempts"]
+
+    async def on_stage_start(stage):
+        await set_stage(r, run, attempt, stage.name)
+
+    lost = asyncio.Event()
+    workflow = asyncio.create_task(workflow_async(
+        job["product_description"], job["linkedin_url"], page_id,
+        on_stage_start=on_stage_start, fresh=job.get("fresh") == "1", guard=run_guard(run, attempt),
+    ))
+    heartbeat = asyncio.create_task(keep_lease(run, attempt, workflow, lost))
+    try:
+        await workflow
+    except asyncio.CancelledError:
+        if not lost.is_set():
+            raise
+        # The new run or attempt owns the page, its sections and logs: leave them alone
+        status = await fail_job(r, run, "lost its lease", attempt)
+        print(f"⏭️ Job {page_id} stopped (attempt {attempt}): {status}")
+        await inc_counter_async("pioneer_jobs_total", {"outcome": status})
+    except Exception as e:
+        status = await fail_job(r, run, str(e), attempt)
+        print(f"❌ Job {page_id} failed (attempt {attempt}): {e} -> {status}")
+        if status in ("superseded", "expired"):
+            await inc_counter_async("pioneer_jobs_total", {"outcome": status})
+        elif status == "failed":
+            await inc_counter_async("pioneer_jobs_total", {"outcome": "failed"})
+            await emit_log_async(page_id, "❌ Landing page generation failed")
+            await fail_pending_sections(r, page_id)
+            await notify_page_async(r, page_id, FAILED)
+        else:
+            await inc_counter_async("pioneer_jobs_total", {"outcome": "retried"})
+            await emit_log_async(page_id, "🔁 Generation failed, retrying...")
+    else:
+        completed = await complete_job(r, run, attempt)
+        await inc_counter_async("pioneer_jobs_total", {"outcome": "completed" if completed else "lost"})
+    finally:
+        heartbeat.cancel()
+        workflow.cancel()
+
+
+async def consume(slot: int):
+    r = get_async_redis()
+    while True:
+        try:
+            job = await reserve_job(r, worker_id)
+        except Exception as e:
+            print(f"Failed to reserve job: {e}")
+            await asyncio.sleep(1)
+            continue
+
+        if job:
+            print(f"🛠️ [{worker_id}/{slot}] Processing job {job['run']}")
+            await process_job(job)
+
+
+async def reap():
+    r = get_async_redis()
+    while True:
+        try:
+            recovered = await requeue_expired(r)
+            if recovered:
+                print(f"♻️ Recovered {recovered} job(s) with an expired lease")
+        except Exception as e:
+            print(f"Failed to recover expired jobs: {e}")
+        await asyncio.sleep(REAPER_INTERVAL)
+
+
+async def collect_assets():
+    while True:
+        try:
+            removed = await collect_garbage(get_async_binary_redis())
+            if removed:
+                print(f"🧹 Deleted {removed} unreferenced asset file(s)")
+        except Exception as e:
+            print(f"Failed to collect assets: {e}")
+        await asyncio.sleep(ASSETS_GC_INTERVAL)
+
+
+async def main():
+    print(f"🚀 Worker {worker_id} started with concurrency {WORKER_CONCURRENCY}")
+    try:
+        await asyncio.gather(reap(), collect_assets(), *(consume(slot) for slot in range(WORKER_CONCURRENCY)))
+    finally:
+        await flush_logs()
+        await close_async_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,58 +1,50 @@
 """
 Workflow for generating landing pages from LinkedIn data and product descriptions.
 """
-from app.fal.text_to_image import generate_image
-from app.llm.prompts import describe_person_from_url, generate_image_prompt, generate_landing_page_content
-from app.scraper.linkedin_scraper import get_basic_data, get_reactions, BasicData, Reactor
-from app.utils.logger import emit_log
+from app.assets import mirror_page_assets, mirror_page_assets_async
+from app.fal.text_to_image import generate_image, generate_image_async
+from app.llm.prompts import (
+	describe_person_from_url, describe_person_from_url_async, generate_image_prompt,
+	generate_landing_page_content, generate_landing_page_content_async,
+)
+from app.scraper.linkedin_scraper import get_basic_data, get_basic_data_async, get_reactions, get_reactions_async, BasicData, Reactor, MAX_REACTORS
+from app.utils.logger import emit_log, emit_log_async
+from app.utils.redis_client import get_redis, get_async_redis
+from app.utils.page_sections import (
+	Guard, write_page, write_page_async, reset_sections, reset_sections_async, publish_section, publish_section_async,
+)
+from app.utils.tracing import record_trace, current_span, use_span, span, save_trace, save_trace_async
+from app.utils.metrics import inc_counter, inc_counter_async, observe, observe_async, add_gauge, add_gauge_async
+from app.pipeline import Stage, StageTiming, RunResult, run_stages, arun_stages
+from dataclasses import replace
 from typing import List
-import redis
 import json
-import os
-
-
-def fetch_linkedin_data(linkedin_url: str) -> tuple[BasicData, List[Reactor]]:
-    """
-    Fetch basic data and reactors from a LinkedIn profile.
-
-    Args:
-        linkedin_url: LinkedIn profile URL
-
-    Returns:
-        Tuple of (BasicData, List[Reactor])
-    """
-    # Get basic profile data and recent posts
-    basic_data = get_basic_data(linkedin_url, post_count=2)
-
-    # Get reactors from the most recent post (if available)
-    reactors = []
-    if basic_data.last_posts_urls:
-        most_recent_post = basic_data.last_posts_urls[0]
-        try:
-            reactors = get_reactions(most_recent_post)
-        except Exception:
-            reactors = []
-
-    return basic_data, reactors
-
-
-def workflow(product_description, linkedin_url, page_id):
-	emit_log(page_id, "🔍 Fetching LinkedIn profile data...")
-	base_data, reactors = fetch_linkedin_data(linkedin_url)
-	
-	emit_log(page_id, "👤 Analyzing profile picture...")
-	lead_description = describe_person_from_url(base_data.profile_picture_url)
-	
-	emit_log(page_id, "🎨 Generating hero image...")
-	image_prompt = generate_image_prompt(lead_description, product_description)
-	image = generate_image(image_prompt)
-	
-	emit_log(page_id, "✍️ Creating landing page content...")
-	lp = generate_landing_page_content(product_description, base_data.job_title, base_data.last_posts_texts)
+import time
+
+# Log line emitted when each stage starts
+STAGE_MESSAGES = {
+	"scrape": "🔍 Fetching LinkedIn profile data...",
+	"vision": "👤 Analyzing profile picture...",
+	"image": "🎨 Generating hero image...",
+	"copy": "✍️ Creating landing page content...",
+	"save": "💾 Saving landing page to database...",
+	"assets": "🖼️ Optimizing images...",
+}
+
+# Per-stage timings of the last run are kept for a day
+TIMINGS_TTL = 60 * 60 * 24
+
+def fetch_reactors(basic_data: BasicData) -> List[Reactor]:
+	"""Get reactors from the most recent post (if available)"""
+	if not basic_data.last_posts_urls:
+		return []
+	return get_reactions(basic_data.last_posts_urls[0])
 
-	# Use reactors for testimonials instead of generated ones
+
+def build_testimonials(reactors: List[Reactor], lp: dict) -> List[dict]:
+	"""Use reactors for testimonials instead of generated ones"""
 	testimonials = []
-	for reactor in reactors[:6]:  # Take first 6 reactors
+	for reactor in reactors[:MAX_REACTORS]:
 		# Extract initials from name
 		name_parts = reactor.name.split()
 		initials = ''.join([part[0] for part in name_parts if part])
@@ -65,45 +57,355 @@ def workflow(product_description, linkedin_url, page_id):
 			"initials": initials,
 			"profile_picture_url": reactor.profile_picture_url
 		})
+	return testimonials
 
-	# Replace generated testimonials with reactor-based ones
-	lp["testimonials"] = testimonials
-	lp["hero_image_url"] = image
 
-	emit_log(page_id, "💾 Saving landing page to database...")
-	
-	# Prepare data for Redis (matching API format)
-	redis_data = {
-		"id": page_id,
+def hero_section(lp: dict) -> dict:
+	return {
 		"productName": lp.get("product_name"),
 		"title": lp.get("hero_title"),
 		"subtitle": lp.get("hero_subtitle"),
 		"description": lp.get("hero_social_proof"),
 		"ctaPrimary": lp.get("hero_cta_primary"),
 		"ctaSecondary": lp.get("hero_cta_secondary"),
-		"heroImageUrl": image,
-		"companyLogos": {
-			"logo1": base_data.logo_url
-		},
+	}
+
+
+def logos_section(base_data: BasicData) -> dict:
+	return {"companyLogos": {"logo1": base_data.logo_url}}
+
+
+def features_section(lp: dict) -> dict:
+	return {
 		"features": lp.get("features"),
 		"featuresHeadline": lp.get("features_headline"),
+	}
+
+
+def testimonials_section(lp: dict, testimonials: List[dict]) -> dict:
+	return {
 		"testimonialsHeadline": lp.get("testimonials_headline"),
-		"allTestimonials": testimonials
+		"allTestimonials": testimonials,
 	}
 
-	# Save to Redis (use 'redis' as host when running in Docker)
-	redis_host = os.getenv('REDIS_HOST', 'redis')
-	r = redis.Redis(host=redis_host, port=6379, decode_responses=True)
-	redis_key = f"page:{page_id}"
-	r.set(redis_key, json.dumps(redis_data))
+
+# Page format of the copy sections streamed by the LLM (see COPY_SECTIONS) that are
+# published as they close. The streamed testimonials only carry the quotes, the
+# section stays pending until the save stage pairs them with the reactors
+COPY_SECTION_BUILDERS = {
+	"hero": hero_section,
+	"features": features_section,
+}
+
+# Log line emitted when a copy section is published
+SECTION_MESSAGES = {
+	"hero": "🦸 Hero copy ready",
+	"features": "📋 Features ready",
+}
+
+
+def build_page_data(page_id: str, base_data: BasicData, reactors: List[Reactor], lp: dict, image: str) -> dict:
+	"""Merge the generated content, image and reactors into the page format served by the API"""
+	testimonials = build_testimonials(reactors, lp)
+
+	# Replace generated testimonials with reactor-based ones
+	lp["testimonials"] = testimonials
+	lp["hero_image_url"] = image
+
+	# Prepare data for Redis (matching API format)
+	return {
+		"id": page_id,
+		**hero_section(lp),
+		"heroImageUrl": image,
+		**logos_section(base_data),
+		**features_section(lp),
+		**testimonials_section(lp, testimonials),
+	}
+
+
+class RunSuperseded(Exception):
+	"""The run lost its job to a newer submission or attempt, its page was not saved"""
+
+
+def save_page(page_id: str, redis_data: dict, guard: Guard = None) -> dict:
+	"""Save the page to Redis, whole and per section, and wake up the clients long-polling for it"""
+	if not write_page(page_id, redis_data, guard):
+		raise RunSuperseded(f"Page {page_id} is owned by a newer run")
+	return redis_data
+
+
+def _timings_payload(result: RunResult) -> dict:
+	return {
+		"total": round(result.total, 3),
+		"stages": [
+			{"name": t.name, "start": round(t.started_at, 3), "duration": round(t.duration, 3), "ok": t.ok}
+			for t in result.timings
+		]
+	}
+
+
+def save_timings(page_id: str, result: RunResult):
+	"""Keep the per-stage timings of the last run next to the page"""
+	try:
+		get_redis().set(f"timings:{page_id}", json.dumps(_timings_payload(result)), ex=TIMINGS_TTL)
+	except Exception as e:
+		print(f"Failed to save timings: {e}")
+
+
+async def save_page_async(page_id: str, redis_data: dict, guard: Guard = None) -> dict:
+	if not await write_page_async(page_id, redis_data, guard):
+		raise RunSuperseded(f"Page {page_id} is owned by a newer run")
+	return redis_data
+
+
+async def save_timings_async(page_id: str, result: RunResult):
+	try:
+		await get_async_redis().set(f"timings:{page_id}", json.dumps(_timings_payload(result)), ex=TIMINGS_TTL)
+	except Exception as e:
+		print(f"Failed to save timings: {e}")
+
+
+def scrape_profile(linkedin_url: str, page_id: str, guard: Guard) -> BasicData:
+	base_data = get_basic_data(linkedin_url, post_count=2)
+	publish_section(page_id, "logos", logos_section(base_data), guard)
+	return base_data
+
+
+def describe_lead(base_data: BasicData) -> str:
+	return describe_person_from_url(base_data.profile_picture_url)
+
+
+def create_hero_image(lead_description: str, product_description: str, fresh: bool, page_id: str, guard: Guard) -> str:
+	image_prompt = generate_image_prompt(lead_description, product_description)
+	image = generate_image(image_prompt, fresh=fresh)
+	publish_section(page_id, "hero_image", {"heroImageUrl": image}, guard)
+	return image
+
+
+def create_copy(product_description: str, base_data: BasicData, fresh: bool, page_id: str, guard: Guard) -> dict:
+	def on_section(name: str, fields: dict):
+		if name not in COPY_SECTION_BUILDERS:
+			return
+		publish_section(page_id, name, COPY_SECTION_BUILDERS[name](fields), guard)
+		emit_log(page_id, SECTION_MESSAGES[name])
+
+	return generate_landing_page_content(
+		product_description, base_data.job_title, base_data.last_posts_texts, fresh=fresh, on_section=on_section,
+	)
+
+
+def store_page(page_id: str, base_data: BasicData, reactors: List[Reactor], lp: dict, image: str, guard: Guard) -> dict:
+	return save_page(page_id, build_page_data(page_id, base_data, reactors, lp, image), guard)
+
+
+def mirror_assets(page_id: str, page: dict, guard: Guard) -> dict:
+	"""Point the saved page at local, resized copies of its images"""
+	mirrored = mirror_page_assets(page)
+	return save_page(page_id, mirrored, guard) if mirrored != page else page
+
+
+def build_stages() -> List[Stage]:
+	"""
+	Stage graph of the workflow:
+
+	scrape ─┬─ reactors ───────┐
+	        ├─ vision ── image ─┼─ save ── assets
+	        └─ copy ────────────┘
+
+	The page is served as soon as it is saved, the assets stage then
+	rewrites it with mirrored images and doesn't fail the job.
+	"""
+	return [
+		Stage("scrape", scrape_profile, inputs=("linkedin_url", "page_id", "guard"), outputs=("base_data",)),
+		Stage("reactors", fetch_reactors, inputs=("base_data",), outputs=("reactors",), optional=True, default=[]),
+		Stage("vision", describe_lead, inputs=("base_data",), outputs=("lead_description",)),
+		Stage("image", create_hero_image, inputs=("lead_description", "product_description", "fresh", "page_id", "guard"), outputs=("image",)),
+		Stage("copy", create_copy, inputs=("product_description", "base_data", "fresh", "page_id", "guard"), outputs=("lp",)),
+		Stage("save", store_page, inputs=("page_id", "base_data", "reactors", "lp", "image", "guard"), outputs=("page",)),
+		Stage("assets", mirror_assets, inputs=("page_id", "page", "guard"), outputs=("mirrored_page",), optional=True, default=None),
+	]
+
+
+async def scrape_profile_async(linkedin_url: str, page_id: str, guard: Guard) -> BasicData:
+	base_data = await get_basic_data_async(linkedin_url, post_count=2)
+	await publish_section_async(page_id, "logos", logos_section(base_data), guard)
+	return base_data
+
+
+async def fetch_reactors_async(basic_data: BasicData) -> List[Reactor]:
+	if not basic_data.last_posts_urls:
+		return []
+	return await get_reactions_async(basic_data.last_posts_urls[0])
+
+
+async def describe_lead_async(base_data: BasicData) -> str:
+	return await describe_person_from_url_async(base_data.profile_picture_url)
+
+
+async def create_hero_image_async(lead_description: str, product_description: str, fresh: bool, page_id: str, guard: Guard) -> str:
+	image_prompt = generate_image_prompt(lead_description, product_description)
+	image = await generate_image_async(image_prompt, fresh=fresh)
+	await publish_section_async(page_id, "hero_image", {"heroImageUrl": image}, guard)
+	return image
+
+
+async def create_copy_async(product_description: str, base_data: BasicData, fresh: bool, page_id: str, guard: Guard) -> dict:
+	async def on_section(name: str, fields: dict):
+		if name not in COPY_SECTION_BUILDERS:
+			return
+		await publish_section_async(page_id, name, COPY_SECTION_BUILDERS[name](fields), guard)
+		await emit_log_async(page_id, SECTION_MESSAGES[name])
+
+	return await generate_landing_page_content_async(
+		product_description, base_data.job_title, base_data.last_posts_texts, fresh=fresh, on_section=on_section,
+	)
+
+
+async def store_page_async(page_id: str, base_data: BasicData, reactors: List[Reactor], lp: dict, image: str, guard: Guard) -> dict:
+	return await save_page_async(page_id, build_page_data(page_id, base_data, reactors, lp, image), guard)
+
+
+async def mirror_assets_async(page_id: str, page: dict, guard: Guard) -> dict:
+	mirrored = await mirror_page_assets_async(page)
+	return await save_page_async(page_id, mirrored, guard) if mirrored != page else page
+
+
+def build_async_stages() -> List[Stage]:
+	"""Same graph as build_stages, with every upstream call awaited on the event loop"""
+	return [
+		Stage("scrape", scrape_profile_async, inputs=("linkedin_url", "page_id", "guard"), outputs=("base_data",)),
+		Stage("reactors", fetch_reactors_async, inputs=("base_data",), outputs=("reactors",), optional=True, default=[]),
+		Stage("vision", describe_lead_async, inputs=("base_data",), outputs=("lead_description",)),
+		Stage("image", create_hero_image_async, inputs=("lead_description", "product_description", "fresh", "page_id", "guard"), outputs=("image",)),
+		Stage("copy", create_copy_async, inputs=("product_description", "base_data", "fresh", "page_id", "guard"), outputs=("lp",)),
+		Stage("save", store_page_async, inputs=("page_id", "base_data", "reactors", "lp", "image", "guard"), outputs=("page",)),
+		Stage("assets", mirror_assets_async, inputs=("page_id", "page", "guard"), outputs=("mirrored_page",), optional=True, default=None),
+	]
+
+
+def traced_stages(stages: List[Stage]) -> List[Stage]:
+	"""Run each stage in a span of the current trace, from the thread pool of run_stages"""
+	parent = current_span()
+
+	def traced(stage: Stage) -> Stage:
+		def run(*args):
+			with use_span(parent), span(stage.name):
+				return stage.fn(*args)
+		return replace(stage, fn=run)
+
+	return [traced(stage) for stage in stages]
+
+
+def traced_async_stages(stages: List[Stage]) -> List[Stage]:
+	"""Async variant of traced_stages, stage tasks inherit the current span"""
+	def traced(stage: Stage) -> Stage:
+		async def run(*args):
+			with span(stage.name):
+				return await stage.fn(*args)
+		return replace(stage, fn=run)
+
+	return [traced(stage) for stage in stages]
+
+
+def _stage_labels(timing: StageTiming) -> dict:
+	return {"stage": timing.name, "outcome": "success" if timing.ok else "failure"}
+
+
+def record_stage(timing: StageTiming):
+	observe("pioneer_workflow_stage_duration_seconds", timing.duration, _stage_labels(timing))
+
+
+def record_generation(outcome: str, seconds: float):
+	inc_counter("pioneer_generations_total", {"outcome": outcome})
+	observe("pioneer_workflow_duration_seconds", seconds, {"outcome": outcome})
+
+
+async def record_stage_async(timing: StageTiming):
+	await observe_async("pioneer_workflow_stage_duration_seconds", timing.duration, _stage_labels(timing))
+
+
+async def record_generation_async(outcome: str, seconds: float):
+	await inc_counter_async("pioneer_generations_total", {"outcome": outcome})
+	await observe_async("pioneer_workflow_duration_seconds", seconds, {"outcome": outcome})
+
+
+def workflow(product_description, linkedin_url, page_id, fresh=False, guard=None):
+	def on_stage_start(stage: Stage):
+		message = STAGE_MESSAGES.get(stage.name)
+		if message:
+			emit_log(page_id, message)
+
+	reset_sections(page_id)
+	started = time.perf_counter()
+	add_gauge("pioneer_generations_in_flight", 1)
+	try:
+		with record_trace(page_id, linkedin_url=linkedin_url, fresh=fresh) as trace:
+			result = run_stages(
+				traced_stages(build_stages()),
+				{"product_description": product_description, "linkedin_url": linkedin_url, "page_id": page_id, "fresh": fresh, "guard": guard},
+				on_stage_start=on_stage_start,
+				on_stage_end=record_stage,
+			)
+	except Exception:
+		record_generation("failure", time.perf_counter() - started)
+		raise
+	finally:
+		add_gauge("pioneer_generations_in_flight", -1)
+		save_trace(trace)
+	record_generation("success", result.total)
+	save_timings(page_id, result)
 
 	# Log the URL to access the generated landing page
-	emit_log(page_id, "✅ Landing page generated successfully!")
+	emit_log(page_id, f"✅ Landing page generated successfully! ({result.total:.1f}s)")
+	print(f"\n✅ Landing page generated and saved to Redis!")
+	print(f"📍 Redis key: page:{page_id}")
+	print(f"📍 Page ID: {page_id}")
+	print(f"⏱️ {result.summary()}\n")
+
+	return result.values["lp"]
+
+async def workflow_async(product_description, linkedin_url, page_id, on_stage_start=None, fresh=False, guard=None):
+	"""
+	Async variant of workflow. Every upstream call is a coroutine, so an
+	in-flight generation costs a task on the event loop instead of a thread.
+	`on_stage_start` is an optional coroutine function called with each stage as it starts.
+	`fresh` bypasses the generation caches to get a new variant of the page.
+	`guard` (see jobs.run_guard) restricts the page writes to the run that still owns the job.
+	"""
+	async def stage_started(stage: Stage):
+		message = STAGE_MESSAGES.get(stage.name)
+		if message:
+			await emit_log_async(page_id, message)
+		if on_stage_start:
+			await on_stage_start(stage)
+
+	await reset_sections_async(page_id)
+	started = time.perf_counter()
+	await add_gauge_async("pioneer_generations_in_flight", 1)
+	try:
+		with record_trace(page_id, linkedin_url=linkedin_url, fresh=fresh) as trace:
+			result = await arun_stages(
+				traced_async_stages(build_async_stages()),
+				{"product_description": product_description, "linkedin_url": linkedin_url, "page_id": page_id, "fresh": fresh, "guard": guard},
+				on_stage_start=stage_started,
+				on_stage_end=record_stage_async,
+			)
+	except Exception:
+		await record_generation_async("failure", time.perf_counter() - started)
+		raise
+	finally:
+		await add_gauge_async("pioneer_generations_in_flight", -1)
+		await save_trace_async(trace)
+	await record_generation_async("success", result.total)
+	await save_timings_async(page_id, result)
+
+	await emit_log_async(page_id, f"✅ Landing page generated successfully! ({result.total:.1f}s)")
 	print(f"\n✅ Landing page generated and saved to Redis!")
-	print(f"📍 Redis key: {redis_key}")
-	print(f"📍 Page ID: {page_id}\n")
+	print(f"📍 Redis key: page:{page_id}")
+	print(f"📍 Page ID: {page_id}")
+	print(f"⏱️ {result.summary()}\n")
 
-	return lp
+	return result.values["lp"]
 
 if __name__ == "__main__":
 	product = ("keyboards made out of bamboo")
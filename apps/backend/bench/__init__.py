@@ -0,0 +1,4 @@
+"""
+Offline benchmarks of the backend, run against local stand-ins of the
+upstream services (see bench.fakes) and a local Redis.
+"""
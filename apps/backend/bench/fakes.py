@@ -0,0 +1,315 @@
+"""
+Local stand-ins for Apify, Mistral and fal, so the whole generation path
+can be load tested without network access or API credits.
+
+One FastAPI app serves all three, the backend is pointed at it with:
+
+    APIFY_ACTS_URL        {base}/v2/acts                 run-sync-get-dataset-items of both actors
+    MISTRAL_SERVER_URL    {base}                         /v1/chat/completions, streamed or not
+    (fal, see FakeFal)    {base}/fal/{application}       returns a generated image URL
+                          {base}/images/{name}.png       profile pictures, logos and hero images
+
+Each upstream answers after a delay drawn from its latency distribution
+and fails with its error rate: Apify with 503 (retried by the client),
+Mistral with 429 and fal with 500. Latencies are given as
+
+    fixed:SECONDS  uniform:LOW,HIGH  lognormal:MEDIAN,SIGMA
+
+Streamed completions spread the delay over their chunks.
+"""
+from dataclasses import dataclass, field
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from functools import lru_cache
+from PIL import Image
+from typing import Dict, Optional
+import asyncio
+import hashlib
+import httpx
+import io
+import json
+import math
+import random
+import re
+import time
+import uuid
+
+STREAM_CHUNKS = 24
+JOB_TITLE = re.compile(r'job title "([^"]*)"')
+
+
+@dataclass
+class Latency:
+    kind: str
+    a: float
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, _, args = spec.partition(":")
+        values = [float(value) for value in args.split(",") if value]
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+        if kind not in expected or len(values) != expected[kind]:
+            raise ValueError(f"Invalid latency {spec!r} (expected fixed:S, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA)")
+        return cls(kind, *values)
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.a
+        if self.kind == "uniform":
+            return random.uniform(self.a, self.b)
+        return random.lognormvariate(math.log(self.a), self.b)
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{self.a}" if self.kind == "fixed" else f"{self.kind}:{self.a},{self.b}"
+
+
+@dataclass
+class Upstream:
+    latency: Latency
+    error_rate: float = 0.0
+    requests: int = 0
+    errors: int = 0
+
+    def fails(self) -> bool:
+        self.requests += 1
+        failed = random.random() < self.error_rate
+        if failed:
+            self.errors += 1
+        return failed
+
+
+@dataclass
+class Profiles:
+    apify: Upstream = field(default_factory=lambda: Upstream(Latency("lognormal", 4.0, 0.4)))
+    mistral: Upstream = field(default_factory=lambda: Upstream(Latency("lognormal", 3.0, 0.4)))
+    fal: Upstream = field(default_factory=lambda: Upstream(Latency("lognormal", 2.0, 0.3)))
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            name: {"latency": str(upstream.latency), "error_rate": upstream.error_rate, "requests": upstream.requests, "errors": upstream.errors}
+            for name, upstream in (("apify", self.apify), ("mistral", self.mistral), ("fal", self.fal))
+        }
+
+
+def _slug(profile_url: str) -> str:
+    return profile_url.rstrip("/").split("/")[-1]
+
+
+def _activity_id(seed: str) -> int:
+    return 7_000_000_000_000_000_000 + int(hashlib.sha256(seed.encode("utf-8")).hexdigest()[:12], 16)
+
+
+# Apify
+
+def fake_posts(base_url: str, profile_urls: list, per_profile: int) -> list:
+    items = []
+    for profile_url in profile_urls:
+        slug = _slug(profile_url)
+        author = {
+            "firstName": slug.split("-")[0].title(),
+            "lastName": "Bench",
+            "occupation": f"Head of Growth at {slug.title()} Labs",
+            "picture": f"{base_url}/images/avatar-{slug}.png",
+            "logoUrl": f"{base_url}/images/logo-{slug}.png",
+        }
+        for n in range(max(per_profile, 1)):
+            activity = _activity_id(f"{slug}:{n}")
+            items.append({
+                "url": f"https://www.linkedin.com/posts/{slug}_bench-activity-{activity}-x1Yz",
+                "urn": f"urn:li:activity:{activity}",
+                "text": f"Post {n} by {slug}: shipping faster with a smaller team, lessons from this quarter.",
+                "author": author,
+                "authorProfileId": slug,
+                "inputUrl": profile_url,
+            })
+    return items
+
+
+def fake_reactions(base_url: str, post_urls: list, limit: int) -> list:
+    items = []
+    for post_url in post_urls:
+        for n in range(limit):
+            name = f"Reactor {n} {hashlib.sha256(post_url.encode('utf-8')).hexdigest()[:6]}"
+            items.append({
+                "reaction_type": "LIKE",
+                "reactor": {
+                    "name": name,
+                    "headline": "Product Manager",
+                    "profile_url": f"https://www.linkedin.com/in/reactor-{n}",
+                    "profile_pictures": {"medium": f"{base_url}/images/reactor-{n}.png"},
+                },
+                "_metadata": {"post_url": post_url},
+            })
+    return items
+
+
+# Mistral
+
+def fake_copy(job_title: str) -> dict:
+    return {
+        "product_name": "BenchFlow",
+        "hero_title": "Ship landing pages while the coffee brews",
+        "hero_subtitle": f"Built for a {job_title[:60] or 'busy team'} who would rather talk to customers than push pixels.",
+        "hero_social_proof": "Trusted by 2,000+ growth teams",
+        "hero_cta_primary": "Start free",
+        "hero_cta_secondary": "Book a demo",
+        "features_headline": "Everything you need, nothing you don't",
+        "features": [
+            {"icon": icon, "title": f"{icon} by default", "description": f"{icon} comes built in, with no setup and no extra seats to buy."}
+            for icon in ("Zap", "Shield", "Globe", "Sparkles")
+        ],
+        "testimonials_headline": "Teams like yours already switched",
+        "testimonials": [
+            {"name": f"Alex Persona{n}", "role": role, "content": "We went from a week per page to an afternoon, and conversion went up.", "rating": 5, "initials": "AP"}
+            for n, role in enumerate(("CEO", "CMO", "Head of Sales", "Founder", "Growth Lead", job_title[:40] or "Marketer"))
+        ],
+    }
+
+
+def _completion_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _usage(prompt: str, completion: str) -> dict:
+    prompt_tokens, completion_tokens = len(prompt) // 4, len(completion) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _chat_reply(body: dict) -> str:
+    if body.get("model", "").startswith("pixtral"):
+        return "A smiling professional in their thirties with short dark hair, wearing a navy blazer, bright office background."
+    prompt = " ".join(m["content"] for m in body.get("messages", []) if isinstance(m.get("content"), str))
+    match = JOB_TITLE.search(prompt)
+    return json.dumps(fake_copy(match.group(1) if match else ""))
+
+
+# Images
+
+@lru_cache(maxsize=512)
+def fake_png(name: str) -> bytes:
+    """A gradient tinted by the name, hero images at fal's landscape_4_3 size"""
+    size = (1024, 768) if name.startswith("hero") else (200, 200)
+    digest = hashlib.sha256(name.encode("utf-8")).digest()
+    gradient = Image.linear_gradient("L").resize(size)
+    image = Image.merge("RGB", (
+        gradient.point(lambda v: (v + digest[0]) % 256),
+        gradient.rotate(90).resize(size).point(lambda v: (v + digest[1]) % 256),
+        Image.new("L", size, digest[2]),
+    ))
+    out = io.BytesIO()
+    image.save(out, format="PNG", compress_level=1)
+    return out.getvalue()
+
+
+def create_app(base_url: str, profiles: Optional[Profiles] = None) -> FastAPI:
+    profiles = profiles or Profiles()
+    app = FastAPI(title="Upstream fakes")
+    app.state.profiles = profiles
+
+    @app.post("/v2/acts/{actor}/run-sync-get-dataset-items")
+    async def run_actor(actor: str, request: Request):
+        payload = await request.json()
+        await asyncio.sleep(profiles.apify.latency.sample())
+        if profiles.apify.fails():
+            return JSONResponse({"error": {"type": "run-failed", "message": "Actor run failed"}}, status_code=503)
+        if "post_urls" in payload:
+            return fake_reactions(base_url, payload["post_urls"], int(payload.get("limit", 6)))
+        return fake_posts(base_url, payload.get("urls", []), int(payload.get("limitPerSource", 5)))
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        latency = profiles.mistral.latency.sample()
+        if profiles.mistral.fails():
+            await asyncio.sleep(latency / 10)
+            return JSONResponse({"object": "error", "message": "Requests rate limit exceeded", "type": "rate_limited"}, status_code=429)
+
+        prompt, reply, model, completion_id = json.dumps(body.get("messages", [])), _chat_reply(body), body.get("model", ""), _completion_id()
+        if not body.get("stream"):
+            await asyncio.sleep(latency)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "model": model,
+                "created": int(time.time()),
+                "usage": _usage(prompt, reply),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            }
+
+        async def events():
+            step = max(1, math.ceil(len(reply) / STREAM_CHUNKS))
+            pieces = [reply[i:i + step] for i in range(0, len(reply), step)]
+            for n, piece in enumerate(pieces):
+                await asyncio.sleep(latency / len(pieces))
+                last = n == len(pieces) - 1
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "created": int(time.time()),
+                    "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": "stop" if last else None}],
+                }
+                if last:
+                    chunk["usage"] = _usage(prompt, reply)
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/fal/{application:path}")
+    async def fal_run(application: str):
+        await asyncio.sleep(profiles.fal.latency.sample())
+        if profiles.fal.fails():
+            return JSONResponse({"detail": "Internal server error"}, status_code=500)
+        request_id = str(uuid.uuid4())
+        return {"request_id": request_id, "images": [{"url": f"{base_url}/images/hero-{request_id}.png", "width": 1024, "height": 768, "content_type": "image/png"}]}
+
+    @app.get("/images/{name}.png")
+    def image(name: str):
+        return Response(fake_png(name), media_type="image/png")
+
+    @app.get("/stats")
+    async def stats():
+        return profiles.stats()
+
+    return app
+
+
+class FakeFalError(Exception):
+    pass
+
+
+class FakeFal:
+    """
+    Drop-in for the `fal_client` functions the backend uses (subscribe and
+    subscribe_async), running the request against the fake server. fal's
+    own client can't be pointed there: it only speaks https to its queue.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 120.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _result(self, status_code: int, body: dict, on_enqueue) -> dict:
+        if status_code != 200:
+            raise FakeFalError(f"fal request failed with status {status_code}: {body}")
+        if on_enqueue is not None:
+            on_enqueue(body["request_id"])
+        return {"images": body["images"]}
+
+    def subscribe(self, application: str, arguments: dict, on_enqueue=None, **kwargs) -> dict:
+        response = httpx.post(f"{self.base_url}/fal/{application}", json=arguments, timeout=self.timeout)
+        return self._result(response.status_code, response.json(), on_enqueue)
+
+    async def subscribe_async(self, application: str, arguments: dict, on_enqueue=None, **kwargs) -> dict:
+        async with httpx.AsyncClient(timeout=self.timeout) as http:
+            response = await http.post(f"{self.base_url}/fal/{application}", json=arguments)
+        return self._result(response.status_code, response.json(), on_enqueue)
+
+
+def install_fake_fal(base_url: str):
+    """Route the backend's fal calls to the fake server"""
+    from app.fal import text_to_image
+
+    text_to_image.fal_client = FakeFal(base_url)
@@ -0,0 +1,291 @@
+"""
+End-to-end load benchmark of the generation path, fully offline.
+
+Starts the upstream fakes (bench.fakes) in-process, then the API and
+`--workers` worker processes (bench.serve) against the Redis of
+REDIS_HOST/REDIS_PORT, and drives POST /api/generate with `--concurrency`
+closed-loop clients: each one submits a new lead, long-polls
+/api/content?wait until the page is complete (or failed), then submits
+the next. The report is JSON:
+
+    throughput      completed pages per minute over the run
+    time_to_page    p50/p95/p99/max seconds from submit to complete page
+    threadpools     per process: pool saturation and event loop lag (bench.probes)
+    redis           commands processed per completed page
+    upstreams       calls and injected errors per fake
+
+    python -m bench.load --jobs 200 --concurrency 20 --workers 2 \\
+        --mistral-latency lognormal:3,0.4 --apify-error-rate 0.05 --output report.json
+
+Upstream limits, WORKER_CONCURRENCY and the other settings are taken from
+the environment as in production. Redis commands are counted server-wide
+(INFO), so run it against a Redis nothing else uses. Every run uses new
+profile slugs and nothing is flushed.
+"""
+from app.utils.redis_client import get_redis
+from bench.fakes import Latency, Profiles, Upstream, create_app
+from bench.probes import POOLS_KEY
+from typing import List, Optional
+import argparse
+import asyncio
+import httpx
+import itertools
+import json
+import math
+import os
+import redis
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRODUCT = "An AI assistant that turns a sales call transcript into a follow-up email and CRM notes"
+CONTENT_WAIT = 30
+STARTUP_TIMEOUT = 30
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(values: List[float]) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "mean": round(sum(values) / len(values), 3),
+        "max": round(max(values), 3),
+    }
+
+
+def start_fakes(profiles: Profiles):
+    """Serve the fakes from a thread of this process, returns (server, base_url)"""
+    import uvicorn
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = uvicorn.Server(uvicorn.Config(create_app(base_url, profiles), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Upstream fakes did not start")
+        time.sleep(0.05)
+    return server, base_url
+
+
+def start_backend(args, fakes_url: str, workdir: str):
+    """API and worker processes, returns (processes, api_url)"""
+    port = free_port()
+    env = dict(
+        os.environ,
+        PYTHONUNBUFFERED="1",
+        APIFY_TOKEN="bench",
+        APIFY_ACTS_URL=f"{fakes_url}/v2/acts",
+        MISTRAL_KEY="bench",
+        MISTRAL_SERVER_URL=fakes_url,
+        FAL_KEY="bench",
+        BENCH_FAKES_URL=fakes_url,
+        IMAGE_CACHE_DIR=os.path.join(workdir, "image_cache"),
+        ASSETS_DIR=os.path.join(workdir, "assets"),
+    )
+    processes = [spawn(workdir, "api", ["api", "--port", str(port)], env)]
+    processes += [spawn(workdir, f"worker-{n}", ["worker"], env) for n in range(args.workers)]
+    return processes, f"http://127.0.0.1:{port}"
+
+
+def spawn(workdir: str, name: str, command: List[str], env: dict) -> subprocess.Popen:
+    """Start `python -m bench.serve COMMAND`, logging to {workdir}/{name}.log"""
+    log = open(os.path.join(workdir, f"{name}.log"), "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "bench.serve", *command], cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+def wait_until_healthy(api_url: str, processes):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if any(process.poll() is not None for process in processes):
+            raise RuntimeError("A backend process exited during startup, see its log")
+        try:
+            if httpx.get(f"{api_url}/api/health", timeout=1).json().get("status") == "healthy":
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("API did not become healthy")
+
+
+def stop_backend(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def generate_one(http: httpx.AsyncClient, linkedin_url: str, timeout: float) -> dict:
+    """Submit one lead and wait for its complete page"""
+    started = time.perf_counter()
+    response = await http.post("/api/generate", data={"product_description": PRODUCT, "linkedin_url": linkedin_url, "fresh": "true"})
+    if response.status_code != 200:
+        return {"ok": False, "seconds": time.perf_counter() - started, "error": f"generate: HTTP {response.status_code}"}
+    page_id = response.json()["page_id"]
+
+    while time.perf_counter() - started < timeout:
+        response = await http.get(f"/api/content/{page_id}", params={"wait": CONTENT_WAIT})
+        if response.status_code == 200:
+            content = response.json()
+            if "status" not in content:
+                return {"ok": True, "seconds": time.perf_counter() - started}
+            if all(state == "ready" for state in content["status"].values()):
+                # Every section is in, the complete page is being stored
+                await asyncio.sleep(0.05)
+        elif response.status_code == 404 and "failed" in response.text:
+            job = (await http.get(f"/api/jobs/{page_id}")).json()
+            return {"ok": False, "seconds": time.perf_counter() - started, "error": job.get("error") or "failed"}
+        elif response.status_code != 404:
+            return {"ok": False, "seconds": time.perf_counter() - started, "error": f"content: HTTP {response.status_code}"}
+    return {"ok": False, "seconds": time.perf_counter() - started, "error": "timeout"}
+
+
+async def drive(api_url: str, jobs: int, concurrency: int, timeout: float) -> List[dict]:
+    run_id = uuid.uuid4().hex[:8]
+    numbers = itertools.count()
+    results: List[dict] = []
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+
+    async with httpx.AsyncClient(base_url=api_url, timeout=CONTENT_WAIT + 30, limits=limits) as http:
+        async def client():
+            while (n := next(numbers)) < jobs:
+                try:
+                    result = await generate_one(http, f"https://www.linkedin.com/in/bench-{run_id}-{n}/", timeout)
+                except httpx.HTTPError as e:
+                    result = {"ok": False, "seconds": None, "error": f"{type(e).__name__}: {e}"}
+                results.append(result)
+                if len(results) % 10 == 0 or len(results) == jobs:
+                    failed = sum(1 for r in results if not r["ok"])
+                    print(f"📦 {len(results)}/{jobs} done, {failed} failed", file=sys.stderr)
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    return results
+
+
+def commands_processed(r) -> Optional[int]:
+    """Commands the server processed since it started, None if it doesn't report them"""
+    try:
+        return r.info("stats")["total_commands_processed"]
+    except (redis.RedisError, KeyError):
+        return None
+
+
+def collect_pools(r) -> dict:
+    return {field: json.loads(value) for field, value in sorted(r.hgetall(POOLS_KEY).items())}
+
+
+def redis_commands(r) -> Optional[int]:
+    """
+    Commands processed by the server, less the pool samplers' writes.
+    The difference of two readings includes the first reading's own 2 commands.
+    """
+    total = commands_processed(r)
+    if total is None:
+        return None
+    return total - sum(pool["redis_commands"] for pool in collect_pools(r).values())
+
+
+def upstream(latency: str, error_rate: float) -> Upstream:
+    return Upstream(Latency.parse(latency), error_rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end load benchmark of /api/generate")
+    parser.add_argument("--jobs", type=int, default=50, help="Pages to generate")
+    parser.add_argument("--concurrency", type=int, default=10, help="Clients generating at the same time")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds before a page counts as failed")
+    for name, defaults in (("apify", "lognormal:4,0.4"), ("mistral", "lognormal:3,0.4"), ("fal", "lognormal:2,0.3")):
+        parser.add_argument(f"--{name}-latency", default=defaults, help=f"{name} latency distribution (default {defaults})")
+        parser.add_argument(f"--{name}-error-rate", type=float, default=0.0, help=f"Share of {name} calls failing")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    profiles = Profiles(
+        apify=upstream(args.apify_latency, args.apify_error_rate),
+        mistral=upstream(args.mistral_latency, args.mistral_error_rate),
+        fal=upstream(args.fal_latency, args.fal_error_rate),
+    )
+    r = get_redis()
+    r.delete(POOLS_KEY)
+    workdir = tempfile.mkdtemp(prefix="pioneer-bench-")
+    print(f"🧪 Logs and assets in {workdir}", file=sys.stderr)
+
+    fakes, fakes_url = start_fakes(profiles)
+    processes, api_url = start_backend(args, fakes_url, workdir)
+    try:
+        wait_until_healthy(api_url, processes)
+        commands_before = redis_commands(r)
+        started = time.perf_counter()
+        results = asyncio.run(drive(api_url, args.jobs, args.concurrency, args.timeout))
+        elapsed = time.perf_counter() - started
+        commands_after = redis_commands(r)
+        pools = collect_pools(r)
+    finally:
+        stop_backend(processes)
+        fakes.should_exit = True
+
+    commands = commands_after - commands_before - 2 if commands_before is not None and commands_after is not None else None
+
+    completed = [result["seconds"] for result in results if result["ok"]]
+    errors = {}
+    for result in results:
+        if not result["ok"]:
+            errors[result["error"]] = errors.get(result["error"], 0) + 1
+
+    report = {
+        "config": {
+            "jobs": args.jobs,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "worker_concurrency": int(os.getenv("WORKER_CONCURRENCY", 4)),
+        },
+        "duration_seconds": round(elapsed, 2),
+        "completed": len(completed),
+        "failed": len(results) - len(completed),
+        "errors": errors,
+        "throughput_per_minute": round(len(completed) / elapsed * 60, 2) if elapsed else 0,
+        "time_to_page": summarize(completed),
+        "threadpools": pools,
+        "redis": {
+            "commands": commands,
+            "commands_per_page": round(commands / len(completed), 1) if completed and commands is not None else None,
+        },
+        "upstreams": profiles.stats(),
+        "workdir": workdir,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Thread pool saturation and event loop lag of a backend process, sampled
+on its event loop and published to Redis for the benchmark to collect:
+
+    bench:pools   hash "{role}:{pid}" -> JSON snapshot of the process
+
+Two pools are watched: the event loop's default executor (asyncio.to_thread,
+run_in_executor) and anyio's thread limiter (Starlette's sync endpoints and
+run_in_threadpool). A pool is saturated while all of its threads are busy;
+`queued_peak` is the longest backlog seen behind it. Loop lag is how late
+the sampler's own sleep wakes up.
+"""
+from app.utils.redis_client import get_async_redis
+from typing import Optional, Tuple
+import anyio.to_thread
+import asyncio
+import json
+import os
+import time
+
+POOLS_KEY = "bench:pools"
+SAMPLE_SECONDS = 0.05
+PUBLISH_SECONDS = 1.0
+
+
+class PoolStats:
+    def __init__(self):
+        self.size = 0
+        self.samples = 0
+        self.busy_total = 0
+        self.busy_peak = 0
+        self.saturated = 0
+        self.queued_peak = 0
+
+    def add(self, size: int, busy: int, queued: int):
+        self.size = size
+        self.samples += 1
+        self.busy_total += busy
+        self.busy_peak = max(self.busy_peak, busy)
+        self.queued_peak = max(self.queued_peak, queued)
+        if size and busy >= size:
+            self.saturated += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "size": self.size,
+            "samples": self.samples,
+            "busy_mean": round(self.busy_total / self.samples, 2) if self.samples else 0,
+            "busy_peak": self.busy_peak,
+            "saturated_ratio": round(self.saturated / self.samples, 3) if self.samples else 0,
+            "queued_peak": self.queued_peak,
+        }
+
+
+def default_executor_load(loop: asyncio.AbstractEventLoop) -> Optional[Tuple[int, int, int]]:
+    """(threads, busy threads, queued calls) of the loop's default executor, None until first used"""
+    executor = getattr(loop, "_default_executor", None)
+    if executor is None:
+        return None
+    busy = len(executor._threads) - executor._idle_semaphore._value
+    return executor._max_workers, max(busy, 0), executor._work_queue.qsize()
+
+
+def anyio_load() -> Tuple[int, int, int]:
+    """(tokens, borrowed tokens, waiting tasks) of anyio's default thread limiter"""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    stats = limiter.statistics()
+    return int(limiter.total_tokens), stats.borrowed_tokens, stats.tasks_waiting
+
+
+async def sample_pools(role: str):
+    """Sample until cancelled, publishing a snapshot every PUBLISH_SECONDS"""
+    loop = asyncio.get_running_loop()
+    field = f"{role}:{os.getpid()}"
+    pools = {"default_executor": PoolStats(), "anyio": PoolStats()}
+    lag_total, lag_peak, samples, published = 0.0, 0.0, 0, 0
+    last_publish = time.monotonic()
+
+    while True:
+        before = time.monotonic()
+        await asyncio.sleep(SAMPLE_SECONDS)
+        now = time.monotonic()
+        lag = max(0.0, now - before - SAMPLE_SECONDS)
+        lag_total, lag_peak, samples = lag_total + lag, max(lag_peak, lag), samples + 1
+
+        executor = default_executor_load(loop)
+        if executor is not None:
+            pools["default_executor"].add(*executor)
+        pools["anyio"].add(*anyio_load())
+
+        if now - last_publish >= PUBLISH_SECONDS:
+            last_publish = now
+            published += 1
+            snapshot = {
+                "role": role,
+                "pid": os.getpid(),
+                "loop_lag_ms": {"mean": round(lag_total / samples * 1000, 2), "peak": round(lag_peak * 1000, 2)},
+                "pools": {name: stats.to_dict() for name, stats in pools.items()},
+                # Commands this sampler sent, so the benchmark can leave them out
+                "redis_commands": published,
+            }
+            try:
+                await get_async_redis().hset(POOLS_KEY, field, json.dumps(snapshot))
+            except Exception as e:
+                print(f"Failed to publish pool stats: {e}")
@@ -0,0 +1,379 @@
+"""
+Read-path benchmark: what prospects hit once their page exists.
+
+Seeds `--pages` generated-looking pages in the Redis of REDIS_HOST/REDIS_PORT,
+starts the API (bench.serve) and measures, for every page count and number
+of concurrent viewers:
+
+    content     GET /api/content/{id}       Redis MGET + stored JSON
+    landing     GET /landing?id={id}        index.html with the page embedded
+    assets      GET /assets/{file}          the SPA's static JS and CSS
+    media       GET /media/{name}           mirrored hero image
+
+requests/sec, latency percentiles and Redis commands per request. Viewers
+are closed-loop clients spread over `--driver-processes` processes so the
+driver doesn't become the bottleneck.
+
+Then, for every number of open log WebSockets, with all of them on one
+page (`shared`) and one page each (`per_page`): Redis commands/sec per open
+socket while idle, and while `--log-rate` lines/sec are written to every
+page, with the delivery latency of those lines.
+
+    python -m bench.read_path --pages 10,1000 --viewers 1,16,64 \\
+        --sockets 10,100,1000 --duration 10 --output read_path.json
+
+Without --frontend-dist, the landing_page build is used when present,
+else a stand-in index.html and bundle of typical size. Redis commands are
+counted server-wide (INFO), so run it against a Redis nothing else uses.
+Seeded pages are deleted at the end.
+"""
+from app.utils.logger import emit_log_async
+from app.utils.page_store import page_key, version_key, queue_page_write
+from app.utils.redis_client import get_redis
+from bench.fakes import fake_copy, fake_png
+from bench.load import BACKEND_DIR, collect_pools, free_port, redis_commands, spawn, stop_backend, summarize, wait_until_healthy
+from bench.probes import POOLS_KEY
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+import argparse
+import asyncio
+import hashlib
+import httpx
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import uuid
+import websockets
+
+ENDPOINTS = ("content", "landing", "assets", "media")
+WS_LAYOUTS = ("shared", "per_page")
+# MULTI, XADD, EXPIRE, EXEC of emit_log_async
+LOG_WRITE_COMMANDS = 4
+SEED_BATCH = 500
+CONNECT_BATCH = 100
+BUNDLE_BYTES = {"index-bench.js": 350 * 1024, "index-bench.css": 60 * 1024}
+
+
+def int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+# Fixtures
+
+def stand_in_frontend(workdir: str) -> str:
+    """index.html of the landing_page app pointing at a JS and CSS bundle of typical size"""
+    dist = os.path.join(workdir, "frontend")
+    os.makedirs(os.path.join(dist, "assets"), exist_ok=True)
+    with open(os.path.join(BACKEND_DIR, "..", "landing_page", "index.html"), encoding="utf-8") as f:
+        index = f.read()
+    index = index.replace(
+        '<script type="module" src="/src/main.tsx"></script>',
+        '<script type="module" crossorigin src="/assets/index-bench.js"></script>',
+    ).replace("</head>", '  <link rel="stylesheet" crossorigin href="/assets/index-bench.css">\n  </head>')
+    with open(os.path.join(dist, "index.html"), "w", encoding="utf-8") as f:
+        f.write(index)
+    for name, size in BUNDLE_BYTES.items():
+        # Hex digests compress about as well as minified code
+        with open(os.path.join(dist, "assets", name), "w") as f:
+            f.write("".join(hashlib.sha256(f"{name}{n}".encode("utf-8")).hexdigest() for n in range(size // 64)))
+    return dist
+
+
+def mirrored_hero(assets_dir: str) -> dict:
+    """Mirror a hero image into assets_dir, returns the page fields pointing at it"""
+    os.environ["ASSETS_DIR"] = assets_dir
+    from app.assets import MEDIA_TYPES, transcode
+
+    variants = transcode(fake_png("hero-bench"), "hero")
+    return {
+        "heroImageUrl": variants["webp"][-1][1],
+        "heroImageSources": [
+            {"type": MEDIA_TYPES[fmt], "srcSet": ", ".join(f"{url} {width}w" for width, url in urls)}
+            for fmt, urls in variants.items()
+        ],
+    }
+
+
+def fake_page(page_id: str, hero: dict) -> dict:
+    """A page in the format saved by the workflow (see build_page_data)"""
+    lp = fake_copy("Head of Growth")
+    return {
+        "id": page_id,
+        "productName": lp["product_name"],
+        "title": lp["hero_title"],
+        "subtitle": lp["hero_subtitle"],
+        "description": lp["hero_social_proof"],
+        "ctaPrimary": lp["hero_cta_primary"],
+        "ctaSecondary": lp["hero_cta_secondary"],
+        **hero,
+        "companyLogos": {"logo1": hero["heroImageUrl"]},
+        "features": lp["features"],
+        "featuresHeadline": lp["features_headline"],
+        "testimonialsHeadline": lp["testimonials_headline"],
+        "allTestimonials": [
+            {**testimonial, "profile_picture_url": hero["heroImageUrl"]} for testimonial in lp["testimonials"]
+        ],
+    }
+
+
+def seed_pages(r, page_ids: List[str], hero: dict):
+    for start in range(0, len(page_ids), SEED_BATCH):
+        with r.pipeline(transaction=False) as pipe:
+            for page_id in page_ids[start:start + SEED_BATCH]:
+                queue_page_write(pipe, page_id, fake_page(page_id, hero))
+            pipe.execute()
+
+
+def delete_pages(r, page_ids: List[str]):
+    for start in range(0, len(page_ids), SEED_BATCH):
+        batch = page_ids[start:start + SEED_BATCH]
+        r.delete(*[page_key(page_id) for page_id in batch], *[version_key(page_id) for page_id in batch])
+
+
+def endpoint_paths(endpoint: str, page_ids: List[str], frontend_dist: str, hero: dict) -> List[str]:
+    if endpoint == "content":
+        return [f"/api/content/{page_id}" for page_id in page_ids]
+    if endpoint == "landing":
+        return [f"/landing?id={page_id}" for page_id in page_ids]
+    if endpoint == "assets":
+        return [f"/assets/{name}" for name in sorted(os.listdir(os.path.join(frontend_dist, "assets")))]
+    return [hero["heroImageUrl"]]
+
+
+# HTTP
+
+async def _http_load(api_url: str, paths: List[str], viewers: int, warmup: float, duration: float) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=viewers, max_keepalive_connections=viewers)
+
+    async with httpx.AsyncClient(base_url=api_url, limits=limits, timeout=30) as http:
+        measure_from = time.perf_counter() + warmup
+        end = measure_from + duration
+
+        async def viewer():
+            nonlocal errors
+            while (started := time.perf_counter()) < end:
+                try:
+                    ok = (await http.get(random.choice(paths))).status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if started < measure_from:
+                    continue
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(viewer() for _ in range(viewers)))
+    return {"latencies": latencies, "errors": errors}
+
+
+def http_load(*args) -> dict:
+    """Entry point of a driver process"""
+    return asyncio.run(_http_load(*args))
+
+
+def run_http(pool: ProcessPoolExecutor, r, api_url: str, paths: List[str], viewers: int, processes: int, warmup: float, duration: float) -> dict:
+    processes = min(processes, viewers)
+    shares = [viewers // processes + (1 if n < viewers % processes else 0) for n in range(processes)]
+    futures = [pool.submit(http_load, api_url, paths, share, warmup, duration) for share in shares]
+    time.sleep(warmup)
+    commands_before = redis_commands(r)
+    time.sleep(duration)
+    commands_after = redis_commands(r)
+    results = [future.result() for future in futures]
+
+    latencies = [latency for result in results for latency in result["latencies"]]
+    commands = commands_after - commands_before - 2 if commands_before is not None and commands_after is not None else None
+    return {
+        "requests": len(latencies),
+        "errors": sum(result["errors"] for result in results),
+        "rps": round(len(latencies) / duration, 1),
+        "latency_ms": summarize([latency * 1000 for latency in latencies]),
+        "redis_commands_per_request": round(commands / len(latencies), 2) if commands is not None and latencies else None,
+    }
+
+
+# WebSockets
+
+async def _listen(socket, delays: List[float]):
+    async for raw in socket:
+        for event in json.loads(raw)["events"]:
+            sent = event["message"].rpartition("sent=")[2]
+            if sent:
+                delays.append(time.time() - float(sent))
+
+
+async def run_websockets(r, api_url: str, sockets: int, layout: str, idle: float, duration: float, log_rate: float) -> dict:
+    run_id = uuid.uuid4().hex[:8]
+    pages = [f"bench-ws-{run_id}-{n}" for n in range(1 if layout == "shared" else sockets)]
+    ws_url = api_url.replace("http://", "ws://")
+    delays: List[float] = []
+    connections, listeners = [], []
+
+    try:
+        for start in range(0, sockets, CONNECT_BATCH):
+            batch = range(start, min(start + CONNECT_BATCH, sockets))
+            opened = await asyncio.gather(*(
+                websockets.connect(f"{ws_url}/ws/logs/{pages[n % len(pages)]}", open_timeout=30) for n in batch
+            ))
+            connections += opened
+            listeners += [asyncio.create_task(_listen(socket, delays)) for socket in opened]
+        await asyncio.sleep(1)
+
+        # Idle: the fan-out's blocking reads only
+        commands_before = redis_commands(r)
+        await asyncio.sleep(idle)
+        commands_after = redis_commands(r)
+        idle_commands = commands_after - commands_before - 2 if commands_before is not None and commands_after is not None else None
+
+        # Active: log_rate lines/sec written to every page
+        writes = 0
+        commands_before = redis_commands(r)
+        started = time.perf_counter()
+        while time.perf_counter() - started < duration:
+            tick = time.perf_counter()
+            await asyncio.gather(*(emit_log_async(page_id, f"🧪 bench sent={time.time()}") for page_id in pages))
+            writes += len(pages)
+            await asyncio.sleep(max(0.0, 1 / log_rate - (time.perf_counter() - tick)))
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0.5)
+        commands_after = redis_commands(r)
+        active_commands = (
+            commands_after - commands_before - 2 - writes * LOG_WRITE_COMMANDS
+            if commands_before is not None and commands_after is not None else None
+        )
+    finally:
+        for socket in connections:
+            await socket.close()
+        for listener in listeners:
+            listener.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+
+    def per_socket(commands: Optional[int], seconds: float) -> Optional[float]:
+        return round(commands / seconds / sockets, 4) if commands is not None else None
+
+    expected = writes * sockets // len(pages)
+    return {
+        "layout": layout,
+        "sockets": sockets,
+        "pages": len(pages),
+        "idle": {"redis_commands_per_second_per_socket": per_socket(idle_commands, idle)},
+        "active": {
+            "log_lines_per_second_per_page": round(writes / len(pages) / elapsed, 1),
+            "delivered": len(delays),
+            "expected": expected,
+            "delivery_latency_ms": summarize([delay * 1000 for delay in delays]),
+            "redis_commands_per_second_per_socket": per_socket(active_commands, elapsed + 0.5),
+        },
+    }
+
+
+def raise_fd_limit():
+    """Every open socket costs a descriptor here and one in the API"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-path benchmark of /api/content, /landing, static files and log WebSockets")
+    parser.add_argument("--pages", type=int_list, default=[10, 1000], help="Page counts, comma separated")
+    parser.add_argument("--viewers", type=int_list, default=[1, 16, 64], help="Concurrent viewers, comma separated")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=f"Subset of {','.join(ENDPOINTS)}")
+    parser.add_argument("--sockets", type=int_list, default=[10, 100, 500], help="Open WebSockets, comma separated (empty to skip)")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds measured per scenario")
+    parser.add_argument("--warmup", type=float, default=2, help="Seconds run before measuring each scenario")
+    parser.add_argument("--log-rate", type=float, default=5, help="Log lines/sec written to each page in the WebSocket scenarios")
+    parser.add_argument("--driver-processes", type=int, default=min(4, os.cpu_count() or 1), help="Processes running the viewers")
+    parser.add_argument("--frontend-dist", help="Built landing_page app to serve")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    endpoints = [name for name in args.endpoints.split(",") if name]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    raise_fd_limit()
+    r = get_redis()
+    workdir = tempfile.mkdtemp(prefix="pioneer-read-bench-")
+    print(f"🧪 Logs and fixtures in {workdir}", file=sys.stderr)
+    built = os.path.join(BACKEND_DIR, "..", "landing_page", "dist")
+    frontend_dist = args.frontend_dist or (built if os.path.exists(os.path.join(built, "index.html")) else stand_in_frontend(workdir))
+    hero = mirrored_hero(os.path.join(workdir, "assets"))
+
+    run_id = uuid.uuid4().hex[:8]
+    page_ids = [f"bench-read-{run_id}-{n}" for n in range(max(args.pages))]
+    seed_pages(r, page_ids, hero)
+
+    port = free_port()
+    env = dict(
+        os.environ,
+        PYTHONUNBUFFERED="1",
+        APIFY_TOKEN="bench",
+        MISTRAL_KEY="bench",
+        FAL_KEY="bench",
+        FRONTEND_DIST=os.path.abspath(frontend_dist),
+        ASSETS_DIR=os.path.join(workdir, "assets"),
+        IMAGE_CACHE_DIR=os.path.join(workdir, "image_cache"),
+    )
+    env.pop("BENCH_FAKES_URL", None)
+    api = [spawn(workdir, "api", ["api", "--port", str(port)], env)]
+    api_url = f"http://127.0.0.1:{port}"
+    r.delete(POOLS_KEY)
+
+    http_results, ws_results = [], []
+    try:
+        wait_until_healthy(api_url, api)
+        with ProcessPoolExecutor(max_workers=args.driver_processes) as pool:
+            for pages in args.pages:
+                for endpoint in endpoints:
+                    paths = endpoint_paths(endpoint, page_ids[:pages], frontend_dist, hero)
+                    for viewers in args.viewers:
+                        result = run_http(pool, r, api_url, paths, viewers, args.driver_processes, args.warmup, args.duration)
+                        http_results.append({"endpoint": endpoint, "pages": pages, "viewers": viewers, **result})
+                        print(f"📊 {endpoint} pages={pages} viewers={viewers}: {result['rps']} rps, p95 {result['latency_ms']['p95']} ms", file=sys.stderr)
+
+        async def websocket_scenarios():
+            for sockets in args.sockets:
+                for layout in WS_LAYOUTS:
+                    result = await run_websockets(r, api_url, sockets, layout, args.duration, args.duration, args.log_rate)
+                    ws_results.append(result)
+                    print(f"🔌 {layout} sockets={sockets}: {result['idle']['redis_commands_per_second_per_socket']} idle commands/s/socket", file=sys.stderr)
+
+        asyncio.run(websocket_scenarios())
+        pools = collect_pools(r)
+    finally:
+        stop_backend(api)
+        delete_pages(r, page_ids)
+
+    report = {
+        "config": {
+            "pages": args.pages,
+            "viewers": args.viewers,
+            "sockets": args.sockets,
+            "duration_seconds": args.duration,
+            "warmup_seconds": args.warmup,
+            "log_rate": args.log_rate,
+            "driver_processes": args.driver_processes,
+            "frontend_dist": os.path.abspath(frontend_dist),
+        },
+        "http": http_results,
+        "websockets": ws_results,
+        "threadpools": pools,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
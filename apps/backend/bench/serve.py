@@ -0,0 +1,51 @@
+"""
+Backend processes of the benchmarks, with the pool sampler (bench.probes)
+on the event loop and fal routed to the fakes when BENCH_FAKES_URL is set:
+
+    python -m bench.serve api --port 8000
+    python -m bench.serve worker
+"""
+from bench.fakes import install_fake_fal
+from bench.probes import sample_pools
+import argparse
+import asyncio
+import os
+
+
+def serve_api(port: int):
+    from app.main import app
+    import uvicorn
+
+    async def start_sampler():
+        app.state.bench_sampler = asyncio.create_task(sample_pools("api"))
+
+    app.router.on_startup.append(start_sampler)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def run_worker():
+    from app import worker
+
+    sampler = asyncio.create_task(sample_pools("worker"))
+    try:
+        await worker.main()
+    finally:
+        sampler.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a backend process for the load benchmark")
+    parser.add_argument("role", choices=("api", "worker"))
+    parser.add_argument("--port", type=int, default=8000, help="API port")
+    args = parser.parse_args()
+
+    if os.getenv("BENCH_FAKES_URL"):
+        install_fake_fal(os.environ["BENCH_FAKES_URL"])
+    if args.role == "api":
+        serve_api(args.port)
+    else:
+        asyncio.run(run_worker())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import { Recycle, Grip, Wrench, Sparkles, Leaf, Heart, Globe } from "lucide-react";
 import { Card, CardContent } from "@/components/ui/card";
 import { useEffect, useState } from "react";
+import { isReady, watchContent, type SectionedContent } from "@/lib/content";
 
 const defaultFeatures = [
   {
@@ -35,7 +36,7 @@ const iconMap: Record<string, any> = {
   Globe
 };
 
-interface PageContent {
+interface PageContent extends SectionedContent {
   featuresHeadline?: string;
   features?: Array<{
     icon: string;
@@ -59,16 +60,13 @@ const Features = () => {
           return;
         }
         
-        const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
-        const response = await fetch(`${apiUrl}/api/content/${pageId}`);
-        
-        if (!response.ok) {
-          setLoading(false);
-          return;
-        }
-        
-        const data = await response.json();
-        setContent(data);
+        // Same URL as the other sections, which share its subscription
+        await watchContent<PageContent>(pageId, ['features'], (data) => {
+          if (isReady(data, 'features')) {
+            setContent(data);
+            setLoading(false);
+          }
+        });
       } catch (err) {
         console.error('Error fetching features data:', err);
       } finally {
@@ -1,6 +1,7 @@
 import { Button } from "@/components/ui/button";
 import { ArrowRight } from "lucide-react";
 import { useEffect, useState } from "react";
+import { isReady, watchContent, type SectionedContent } from "@/lib/content";
 import heroImage from "@/assets/hero-image.jpg";
 import avatar1 from "@/assets/avatar-1.jpg";
 import avatar2 from "@/assets/avatar-2.jpg";
@@ -11,7 +12,7 @@ import companyLogo2 from "@/assets/company-logo-2.jpg";
 import companyLogo3 from "@/assets/company-logo-3.jpg";
 import companyLogo4 from "@/assets/company-logo-4.jpg";
 
-interface PageContent {
+interface PageContent extends SectionedContent {
   id: string;
   productName?: string;
   title: string;
@@ -20,6 +21,8 @@ interface PageContent {
   ctaPrimary?: string;
   ctaSecondary?: string;
   heroImageUrl?: string;
+  /** Resized copies of the hero image per format, when the backend mirrored it */
+  heroImageSources?: { type: string; srcSet: string }[];
   companyLogos?: {
     logo1?: string;
     logo2?: string;
@@ -40,15 +43,20 @@ const Hero = () => {
         const urlParams = new URLSearchParams(window.location.search);
         const pageId = urlParams.get('id') || 'default';
         
-        // Fetch content from API using relative URL (works on any domain)
-        const response = await fetch(`/api/content/${pageId}`);
-        
-        if (!response.ok) {
-          throw new Error(`Failed to load content for ID: ${pageId}`);
+        // Fetch content from API using relative URL (works on any domain),
+        // render the hero copy as soon as it is ready, the image and logos follow
+        let heroReady = false;
+        await watchContent<PageContent>(pageId, ['hero', 'hero_image', 'logos'], (data) => {
+          if (isReady(data, 'hero')) {
+            heroReady = true;
+            setContent(data);
+            setLoading(false);
+          }
+        });
+
+        if (!heroReady) {
+          throw new Error(`Failed to generate content for ID: ${pageId}`);
         }
-        
-        const data = await response.json();
-        setContent(data);
       } catch (err) {
         console.error('Error fetching content:', err);
         setError(err instanceof Error ? err.message : 'Failed to load content');
@@ -185,11 +193,21 @@ const Hero = () => {
           
           <div className="relative">
             <div className="relative rounded-2xl overflow-hidden shadow-2xl">
-              <img 
-                src={content?.heroImageUrl || heroImage} 
-                alt="Product in use" 
-                className="w-full h-auto"
-              />
+              <picture>
+                {content?.heroImageSources?.map((source) => (
+                  <source
+                    key={source.type}
+                    type={source.type}
+                    srcSet={source.srcSet}
+                    sizes="(min-width: 1024px) 50vw, 100vw"
+                  />
+                ))}
+                <img 
+                  src={content?.heroImageUrl || heroImage} 
+                  alt="Product in use" 
+                  className="w-full h-auto"
+                />
+              </picture>
             </div>
             <div className="absolute -bottom-4 -right-4 w-32 h-32 bg-primary/20 rounded-full blur-3xl" />
             <div className="absolute -top-4 -left-4 w-32 h-32 bg-accent/20 rounded-full blur-3xl" />
@@ -2,6 +2,7 @@ import { Card, CardContent } from "@/components/ui/card";
 import { Star } from "lucide-react";
 import { Avatar, AvatarFallback, AvatarImage } from "@/components/ui/avatar";
 import { useEffect, useState } from "react";
+import { isReady, watchContent, type SectionedContent } from "@/lib/content";
 
 interface Testimonial {
   name: string;
@@ -13,7 +14,7 @@ interface Testimonial {
   profile_picture_url?: string;
 }
 
-interface PageContent {
+interface PageContent extends SectionedContent {
   allTestimonials?: Testimonial[];
   testimonialsHeadline?: string;
   testimonial1?: {
@@ -91,69 +92,66 @@ const Testimonials = () => {
         }
         
         // Fetch content from API using relative URL (works on any domain)
-        const response = await fetch(`/api/content/${pageId}`);
-        
-        if (!response.ok) {
-          setLoading(false);
-          return;
-        }
-        
-        const data: PageContent = await response.json();
+        await watchContent<PageContent>(pageId, ['testimonials'], (data) => {
+          if (!isReady(data, 'testimonials')) {
+            return;
+          }
         
-        // Update headline if provided
-        if (data.testimonialsHeadline) {
-          setHeadline(data.testimonialsHeadline);
-        }
+          // Update headline if provided
+          if (data.testimonialsHeadline) {
+            setHeadline(data.testimonialsHeadline);
+          }
         
-        // Use allTestimonials if available (from workflow with reactors)
-        if (data.allTestimonials && data.allTestimonials.length > 0) {
-          setTestimonials(data.allTestimonials);
-        } else {
-          // Fallback to updating individual testimonials
-          const updatedTestimonials = [...defaultTestimonials];
+          // Use allTestimonials if available (from workflow with reactors)
+          if (data.allTestimonials && data.allTestimonials.length > 0) {
+            setTestimonials(data.allTestimonials);
+          } else {
+            // Fallback to updating individual testimonials
+            const updatedTestimonials = [...defaultTestimonials];
           
-          // Update first testimonial
-          if (data.testimonial1) {
-            if (data.testimonial1.name) {
-              updatedTestimonials[0].name = data.testimonial1.name;
-              // Generate initials from name
-              const nameParts = data.testimonial1.name.split(' ');
-              updatedTestimonials[0].initials = nameParts
-                .map(part => part[0])
-                .join('')
-                .toUpperCase()
-                .slice(0, 2);
+            // Update first testimonial
+            if (data.testimonial1) {
+              if (data.testimonial1.name) {
+                updatedTestimonials[0].name = data.testimonial1.name;
+                // Generate initials from name
+                const nameParts = data.testimonial1.name.split(' ');
+                updatedTestimonials[0].initials = nameParts
+                  .map(part => part[0])
+                  .join('')
+                  .toUpperCase()
+                  .slice(0, 2);
+              }
+              if (data.testimonial1.role) {
+                updatedTestimonials[0].role = data.testimonial1.role;
+              }
+              if (data.testimonial1.avatarUrl) {
+                updatedTestimonials[0].avatarUrl = data.testimonial1.avatarUrl;
+              }
             }
-            if (data.testimonial1.role) {
-              updatedTestimonials[0].role = data.testimonial1.role;
-            }
-            if (data.testimonial1.avatarUrl) {
-              updatedTestimonials[0].avatarUrl = data.testimonial1.avatarUrl;
-            }
-          }
           
-          // Update second testimonial
-          if (data.testimonial2) {
-            if (data.testimonial2.name) {
-              updatedTestimonials[1].name = data.testimonial2.name;
-              // Generate initials from name
-              const nameParts = data.testimonial2.name.split(' ');
-              updatedTestimonials[1].initials = nameParts
-                .map(part => part[0])
-                .join('')
-                .toUpperCase()
-                .slice(0, 2);
-            }
-            if (data.testimonial2.role) {
-              updatedTestimonials[1].role = data.testimonial2.role;
+            // Update second testimonial
+            if (data.testimonial2) {
+              if (data.testimonial2.name) {
+                updatedTestimonials[1].name = data.testimonial2.name;
+                // Generate initials from name
+                const nameParts = data.testimonial2.name.split(' ');
+                updatedTestimonials[1].initials = nameParts
+                  .map(part => part[0])
+                  .join('')
+                  .toUpperCase()
+                  .slice(0, 2);
+              }
+              if (data.testimonial2.role) {
+                updatedTestimonials[1].role = data.testimonial2.role;
+              }
+              if (data.testimonial2.avatarUrl) {
+                updatedTestimonials[1].avatarUrl = data.testimonial2.avatarUrl;
+              }
             }
-            if (data.testimonial2.avatarUrl) {
-              updatedTestimonials[1].avatarUrl = data.testimonial2.avatarUrl;
-            }
-          }
           
-          setTestimonials(updatedTestimonials);
-        }
+            setTestimonials(updatedTestimonials);
+          }
+        });
       } catch (err) {
         console.error('Error fetching testimonial data:', err);
       } finally {
@@ -0,0 +1,116 @@
+export type SectionStatus = "pending" | "ready" | "failed";
+
+export interface SectionedContent {
+  status?: Record<string, SectionStatus>;
+}
+
+declare global {
+  interface Window {
+    /** Page content embedded by the server in /landing?id= */
+    __PAGE_CONTENT__?: SectionedContent & { id?: string };
+  }
+}
+
+/** Seconds each long-poll of /api/content may wait for a section */
+const WAIT_SECONDS = 25;
+/** How long a page is followed before the sections give up on it */
+const MAX_WATCH_MS = 180_000;
+
+interface Listener {
+  fields: string[];
+  onUpdate: (data: SectionedContent) => void;
+  resolve: () => void;
+  reject: (error: unknown) => void;
+}
+
+interface Subscription {
+  pageId: string;
+  fields: Set<string>;
+  listeners: Set<Listener>;
+}
+
+/** One long-poll per page, shared by every section rendering it */
+const subscriptions = new Map<string, Subscription>();
+
+/** Complete pages come without a status map, every section is ready */
+export function isReady(data: SectionedContent, section: string): boolean {
+  return (data.status?.[section] ?? "ready") === "ready";
+}
+
+function isPending(data: SectionedContent, fields: string[]): boolean {
+  return fields.some((field) => data.status?.[field] === "pending");
+}
+
+async function follow(url: string, subscription: Subscription): Promise<void> {
+  const deadline = Date.now() + MAX_WATCH_MS;
+  let wait = 0;
+  try {
+    while (subscription.listeners.size > 0 && Date.now() < deadline) {
+      const requested = [...subscription.fields];
+      const params = new URLSearchParams({ fields: requested.join(",") });
+      if (wait) {
+        params.set("wait", String(wait));
+      }
+      const response = await fetch(`${url}?${params}`);
+      if (!response.ok) {
+        throw new Error(`Failed to load content for ID: ${subscription.pageId}`);
+      }
+
+      const data: SectionedContent = await response.json();
+      for (const listener of [...subscription.listeners]) {
+        // Sections that joined during this request get the next response
+        if (!listener.fields.every((field) => requested.includes(field))) {
+          continue;
+        }
+        listener.onUpdate(data);
+        if (!isPending(data, listener.fields)) {
+          subscription.listeners.delete(listener);
+          listener.resolve();
+        }
+      }
+      wait = WAIT_SECONDS;
+    }
+  } catch (error) {
+    subscription.listeners.forEach((listener) => listener.reject(error));
+  } finally {
+    subscriptions.delete(url);
+    subscription.listeners.forEach((listener) => listener.resolve());
+  }
+}
+
+/**
+ * Follow a page, calling `onUpdate` with every response until none of the
+ * given sections is pending anymore, so a section can be rendered as soon
+ * as it is ready while the rest of the page is still generating.
+ * Pages embedded by the server in /landing are used without a request.
+ * Otherwise the sections of a page share one subscription: a first request
+ * for all of their fields, then long-polls (?wait) that return as soon as
+ * one of them is generated. Throws when the page doesn't exist.
+ */
+export function watchContent<T extends SectionedContent>(
+  pageId: string,
+  fields: string[],
+  onUpdate: (data: T) => void,
+  baseUrl = "",
+): Promise<void> {
+  const embedded = window.__PAGE_CONTENT__;
+  if (embedded && embedded.id === pageId) {
+    onUpdate(embedded as T);
+    return Promise.resolve();
+  }
+
+  const url = `${baseUrl}/api/content/${pageId}`;
+  let subscription = subscriptions.get(url);
+  if (!subscription) {
+    subscription = { pageId, fields: new Set(), listeners: new Set() };
+    subscriptions.set(url, subscription);
+    // Start once the sections mounting with this one have subscribed too
+    const started = subscription;
+    queueMicrotask(() => follow(url, started));
+  }
+  fields.forEach((field) => subscription.fields.add(field));
+
+  return new Promise((resolve, reject) => {
+    subscription.listeners.add({ fields, onUpdate: onUpdate as (data: SectionedContent) => void, resolve, reject });
+  });
+}